@@ -10,12 +10,18 @@ __date__ = "$Date$"
 __copyright__ = "Copyright (c) 2012-2019 Alessandro Morgantini"
 __license__ = "Python"
 
+import concurrent.futures
+import json
 import os
+import queue
+import threading
 import tkinter              # For GUI stuff
 import tkinter.dialog       # For "Game Over" dialogs
 from tkinter import *       
 from tkinter.ttk import *
 import minesweeper          # For the minesweeper game
+import minesweeperpool      # For the boards made in advance
+import minesweepersolver    # For the boards without guesses
 
 # The application name
 APP_NAME = "Minesweeptk"
@@ -33,7 +39,6 @@ imagesFilenames = ( 'zero.gif', 'one.gif', 'two.gif', 'three.gif',
                     'eight.gif', 'bomb.gif', 'flag.gif', 'q_mark.gif',
                     'covered.gif', 'pressed.gif', 'bottombord.gif', 'rightbord.gif',
                     'cornerbord.gif', 'falsenegative.gif', 'falsepositive.gif' )
-images = []
 
 # Size of table and number of mines
 option = 1
@@ -42,10 +47,30 @@ options = [ { "nrows": 9, "ncols": 9, "nmines": 10 },
             { "nrows": 16, "ncols": 30, "nmines": 99 },
             { "nrows": 16, "ncols": 16, "nmines": 40 } ]
 
+# How the table is drawn: RENDERER_LABELS uses a Label widget for every cell,
+# RENDERER_CANVAS draws the whole table on a single Canvas widget. It's chosen
+# at startup with the --renderer command line option
+RENDERER_LABELS = "labels"
+RENDERER_CANVAS = "canvas"
+renderer = RENDERER_LABELS
+
+# Whether the new games can be played to the end without guessing
+noGuess = False
+
             
 # The filename in '~' where to save the current game
 SAVE_FILE_NAME = os.path.join( os.path.expanduser( "~" ), ".minesweeptk_save" )
 
+# The filename in '~' where to save the options
+OPTIONS_FILE_NAME = os.path.join( os.path.expanduser( "~" ), ".minesweeptk_options" )
+
+# The filename in '~' where to autosave the current game, and how often (in ms)
+AUTOSAVE_FILE_NAME = os.path.join( os.path.expanduser( "~" ), ".minesweeptk_autosave" )
+AUTOSAVE_INTERVAL = 30 * 1000
+
+# The directory in '~' where the boards without guesses are made in advance
+BOARDS_DIR_NAME = os.path.join( os.path.expanduser( "~" ), ".minesweeptk_boards" )
+
 #-------------------------------------------------------------------------------
 # A function to initialize i18n stuff
 #-------------------------------------------------------------------------------
@@ -90,118 +115,430 @@ def InitI18n():
     gettext.install( APP_NAME, 'locale' )
 
 
+def ActiveSize():
+    """Return ( nrows, ncols, nmines ) of the active option."""
+    return ( options[ option ][ 'nrows' ], options[ option ][ 'ncols' ], options[ option ][ 'nmines' ] )
+
+
 #-------------------------------------------------------------------------------
 # A class to save/load persistent data
 #-------------------------------------------------------------------------------
 class PersistentData:
-    """This class implements an interface to manage persistent data."""
+    """This class implements an interface to manage persistent data.
+    
+    The saved game and the options are kept in two files, so each of them is
+    read and written without touching the other one: the game in the binary
+    format of minesweeper.Dump(), the options in JSON. Older releases kept
+    the options after the game (pickled, or binary) in the game file: these
+    files are read too, and their options are moved to the options file at
+    the first save. A third file keeps the game autosaved by AutoSaver.
+    
+    Every file is written in a temporary file first and then renamed, so a
+    crash while writing doesn't lose the previous content."""
     
-    def __init__( self, filename ):
-        """Initialize the instance with the file name."""
+    # The only globals a file pickled by older releases can reference (with
+    # the Python 2 names of the low protocols): any other one, which could
+    # run code while the file is read, makes it damaged
+    _LEGACY_GLOBALS = frozenset( [ ( 'minesweeper', 'Game' ), ( 'minesweeper', 'Cell' ),
+                                   ( 'copyreg', '_reconstructor' ), ( 'copy_reg', '_reconstructor' ),
+                                   ( 'builtins', 'list' ), ( '__builtin__', 'list' ),
+                                   ( 'builtins', 'object' ), ( '__builtin__', 'object' ) ] )
+    
+    def __init__( self, filename, optionsFilename, autosaveFilename ):
+        """Initialize the instance with the game, the options and the
+        autosaved game file names."""
         
-        # Init the filename 
+        # Init the filenames
         self.filename = filename
+        self.optionsFilename = optionsFilename
+        self.autosaveFilename = autosaveFilename
+        
+        
+    def _WriteFile( self, filename, data ):
+        """Replace the content of the file with the bytes data."""
+        tmpFilename = filename + ".tmp"
+        with open( tmpFilename, "wb" ) as f:
+            f.write( data )
+            f.flush()
+            os.fsync( f.fileno() )
+        os.replace( tmpFilename, filename )
+        
         
-        # Import pickle module and map as instance variable
+    def _LoadCombined( self ):
+        """Read a game file which holds the options too, as the ones of older
+        releases: return ( game, option, custom options ). game is None if no
+        game has been saved."""
+        with open( self.filename, "rb" ) as f:
+            head = f.read( len( minesweeper.FORMAT_MAGIC ) )
+            f.seek( 0 )
+            if head == minesweeper.FORMAT_MAGIC:
+                game = minesweeper.Load( f )
+            elif head and head[ : 1 ] != b'[':
+                return self._LoadLegacy( f )
+            else:
+                game = None
+            try:
+                svdOption, svdOptions = json.loads( f.read().decode( "utf-8" ) )
+            except ( ValueError, TypeError ):
+                # No options saved yet: set default values
+                svdOption = option
+                svdOptions = options[ 3 ]
+                
+        return ( game, svdOption, svdOptions )
+        
+        
+    def _LoadLegacy( self, f ):
+        """Read a file pickled by older releases: the game (or a string if no
+        game has been saved) and, if present, the options. Raise
+        minesweeper.MinesweeperFormatError if the game is damaged."""
         import pickle
-        self.pickle = pickle
         
+        class LegacyUnpickler( pickle.Unpickler ):
+            def find_class( unpck, module, name ):
+                if ( module, name ) not in self._LEGACY_GLOBALS:
+                    raise pickle.UnpicklingError( "Global '%s.%s' is forbidden" % ( module, name ) )
+                return super().find_class( module, name )
         
-    def SaveGame( self, game ):
-        """Save the supplied game on file."""
-        # Load saved options
+        # The errors of a damaged or truncated pickle
+        errors = ( pickle.UnpicklingError, EOFError, AttributeError, ImportError,
+                   IndexError, KeyError, TypeError, ValueError )
+        unpck = LegacyUnpickler( f )
         try:
-            svdOption, svdOptions = self.LoadOptions()
-        except IOError:
-            # If the file does'n exist, set default values
-            # for custom options
+            game = unpck.load()
+        except errors:
+            raise minesweeper.MinesweeperFormatError( "Error: damaged saved game" )
+        if not isinstance( game, minesweeper.Game ):
+            game = None
+        try:
+            svdOption = unpck.load()
+            svdOptions = unpck.load()
+        except errors:
+            # It's possible open old savings (without options), so,
+            # if the file is too short, set default values
             svdOption = option
             svdOptions = options[ 3 ]
             
-        with open( self.filename, "wb" ) as f:
-            pck = self.pickle.Pickler( f )
-            pck.dump( game )
-            pck.dump( svdOption )
-            pck.dump( svdOptions )
+        return ( game, svdOption, svdOptions )
+        
+        
+    def _MigrateOptions( self ):
+        """Move the options of a game file of older releases to the options
+        file, before the game file is overwritten."""
+        if os.path.exists( self.optionsFilename ):
+            return
+        try:
+            dummy, svdOption, svdOptions = self._LoadCombined()
+        except ( IOError, minesweeper.MinesweeperError ):
+            return
+        self.SaveOptions( svdOption, svdOptions )
+        
+        
+    def SaveGame( self, game ):
+        """Save the supplied game on file."""
+        self._MigrateOptions()
+        self._WriteFile( self.filename, minesweeper.Dumps( game ) )
        
         
     def LoadGame( self ):
-        """Load the saved game from file."""
+        """Load the saved game from file (None if no game has been saved)."""
         with open( self.filename, "rb" ) as f:
-            unpck = self.pickle.Unpickler( f )
-            game = unpck.load()
-
-        return game
+            if f.read( len( minesweeper.FORMAT_MAGIC ) ) == minesweeper.FORMAT_MAGIC:
+                f.seek( 0 )
+                return minesweeper.Load( f )
+                
+        # A file of older releases
+        return self._LoadCombined()[ 0 ]
             
         
-    def SaveOptions( self, option, options ):
+    def SaveOptions( self, option, options, noGuess = False ):
         """Save the supplied custom options on file."""
-        # Load saved game
+        self._WriteFile( self.optionsFilename, json.dumps( [ option, options, noGuess ] ).encode( "utf-8" ) )
+
+        
+    def LoadOptions( self ):
+        """Load the saved custom options from file: return ( option, custom
+        options, no guessing ). Damaged options give the default values."""
         try:
-            svdGame = self.LoadGame()
+            with open( self.optionsFilename, encoding = "utf-8" ) as f:
+                data = json.load( f )
         except IOError:
-            # If the file doesn't exist, put an invalid one
-            svdGame = "You've never saved any game!"
+            # Older releases saved the options in the game file: move them to
+            # the options file, so the next runs don't read the whole game
+            try:
+                data = self._LoadCombined()[ 1 : ]
+            except ( IOError, minesweeper.MinesweeperError ):
+                data = None
+            svdOption, svdOptions, svdNoGuess = self._ParseOptions( data )
+            try:
+                self.SaveOptions( svdOption, svdOptions )
+            except IOError:
+                pass
+            return ( svdOption, svdOptions, svdNoGuess )
+        except ValueError:
+            data = None
+        return self._ParseOptions( data )
+        
+        
+    def _ParseOptions( self, data ):
+        """Return ( option, custom options, no guessing ) from the list data
+        read from a file, or the default values if it isn't valid."""
+        try:
+            svdOption, svdOptions = data[ : 2 ]
+            svdNoGuess = bool( data[ 2 ] ) if len( data ) > 2 else False
+            if svdOption in range( len( options ) ) and all(
+                isinstance( svdOptions[ key ], int ) and svdOptions[ key ] >= 0
+                for key in ( 'nrows', 'ncols', 'nmines' ) ):
+                return ( svdOption, svdOptions, svdNoGuess )
+        except ( TypeError, KeyError, ValueError ):
+            pass
+        return ( option, options[ 3 ], False )
+        
+        
+    def HasGame( self ):
+        """Return True if a game has been saved on file.
+        
+        Only the header of the game is read, not the whole game."""
+        try:
+            with open( self.filename, "rb" ) as f:
+                head = f.read( len( minesweeper.FORMAT_MAGIC ) )
+                f.seek( 0 )
+                if head == minesweeper.FORMAT_MAGIC:
+                    minesweeper.LoadHeader( f )
+                    return True
+                elif head and head[ : 1 ] != b'[':
+                    return self._HasLegacyGame( f )
+        except ( IOError, minesweeper.MinesweeperError ):
+            pass
+        return False
+        
+        
+    def _HasLegacyGame( self, f ):
+        """Return True if the file pickled by older releases starts with a
+        game: only the first opcodes of the pickle are read."""
+        import pickletools
+        strings = []
+        try:
+            for opcode, arg, pos in pickletools.genops( f ):
+                if opcode.name == 'GLOBAL':
+                    name = arg.split( ' ' )
+                elif opcode.name == 'STACK_GLOBAL':
+                    name = strings[ -2: ]
+                elif opcode.name == 'STOP':
+                    break
+                else:
+                    if isinstance( arg, str ):
+                        strings.append( arg )
+                    continue
+                # Low protocols reference a helper of copyreg before the class
+                if name[ 0 ] not in ( 'copyreg', 'copy_reg' ):
+                    return name == [ 'minesweeper', 'Game' ]
+        except ValueError:
+            # Not a pickle
+            pass
+        return False
+        
+        
+    def AutoSaveGame( self, game ):
+        """Autosave the supplied game on file."""
+        self._WriteFile( self.autosaveFilename, minesweeper.Dumps( game ) )
+        
+        
+    def LoadAutoSavedGame( self ):
+        """Load the autosaved game from file."""
+        with open( self.autosaveFilename, "rb" ) as f:
+            return minesweeper.Load( f )
+            
+            
+    def HasAutoSavedGame( self ):
+        """Return True if a game has been autosaved on file (reading only
+        its header)."""
+        try:
+            with open( self.autosaveFilename, "rb" ) as f:
+                minesweeper.LoadHeader( f )
+                return True
+        except ( IOError, minesweeper.MinesweeperError ):
+            return False
+            
             
-        with open( self.filename, "wb" ) as f:
-            pck =  self.pickle.Pickler( f )
-            pck.dump( svdGame )
-            pck.dump( option )
-            pck.dump( options )
+    def RemoveAutoSavedGame( self ):
+        """Remove the autosaved game file, if any."""
+        try:
+            os.remove( self.autosaveFilename )
+        except OSError:
+            pass
+    
 
-        
-    def LoadOptions( self ):
-        """Load the saved custom options from file."""
-        with open( self.filename, "rb" ) as f:
-            unpck = self.pickle.Unpickler( f )
-            # Read the saved game
-            dummy = unpck.load()
+
+#-------------------------------------------------------------------------------
+# A class to autosave the game
+#-------------------------------------------------------------------------------
+class AutoSaver:
+    """This class autosaves the game of a window periodically.
+    
+    The Tk thread only takes a snapshot of the game (a copy of its arrays):
+    the snapshot is serialized and written on a worker thread, so the Tk
+    mainloop never waits for the disk. A game which isn't modified (just
+    saved, loaded or started) has nothing to recover, so its autosave file
+    is removed.
+    
+    Autosaving begins with Start(): the autosave file of a previous run must
+    be left alone until the user has chosen whether to restore it."""
+    
+    def __init__( self, root, persData, interval = AUTOSAVE_INTERVAL ):
+        """Prepare to autosave the game of root.table every interval ms."""
+        self.root = root
+        self.persData = persData
+        self.interval = interval
+        
+        # The snapshots to write (None to remove the file), in order
+        self.queue = queue.Queue()
+        self.worker = threading.Thread( target = self.Work, daemon = True )
+        self.worker.start()
+        
+        # The last snapshot queued, and whether there can be an autosave file
+        # (the one of the previous run, at first)
+        self.snapshot = None
+        self.saved = True
+        self.afterId = None
+        
+        
+    def Start( self ):
+        """Start autosaving (from the Tk thread)."""
+        if self.afterId is None:
+            self.afterId = self.root.after( self.interval, self.Tick )
+        
+        
+    def Tick( self ):
+        """Queue a snapshot of the game, if it changed (from the Tk thread)."""
+        game = self.root.table.game
+        last = self.snapshot
+        if game.IsModified():
+            if last is None or last.statuses != game.statuses or last.mines != game.mines:
+                self.snapshot = game.Snapshot()
+                self.queue.put( self.snapshot )
+                self.saved = True
+        elif self.saved:
+            self.snapshot = None
+            self.queue.put( None )
+            self.saved = False
+        self.afterId = self.root.after( self.interval, self.Tick )
+        
+        
+    def Work( self ):
+        """Write the queued snapshots (on the worker thread)."""
+        while True:
+            game = self.queue.get()
+            if game is AutoSaver:
+                break
             try:
-                svdOption = unpck.load()
-                svdOptions = unpck.load()
-            except EOFError:
-                # It's possible open old savings (without options), so,
-                # if the file is too short, set default values
-                svdOption = option
-                svdOptions = options[ 3 ]
+                if game is None:
+                    self.persData.RemoveAutoSavedGame()
+                else:
+                    self.persData.AutoSaveGame( game )
+            except OSError:
+                # Autosave is only a help: the next change will try again
+                pass
+            finally:
+                self.queue.task_done()
+                
+                
+    def Stop( self ):
+        """Stop autosaving, removing the autosave file, and wait for the
+        worker thread to finish."""
+        if self.afterId is not None:
+            self.root.after_cancel( self.afterId )
+        self.queue.put( None )
+        self.queue.put( AutoSaver )
+        self.worker.join()
         
-        return ( svdOption, svdOptions )
+
+
+#-------------------------------------------------------------------------------
+# The images of the cells
+#-------------------------------------------------------------------------------
+class CellImages:
+    """The images to display a cell in every cell status.
+    
+    An image is read from its file the first time it's displayed, so the
+    images that a table doesn't show yet don't slow down the startup."""
+    
+    def __init__( self, filenames ):
+        """Initialize the instance with the file names of the images."""
+        self.filenames = filenames
+        self.Clear()
+        
+    def Clear( self ):
+        """Forget the images read so far (they belong to a destroyed Tk)."""
+        self.images = [ None ] * len( self.filenames )
+        
+    def __getitem__( self, status ):
+        """Return the image for the cell status."""
+        img = self.images[ status ]
+        if img is None:
+            img = PhotoImage()
+            img[ 'file' ] = self.filenames[ status ]
+            self.images[ status ] = img
+        return img
         
+images = CellImages( imagesFilenames )
+
+# The display status of a covered cell, by minesweeper.Cell status
+coveredStatuses = { minesweeper.Cell.COVERED: CELL_STATUS_COVERED,
+                    minesweeper.Cell.FLAG: CELL_STATUS_FLAG,
+                    minesweeper.Cell.Q_MARK: CELL_STATUS_QMARK }
+
+
+def DisplayStatus( game, k ):
+    """Return the display status of the cell k (i * ncols + j) of game,
+    read from the arrays of the minesweeper.Game without any Cell view."""
+    status = game.statuses[ k ]
+    if status != minesweeper.Cell.REVEALED:
+        return coveredStatuses[ status ]
+    return CELL_STATUS_BOMB if game.mines[ k ] else game.neighbors[ k ]
+
+
+# The display status of a cell by its key: status << 5 | mine << 4 | neighbors
+displayTable = bytes( ( CELL_STATUS_BOMB if key & 16 else key & 15 )
+                      if key >> 5 == minesweeper.Cell.REVEALED else coveredStatuses.get( key >> 5, 0 )
+                      for key in range( 256 ) )
+
+
+def DisplayStatuses( game ):
+    """Return the display statuses of all the cells of game, as bytes
+    indexed by i * ncols + j.
     
+    The key of every cell is built for the whole table at once, reading the
+    arrays as big integers with a byte for every cell (no field overflows
+    its byte), and translated by displayTable."""
+    keys = ( int.from_bytes( game.statuses, 'little' ) << 5 |
+             int.from_bytes( game.mines, 'little' ) << 4 |
+             int.from_bytes( game.neighbors, 'little' ) )
+    return keys.to_bytes( len( game.statuses ), 'little' ).translate( displayTable )
 
 
 #-------------------------------------------------------------------------------
-# A class to implement a single cell
+# A base class for the display of a single cell
 #-------------------------------------------------------------------------------
-class CellButton( tkinter.Label ):
-    """CellButton is the widget class which implement a single cell.
+class CellBase:
+    """CellBase implements the display logic of a single cell.
     
-    It's a class derived from Tkinter.Label, so it is able to visualize
-    images. Every single cell is linked to the "real" cell in the
-    underlying minesweeper.Game instance."""
+    Every single cell is linked to the "real" cell in the underlying
+    minesweeper.Game instance. The subclasses show the cell images:
+    they have to accept cell[ 'image' ] = image."""
     
     # Status value related to mouse pressing on the cell
     UNPRESSED = 0   # Cell non-pressed
     PRESSED   = 1   # Cell pressed with mouse cursor inside the cell
     LEAVED    = 2   # Cell pressed with mouse cursor outdise the cell
     
-    def __init__( self, master, ucell ):
-        """Initialize a new CellButton instance.
+    def __init__( self, ucell ):
+        """Link the cell to ucell, the underlying cell in the
+        minesweeper.Game instance."""
         
-        master: the cell master widget, usually the game table
-        ucell:  the underlying cell in the minesweeper.Game instance
-                which this cell is linked to."""
-        
-        tkinter.Label.__init__( self, master )
-
         # Every cell widget is linked to a "real" cell in the
         # underlying minesweeper.Game instance
         self.ucell = ucell
         
-        self[ 'bd' ] = 0    # borderwidth = 0
-        row, col = self.ucell.GetCoordinates()
-        self.grid( row = row, column = col )
-        
         # This is cell status (it identifies which image to show on the cell)
         # starting non-initialized
         self.status = -1
@@ -209,10 +546,11 @@ class CellButton( tkinter.Label ):
         # A variable to manage the press status of the cell
         self.pressed = self.UNPRESSED
         
-        # Add a bind tag. This assigns to all cells a common Tk widget class
-        tagsList = list( self.bindtags() )
-        tagsList.append( self.__class__.__name__ )
-        self.bindtags( tuple( tagsList ) )
+    def Link( self, ucell ):
+        """Link the cell to another underlying cell, e.g. of a new game.
+        The display is refreshed by Update()."""
+        self.ucell = ucell
+        self.pressed = self.UNPRESSED
 
 
     def DoesShowANumber( self ):
@@ -225,20 +563,7 @@ class CellButton( tkinter.Label ):
         
     def Update( self ):
         """Update the cell status from the underlying ucell."""
-        ucellSt = self.ucell.GetStatus()
-        
-        if ucellSt == minesweeper.Cell.COVERED:
-            newStatus = CELL_STATUS_COVERED
-        elif ucellSt == minesweeper.Cell.FLAG:
-            newStatus = CELL_STATUS_FLAG
-        elif ucellSt == minesweeper.Cell.Q_MARK:
-            newStatus = CELL_STATUS_QMARK
-        elif self.ucell.HasMine():
-            newStatus = CELL_STATUS_BOMB
-        else:
-            newStatus = self.ucell.GetNeighborMinesNum()
-            
-        self._SetStatus( newStatus )
+        self._SetStatus( DisplayStatus( self.ucell.game, self.ucell.index ) )
         
         
     def _SetStatus( self, newStatus ):
@@ -268,7 +593,7 @@ class CellButton( tkinter.Label ):
         Uncover the cell only if there is a bomb in it, or
         without any bomb, but with a flag (false positive)."""
                 
-        if self.ucell.HasMine():
+        if self.ucell.game.mines[ self.ucell.index ]:
             if self.status == CELL_STATUS_COVERED or \
                self.status == CELL_STATUS_FLAG or \
                self.status == CELL_STATUS_QMARK:
@@ -280,7 +605,78 @@ class CellButton( tkinter.Label ):
         elif self.status == CELL_STATUS_FLAG:
             # Reveal a false positive (a flag without bomb)
             self._SetStatus( CELL_STATUS_FALSEP )
-            
+
+
+#-------------------------------------------------------------------------------
+# A class to implement a single cell
+#-------------------------------------------------------------------------------
+class CellButton( CellBase, tkinter.Label ):
+    """CellButton is the widget class which implement a single cell.
+    
+    It's a class derived from Tkinter.Label, so it is able to visualize
+    images. Every single cell is linked to the "real" cell in the
+    underlying minesweeper.Game instance."""
+    
+    def __init__( self, master, ucell ):
+        """Initialize a new CellButton instance.
+        
+        master: the cell master widget, usually the game table
+        ucell:  the underlying cell in the minesweeper.Game instance
+                which this cell is linked to."""
+        
+        tkinter.Label.__init__( self, master )
+        CellBase.__init__( self, ucell )
+        
+        self[ 'bd' ] = 0    # borderwidth = 0
+        row, col = self.ucell.GetCoordinates()
+        self.grid( row = row, column = col )
+        
+        # Add a bind tag. This assigns to all cells a common Tk widget class
+        tagsList = list( self.bindtags() )
+        tagsList.append( self.__class__.__name__ )
+        self.bindtags( tuple( tagsList ) )
+
+
+#-------------------------------------------------------------------------------
+# A class to implement a single cell on the table canvas
+#-------------------------------------------------------------------------------
+class CanvasCell( CellBase ):
+    """CanvasCell implements a single cell as an image item of a Canvas.
+    
+    It's used by the canvas renderer, which draws the whole table on a
+    single Canvas widget instead of a Label for every cell."""
+    
+    def __init__( self, canvas, ucell, width, height ):
+        """Initialize a new CanvasCell instance.
+        
+        canvas:         the canvas where the cell is drawn
+        ucell:          the underlying cell in the minesweeper.Game instance
+                        which this cell is linked to
+        width, height:  the size of a cell on the canvas."""
+        
+        CellBase.__init__( self, ucell )
+        self.canvas = canvas
+        row, col = self.ucell.GetCoordinates()
+        self.item = canvas.create_image( col * width, row * height, anchor = NW )
+        
+    def __setitem__( self, key, value ):
+        """Configure the image item, e.g. cell[ 'image' ] = image."""
+        self.canvas.itemconfigure( self.item, { key: value } )
+        
+    def destroy( self ):
+        """Remove the cell from the canvas."""
+        self.canvas.delete( self.item )
+
+
+#-------------------------------------------------------------------------------
+# The event passed to the table handlers by the canvas renderer
+#-------------------------------------------------------------------------------
+class CanvasEvent:
+    """A mouse event on a CanvasCell: like a Tk event on a CellButton, its
+    widget attribute is the cell where the event happened."""
+    
+    def __init__( self, widget ):
+        self.widget = widget
 
           
         
@@ -290,8 +686,9 @@ class CellButton( tkinter.Label ):
 class MinesweeperTable( Frame ):
     """A class to implement a Minesweeper panel.
     
-    Actually it is a matrix of CellButton instances. It is linked to a instance
-    of minesweeper.Game: the real underlying game."""
+    Actually it is a matrix of CellButton instances (or of CanvasCell instances
+    drawn on a single canvas, with the canvas renderer). It is linked to a
+    instance of minesweeper.Game: the real underlying game."""
     
     
     def __init__( self, master = None, game = None ):
@@ -302,65 +699,204 @@ class MinesweeperTable( Frame ):
                 If None __init__() create a random new one."""
         Frame.__init__( self, master )
         
-        # Init the game
-        if game:
-            self.game = game
-        else:
+        # The cells, and the borders of the table on their right and bottom
+        # sides. They are created by create_cells() and reused by the next
+        # games
+        self.cells = []
+        self.rightBorders = []
+        self.bottomBorders = []
+        self.corner = None
+        
+        # The canvas where the cells are drawn by the canvas renderer, and its
+        # cell pressed by the mouse button 1
+        self.canvas = None
+        self.pressedCell = None
+        
+        # Create the status line
+        self.statusMessage = StringVar()
+        self.statusLabel = Label( self,
+                                  textvariable = self.statusMessage,
+                                  padding = ( 0, 3, 0, 3 ) )
+        
+        # Redraw only the cells changed by every move, and refresh the status
+        # line and the title once per batch of changes
+        self.refreshId = None
+        self.game = None
+        
+        # Whether the game has been won or lost: its moves can't be undone
+        self.ended = False
+        self.SetGame( game )
+        
+    def SetGame( self, game = None ):
+        """Show game on the table.
+        
+        game:   is an existing minesweeper.Game instance.
+                If None SetGame() create a random new one.
+        
+        The cells of the previous game are linked to the new one: only the
+        rows and columns which differ are created or destroyed."""
+        if not game:
             # If there is no existing game, create a new one using currently
             # active option for table dimension & mines number
-            self.game = minesweeper.Game(
+            game = minesweeper.Game(
                 options[ option ][ 'nrows' ],
                 options[ option ][ 'ncols' ],
                 options[ option ][ 'nmines' ]
             )
+        if self.game is not None:
+            self.game.RemoveListener( self.OnGameChanged )
+        self.game = game
+        self.ended = False
         nrows = len( self.game )
         ncols = len( self.game[ 0 ] )
         self.create_cells()
         self.UpdateAllCells()
+        self.game.AddListener( self.OnGameChanged )
         
-        # Create the status line
-        self.statusMessage = StringVar()
-        Label( self,
-               textvariable = self.statusMessage,
-               padding = ( 0, 3, 0, 3 )
-             ).grid( row = nrows + 1, column = 0, columnspan = ncols + 1 )
+        self.statusLabel.grid( row = nrows + 1, column = 0, columnspan = ncols + 1 )
         self.UpdateStatusMessage()
         
+    def FitCells( self, NewCell ):
+        """Fit the matrix of cells to the game size and link them to the game.
+        
+        The cells in excess are destroyed and the missing ones are created
+        by NewCell( ucell ), where ucell is the cell of the game."""
+        nrows = len( self.game )
+        ncols = len( self.game[ 0 ] )
+        
+        # Destroy the rows and the columns in excess
+        for row in self.cells[ nrows : ]:
+            for cell in row:
+                cell.destroy()
+        del self.cells[ nrows : ]
+        for row in self.cells:
+            for cell in row[ ncols : ]:
+                cell.destroy()
+            del row[ ncols : ]
+            
+        # Link the remaining cells to the new game: the views are built on
+        # the flat index, without a row of the game for every cell
+        game = self.game
+        for i, row in enumerate( self.cells ):
+            for j, cell in enumerate( row ):
+                cell.Link( minesweeper.CellView( game, i * ncols + j ) )
+                
+        # Create the missing ones
+        while len( self.cells ) < nrows:
+            self.cells.append( [] )
+        for i, row in enumerate( self.cells ):
+            for j in range( len( row ), ncols ):
+                row.append( NewCell( minesweeper.CellView( game, i * ncols + j ) ) )
+        
     def create_cells( self ):
-        """Create all the cell widgets in the table."""
+        """Create (or fit to a new game) all the cell widgets in the table."""
+        
+        if renderer == RENDERER_CANVAS:
+            self.create_canvas_cells()
+            return
 
         nrows = len( self.game )
         ncols = len( self.game[ 0 ] ) 
-        self.cells = []
-        for i in range( nrows ):
-            row = []
-            for j in range( ncols ):
-                cell = CellButton( self, self.game[ i ][ j ] )
-                row.append( cell )
-            self.cells.append( row )
+        self.FitCells( lambda ucell: CellButton( self, ucell ) )
+        
+        # Fit the rightbord images which close the rows
+        for label in self.rightBorders[ nrows : ]:
+            label.destroy()
+        del self.rightBorders[ nrows : ]
+        while len( self.rightBorders ) < nrows:
+            self.rightBorders.append(
+                tkinter.Label( self, bd = 0, image = images[ CELL_STATUS_RBORD ] ) )
+        for i, label in enumerate( self.rightBorders ):
+            label.grid( row = i, column = ncols )
             
-            # Append a rightbord image to close the row
-            tkinter.Label( self,
-                           bd = 0,
-                           image = images[ CELL_STATUS_RBORD ]
-                         ).grid( row = i, column = len( row ) )
-            
-        # Create the bottom border
-        for j in range( ncols ):
-            tkinter.Label( self,
-                           bd = 0,
-                           image = images[ CELL_STATUS_BBORD ]
-                         ).grid( row = nrows, column = j )
+        # Fit the bottom border
+        for label in self.bottomBorders[ ncols : ]:
+            label.destroy()
+        del self.bottomBorders[ ncols : ]
+        while len( self.bottomBorders ) < ncols:
+            self.bottomBorders.append(
+                tkinter.Label( self, bd = 0, image = images[ CELL_STATUS_BBORD ] ) )
+        for j, label in enumerate( self.bottomBorders ):
+            label.grid( row = nrows, column = j )
                          
-        # Create the bottom right corner
-        tkinter.Label( self,
-                       bd = 0,
-                       image = images[ CELL_STATUS_CBORD ]
-                     ).grid( row = nrows, column = ncols )
+        # Place the bottom right corner
+        if self.corner is None:
+            self.corner = tkinter.Label( self, bd = 0, image = images[ CELL_STATUS_CBORD ] )
+        self.corner.grid( row = nrows, column = ncols )
         
         # Bind all used events on the cell widgets wiht the handlers
         self.BindAllEvents()
 
+    def create_canvas_cells( self ):
+        """Create (or fit to a new game) all the cells in the table as images
+        on a single canvas."""
+        
+        nrows = len( self.game )
+        ncols = len( self.game[ 0 ] )
+        self.cellWidth = width = images[ CELL_STATUS_COVERED ].width()
+        self.cellHeight = height = images[ CELL_STATUS_COVERED ].height()
+        if self.canvas is None:
+            self.canvas = tkinter.Canvas( self, bd = 0, highlightthickness = 0 )
+        self.canvas.grid( row = 0, column = 0, columnspan = ncols + 1 )
+        self.canvas[ 'width' ] = ncols * width + images[ CELL_STATUS_RBORD ].width()
+        self.canvas[ 'height' ] = nrows * height + images[ CELL_STATUS_BBORD ].height()
+        
+        self.FitCells( lambda ucell: CanvasCell( self.canvas, ucell, width, height ) )
+        
+        # Draw the right and bottom borders, and the bottom right corner
+        self.canvas.delete( 'border' )
+        for i in range( nrows ):
+            self.canvas.create_image( ncols * width, i * height, anchor = NW,
+                                      image = images[ CELL_STATUS_RBORD ], tags = 'border' )
+        for j in range( ncols ):
+            self.canvas.create_image( j * width, nrows * height, anchor = NW,
+                                      image = images[ CELL_STATUS_BBORD ], tags = 'border' )
+        self.canvas.create_image( ncols * width, nrows * height, anchor = NW,
+                                  image = images[ CELL_STATUS_CBORD ], tags = 'border' )
+        
+        # Bind all used events on the canvas wiht the handlers
+        self.BindAllEvents()
+        
+    def CellAt( self, x, y ):
+        """Return the CanvasCell at the canvas coordinates x, y (None if there
+        isn't any cell there)."""
+        if x < 0 or y < 0:
+            return None
+        i = y // self.cellHeight
+        j = x // self.cellWidth
+        if i < len( self.cells ) and j < len( self.cells[ 0 ] ):
+            return self.cells[ i ][ j ]
+        return None
+        
+    def OnCanvasButton1( self, event ):
+        """The mouse button 1 has pressed on the canvas: press the cell
+        under the cursor."""
+        self.pressedCell = self.CellAt( event.x, event.y )
+        if self.pressedCell is not None:
+            self.OnButton1( CanvasEvent( self.pressedCell ) )
+            
+    def OnCanvasB1Motion( self, event ):
+        """The mouse moves with button 1 pressed: the pressed cell gets
+        Leave and Enter as a CellButton would."""
+        cell = self.pressedCell
+        if cell is not None:
+            if self.CellAt( event.x, event.y ) is cell:
+                self.OnB1Enter( CanvasEvent( cell ) )
+            else:
+                self.OnB1Leave( CanvasEvent( cell ) )
+                
+    def OnCanvasButtonRelease1( self, event ):
+        """The mouse button 1 has released: release the pressed cell."""
+        cell = self.pressedCell
+        self.pressedCell = None
+        if cell is not None:
+            self.OnButtonRelease1( CanvasEvent( cell ) )
+            
+    def OnCanvasButton3( self, event ):
+        """Handler for the mouse right click on the canvas."""
+        cell = self.CellAt( event.x, event.y )
+        if cell is not None:
+            self.OnButton3( CanvasEvent( cell ) )
         
             
     def OnB1Enter( self, event ):
@@ -406,19 +942,13 @@ class MinesweeperTable( Frame ):
         i, j = cell.ucell.GetCoordinates()
         
         if cell.pressed == CellButton.PRESSED:
+            # The changed cells are redrawn by OnGameChanged()
             if cell.DoesShowANumber():
                 self.PushNeighbours( cell, False)
                 bomb = self.game.Free(i, j)
-                self.UpdateAllCells()
-                self.UpdateStatusMessage()
             else:
                 bomb = self.game.Uncover( i, j )
             
-            if self.game[ i ][ j ].GetNeighborMinesNum() == 0:
-                self.UpdateAllCells()
-            else:
-                cell.Update()
-            
             if bomb:
                 # If there is a bomd, you loose
                 print( _("Bomb! Game over...") )
@@ -427,9 +957,6 @@ class MinesweeperTable( Frame ):
                 # If there's no more bombs to discover, you win
                 print( _("You won!!!") )
                 self.EndWinning()
-            else:
-                # Neither defeat nor victory: update the window's title
-                self.master.RefreshTitle()
 
         cell.pressed = CellButton.UNPRESSED            
 
@@ -440,29 +967,50 @@ class MinesweeperTable( Frame ):
         status = event.widget.GetStatus()
         i, j = event.widget.ucell.GetCoordinates()
         
+        # The cell, the status line and the title are refreshed by OnGameChanged()
         if status == CELL_STATUS_COVERED:
             # Put a flag
             self.game.Flag( i, j )
-            event.widget.Update()
-            self.UpdateStatusMessage()
         elif status == CELL_STATUS_FLAG:
             # Remove flag and put a question mark
             self.game.QMark( i, j )
-            event.widget.Update()
-            self.UpdateStatusMessage()
         elif status == CELL_STATUS_QMARK:
             # Remove question mark (and put nothing)
             self.game.QMark( i, j, True )
-            event.widget.Update()
-            
-        self.master.RefreshTitle()
         
 
     def UpdateAllCells( self ):
-        """Update all cells on the table from the underlying minesweeper.Game instance."""
+        """Update all cells on the table from the underlying minesweeper.Game
+        instance, reading all its arrays at once."""
+        displays = DisplayStatuses( self.game )
+        k = 0
         for row in self.cells:
             for cell in row:
-                cell.Update()
+                cell._SetStatus( displays[ k ] )
+                k += 1
+                
+    def OnGameChanged( self, game, changes ):
+        """Game listener: update the changed cells and schedule a refresh of
+        the status line and of the title."""
+        ncols = len( self.cells[ 0 ] )
+        for k, oldStatus in changes:
+            self.cells[ k // ncols ][ k % ncols ]._SetStatus( DisplayStatus( game, k ) )
+        if self.refreshId is None:
+            self.refreshId = self.after_idle( self.RefreshStatus )
+            
+    def RefreshStatus( self ):
+        """Refresh the status line and the window's title after some moves."""
+        self.refreshId = None
+        self.UpdateStatusMessage()
+        self.master.RefreshTitle()
+        
+    def destroy( self ):
+        """Detach the table from the game before destroying it."""
+        self.game.RemoveListener( self.OnGameChanged )
+        if self.refreshId is not None:
+            self.after_cancel( self.refreshId )
+            self.refreshId = None
+        Frame.destroy( self )
                 
                 
     def EndLoosing( self ):
@@ -475,6 +1023,8 @@ class MinesweeperTable( Frame ):
         
         self.UnbindAllEvents()
         self.game.SetModified( False )
+        self.ended = True
+        self.master.RefreshTitle()
         
         # Ask for Exit, Replay, Play a new game
         dialog = tkinter.dialog.Dialog(
@@ -510,6 +1060,8 @@ class MinesweeperTable( Frame ):
         self.UnbindAllEvents()
                         
         self.game.SetModified( False )
+        self.ended = True
+        self.master.RefreshTitle()
                 
         # Ask for Exit, Play a new game
         dialog = tkinter.dialog.Dialog(
@@ -529,14 +1081,21 @@ class MinesweeperTable( Frame ):
             
         
     def Restart( self ):
-        """Restart the game with the same mines' set."""
-        for row in self.cells:
-            for cell in row:
-                cell.destroy()
+        """Restart the game with the same mines' set, reusing the cells."""
         self.game.Restart()
-        self.create_cells()
-        self.UpdateAllCells()
-        self.UpdateStatusMessage()
+        self.SetGame( self.game )
+        
+    def Undo( self ):
+        """Undo the last move, unless the game has ended. The changed cells
+        are redrawn by OnGameChanged()."""
+        if not self.ended:
+            self.game.Undo()
+        
+    def Redo( self ):
+        """Redo the last undone move, unless the game has ended. The changed
+        cells are redrawn by OnGameChanged()."""
+        if not self.ended:
+            self.game.Redo()
         
     def UpdateStatusMessage( self ):
         """Ask the beyond game for data to update the status message."""
@@ -552,6 +1111,15 @@ class MinesweeperTable( Frame ):
         
     def BindAllEvents( self ):
         """Bind all used events on the cells."""
+        if self.canvas is not None:
+            self.canvas.bind( '<Button-1>', self.OnCanvasButton1 )
+            self.canvas.bind( '<B1-Motion>', self.OnCanvasB1Motion )
+            self.canvas.bind( '<ButtonRelease-1>', self.OnCanvasButtonRelease1 )
+            self.canvas.bind( '<Button-3>', self.OnCanvasButton3 )
+            self.canvas.bind( '<Control-Button-1>', self.OnCanvasButton3 )
+            self.canvas.bind( '<Button-2>', self.OnCanvasButton3 )
+            return
+            
         self.bind_class( CellButton.__name__, '<Button-1>', self.OnButton1 )
         self.bind_class( CellButton.__name__, '<B1-Leave>', self.OnB1Leave )
         self.bind_class( CellButton.__name__, '<B1-Enter>', self.OnB1Enter )
@@ -563,6 +1131,13 @@ class MinesweeperTable( Frame ):
         
     def UnbindAllEvents( self ):
         """Unbind all used events from the cells."""
+        if self.canvas is not None:
+            for sequence in ( '<Button-1>', '<B1-Motion>', '<ButtonRelease-1>',
+                              '<Button-3>', '<Control-Button-1>', '<Button-2>' ):
+                self.canvas.unbind( sequence )
+            self.pressedCell = None
+            return
+            
         self.unbind_class( CellButton.__name__, '<Button-1>' )
         self.unbind_class( CellButton.__name__, '<B1-Leave>' )
         self.unbind_class( CellButton.__name__, '<B1-Enter>' )
@@ -574,16 +1149,17 @@ class MinesweeperTable( Frame ):
     def PushNeighbours( self, centerCell, push = True ):
         """Push/unpush all the covered cells in the neighborhood"""
         i, j = centerCell.ucell.GetCoordinates()
-        for ii in range( i - 1, i + 2):
-            for jj in range( j - 1, j + 2):
-                if ii >= 0 and ii < len( self.game ) and jj >= 0 and jj < len( self.game[ 0 ]):
-                    cell = self.cells[ ii ][ jj ]
-                    status = cell.GetStatus()
-                    if status == CELL_STATUS_COVERED or status == CELL_STATUS_QMARK:
-                        if push:
-                            cell[ 'image' ] = images[ CELL_STATUS_PRESSED ]
-                        else:
-                            cell[ 'image' ] = images[ status ]
+        ncols = len( self.game[ 0 ] )
+        offsets, indices = minesweeper.NeighborTable( len( self.game ), ncols )
+        k = i * ncols + j
+        for n in indices[ offsets[ k ] : offsets[ k + 1 ] ]:
+            cell = self.cells[ n // ncols ][ n % ncols ]
+            status = cell.GetStatus()
+            if status == CELL_STATUS_COVERED or status == CELL_STATUS_QMARK:
+                if push:
+                    cell[ 'image' ] = images[ CELL_STATUS_PRESSED ]
+                else:
+                    cell[ 'image' ] = images[ status ]
 
 #-------------------------------------------------------------------------------
 # My Options Window
@@ -694,11 +1270,18 @@ class OptionWindow( Toplevel ):
         options window."""
         global option, options
         
+        size = ActiveSize()
         option = self.choice.get()
         options[ 3 ][ 'nrows' ] = self.height.get()
         options[ 3 ][ 'ncols' ] = self.width.get()
         options[ 3 ][ 'nmines' ] = self.mines.get()
-        self.master.persData.SaveOptions( option, options[ 3 ] )
+        self.master.persData.SaveOptions( option, options[ 3 ], noGuess )
+        if ActiveSize() != size:
+            # The boards made in advance for the old size won't be played
+            self.master.nextBoard.Forget( *size )
+            if self.master.boardPool is not None:
+                self.master.boardPool.Forget( *size )
+        self.master.RefreshNoGuess()
         self.destroy()
         self.master.onNewGame()
 
@@ -829,11 +1412,8 @@ class RootWindow( Tk ):
         """Init my toplevel window."""
         Tk.__init__( self )
         
-        # Create the images lists
-        for name in imagesFilenames:
-            img = PhotoImage()
-            img[ 'file' ] = name
-            images.append( img )
+        # The images are read when first displayed
+        images.Clear()
 
         # Create the menus
         self.menubar = Menu( self )
@@ -849,20 +1429,47 @@ class RootWindow( Tk ):
         self.menu_file.entryconfigure( self.menu_file.index( _( 'Load' ) ), state = 'disabled' )
         self.menu_file.add_command( label = _( 'Save' ), command = self.OnSave )
         self.menu_file.add_command( label = _( 'Options...' ), command = self.onOptions )
+        self.noGuess = BooleanVar( self )
+        self.menu_file.add_checkbutton( label = _( 'No guessing' ), variable = self.noGuess,
+                                        command = self.OnNoGuess )
         self.menu_file.add_separator()
         self.menu_file.add_command( label = _( 'Quit' ), command = self.onQuit )
         
+        # Menu Edit, with Ctrl+Z and Ctrl+Y (Command on Macintosh) shortcuts
+        if self.tk.call( 'tk', 'windowingsystem' ) == "aqua":
+            modifier, accelerator = "Command", "Command-"
+        else:
+            modifier, accelerator = "Control", "Ctrl+"
+        self.menu_edit = Menu( self.menubar )
+        self.menubar.add_cascade( menu = self.menu_edit, label = _( 'Edit' ) )
+        self.menu_edit.add_command( label = _( 'Undo' ), command = self.OnUndo,
+                                    accelerator = accelerator + "Z" )
+        self.menu_edit.add_command( label = _( 'Redo' ), command = self.OnRedo,
+                                    accelerator = accelerator + "Y" )
+        # They are bound on the main window only, not in the dialogs
+        self.bind( "<%s-z>" % modifier, lambda event: self.OnUndo() )
+        self.bind( "<%s-y>" % modifier, lambda event: self.OnRedo() )
+        
         # Load options from save file. If there is a valid game in the file,
-        # enable File->Load command
-        self.persData = PersistentData( SAVE_FILE_NAME )
-        global option, options
+        # enable File->Load command: the game itself is read by File->Load
+        self.persData = PersistentData( SAVE_FILE_NAME, OPTIONS_FILE_NAME, AUTOSAVE_FILE_NAME )
+        global option, options, noGuess
+        if self.persData.HasGame():
+            self.menu_file.entryconfigure( self.menu_file.index( _( 'Load' ) ), state = 'normal' )
         try:
-            game = self.persData.LoadGame()
-            if type( game ) == minesweeper.Game:
-                self.menu_file.entryconfigure( self.menu_file.index( _( 'Load' ) ), state = 'normal' )
-            option, options[ 3 ] = self.persData.LoadOptions()
-        except IOError:
+            option, options[ 3 ], noGuess = self.persData.LoadOptions()
+        except ( IOError, minesweeper.MinesweeperError ):
             pass
+        self.noGuess.set( noGuess )
+        
+        # The boards without guesses are made in advance by worker processes,
+        # started by NoGuessPool() the first time they are requested. The
+        # next common board is made by a thread while the current one is shown
+        self.executor = None
+        self.boardPool = None
+        self.boardThread = concurrent.futures.ThreadPoolExecutor( max_workers = 1 )
+        self.nextBoard = minesweeperpool.BoardPool( minesweeper.Game, self.boardThread, size = 1 )
+        self.RefreshNoGuess()
             
         
         # Menu Help
@@ -880,16 +1487,69 @@ class RootWindow( Tk ):
         
         # Create a new game
         self.onNewGame()
+        
+        # Autosave the game, and offer the game autosaved by a previous run
+        # which didn't quit (as soon as the window is shown): autosaving
+        # starts once the user has answered, not to remove that game before
+        self.autoSaver = AutoSaver( self, self.persData )
+        if self.persData.HasAutoSavedGame():
+            self.after_idle( self.OfferRestore )
+        else:
+            self.autoSaver.Start()
 
 
     def onNewGame( self ):
         """Handler of File->New game command."""
+        # A board made in advance if ready, otherwise a common game at once:
+        # the pools make the next ones meanwhile
+        size = ActiveSize()
+        game = ( ( self.PopNoGuessGame() if noGuess else None ) or self.nextBoard.Pop( *size )
+                 or minesweeper.Game( *size ) )
         if hasattr( self, 'table' ):
-            self.table.destroy()
-
-        self.table = MinesweeperTable( self )
-        self.table.grid()
+            # Reuse the table widgets for the new game
+            self.table.SetGame( game )
+        else:
+            self.table = MinesweeperTable( self, game )
+            self.table.grid()
         self.RefreshTitle()
+        
+    def PopNoGuessGame( self ):
+        """Return a game without guesses of the active size, from the pool
+        of the boards made in advance (None if none is ready yet, or if the
+        boards of the size can't be made)."""
+        size = ActiveSize()
+        if not minesweepersolver.CanBeNoGuess( *size ) or self.NoGuessPool().Failed( *size ):
+            return None
+        return self.boardPool.Pop( *size )
+        
+    def NoGuessPool( self ):
+        """Return the pool of the boards without guesses, starting its worker
+        processes the first time.
+        
+        The workers leave a CPU to the game. They are spawned, not forked:
+        a fork would copy the state of Tk and of the running threads."""
+        if self.boardPool is None:
+            import multiprocessing
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers = max( ( os.cpu_count() or 1 ) - 1, 1 ),
+                mp_context = multiprocessing.get_context( 'spawn' ) )
+            self.boardPool = minesweeperpool.BoardPool( minesweepersolver.NoGuessGame,
+                                                        self.executor, BOARDS_DIR_NAME )
+        return self.boardPool
+        
+    def RefreshNoGuess( self ):
+        """Disable File->No guessing when the mines of the active size are
+        too dense to avoid guessing."""
+        state = 'normal' if minesweepersolver.CanBeNoGuess( *ActiveSize() ) else 'disabled'
+        self.menu_file.entryconfigure( self.menu_file.index( _( 'No guessing' ) ), state = state )
+            
+    def OnNoGuess( self ):
+        """Handler of File->No guessing command: it applies from the next game."""
+        global noGuess
+        noGuess = self.noGuess.get()
+        self.persData.SaveOptions( option, options[ 3 ], noGuess )
+        if noGuess and minesweepersolver.CanBeNoGuess( *ActiveSize() ):
+            self.NoGuessPool().Fill( *ActiveSize() )
 
     def onReplayThisGame( self ):
         """Handler of File->Replay this game command."""
@@ -913,6 +1573,10 @@ class RootWindow( Tk ):
                                              message = _("Are you shure you want to quit?") )
         
         if confirm:
+            self.autoSaver.Stop()
+            if self.executor is not None:
+                self.executor.shutdown( wait = False, cancel_futures = True )
+            self.boardThread.shutdown( wait = False, cancel_futures = True )
             self.destroy()
             
     def OnSave( self ):
@@ -924,13 +1588,52 @@ class RootWindow( Tk ):
 
     def OnLoad( self ):
         """Load game from ~/.minesweeptk_save."""
-        game = self.persData.LoadGame()
-        self.table.destroy()
-        self.table = MinesweeperTable( self, game )
+        # HasGame() reads only the header: the rest of the file can still be
+        # damaged or truncated
+        try:
+            game = self.persData.LoadGame()
+        except ( IOError, minesweeper.MinesweeperError ) as e:
+            game = None
+            error = e
+        else:
+            error = _( "No game has been saved" )
+        if game is None:
+            import tkinter.messagebox
+            tkinter.messagebox.showerror( title = _( "Load" ),
+                message = _( "The saved game can't be loaded: %s" ) % error )
+            self.menu_file.entryconfigure( self.menu_file.index( _( 'Load' ) ), state = 'disabled' )
+            return
+        self.table.SetGame( game )
         self.table.game.SetModified( False )
-        self.table.grid()
         self.RefreshTitle()
                 
+    def OnUndo( self ):
+        """Handler of Edit->Undo command."""
+        self.table.Undo()
+        
+    def OnRedo( self ):
+        """Handler of Edit->Redo command."""
+        self.table.Redo()
+        
+    def OfferRestore( self ):
+        """Ask the user whether to restore the autosaved game, then start
+        autosaving."""
+        import tkinter.messagebox
+        restore = tkinter.messagebox.askyesno( title = _( "Restore" ),
+            message = _( "The last game wasn't saved before %s was closed. "
+                         "Do you want to restore it?" ) % APP_NAME )
+        if restore:
+            try:
+                game = self.persData.LoadAutoSavedGame()
+            except ( IOError, minesweeper.MinesweeperError ) as e:
+                tkinter.messagebox.showerror( title = _( "Restore" ),
+                    message = _( "The last game can't be restored: %s" ) % e )
+            else:
+                self.table.SetGame( game )
+                self.table.game.SetModified( True )
+                self.RefreshTitle()
+        self.autoSaver.Start()
+                
     def OnAbout( self ):
         """Visualize an About dialog and exit."""
         import tkinter.messagebox
@@ -954,22 +1657,42 @@ class RootWindow( Tk ):
         
         
     def RefreshTitle( self ):
-        """Refresh the title string in base of the underlying game table."""
+        """Refresh the title string, and the Edit menu, in base of the
+        underlying game table."""
         try:
             modSign = "*" if self.table.IsModified() else ""
+            canUndo = self.table.game.CanUndo() and not self.table.ended
+            canRedo = self.table.game.CanRedo() and not self.table.ended
         except AttributeError:
             modSign = ""
+            canUndo = canRedo = False
             
         newTitle = modSign + APP_NAME
         if self.title() != newTitle:
             self.title( newTitle )
+        self.menu_edit.entryconfigure( self.menu_edit.index( _( 'Undo' ) ),
+                                       state = 'normal' if canUndo else 'disabled' )
+        self.menu_edit.entryconfigure( self.menu_edit.index( _( 'Redo' ) ),
+                                       state = 'normal' if canRedo else 'disabled' )
         
 
 if __name__ == '__main__':
     """It means that the module is opened as an application."""
+    # The worker processes of a frozen application start from here
+    import multiprocessing
+    multiprocessing.freeze_support()
+    
     # Init the I18N stuff
     InitI18n()
     
+    # Choose the renderer of the table. Unknown arguments (as the ones
+    # passed by the macOS launcher) are ignored
+    import argparse
+    parser = argparse.ArgumentParser( prog = APP_NAME )
+    parser.add_argument( '--renderer', choices = ( RENDERER_LABELS, RENDERER_CANVAS ),
+                         default = renderer, help = _( "how to draw the table" ) )
+    renderer = parser.parse_known_args()[ 0 ].renderer
+    
     # Create the root window
     root = RootWindow()
 
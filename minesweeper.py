@@ -7,6 +7,14 @@ The classes are:
     
 If game = Game(), the cells are addressed as game[i][j] where 0 <= i < nrows
 and 0 <= j < ncols.
+
+Game doesn't keep a Cell instance for every cell: the whole table is stored in
+flat bytearrays and game[i][j] returns a CellView, a lightweight object with the
+same interface of Cell which reads and writes those arrays.
+
+Dump() and Load() (or Dumps() and Loads()) save and read a game in a compact,
+versioned binary format. A Journal records the moves of a game in an
+append-only file, and Recover() rebuilds the game from it.
 """
 
 
@@ -16,6 +24,15 @@ __date__      = "$Date$"
 __copyright__ = "Copyright © 2012-2023 Alessandro Morgantini"
 __license__   = "GPLv2"
 
+import array
+import copyreg
+import functools
+import io
+import os
+import random
+import struct
+import sys
+
 
 # Release version
 VERSION = "0.12"
@@ -35,6 +52,95 @@ class MinesweeperCellError( MinesweeperError ):
 
 class MinesweeperMinesCount( MinesweeperError ):
     pass
+    
+class MinesweeperFormatError( MinesweeperError ):
+    pass
+
+def _CheckTransition( oldstatus, newstatus ):
+    """Raise MinesweeperStatusError if oldstatus -> newstatus isn't allowed."""
+    if newstatus == oldstatus:
+        raise MinesweeperStatusError( "Error: can't reassign the same status" )
+    if oldstatus == Cell.FLAG and newstatus == Cell.REVEALED:
+        raise MinesweeperStatusError( "Error: can't do the transition FLAG -> REVEALED" )
+    if oldstatus == Cell.REVEALED:
+        raise MinesweeperStatusError( "Error: can't come back from REVEALED status" )
+
+
+@functools.lru_cache( maxsize = 8 )
+def NeighborTable( nrows, ncols ):
+    """Return the neighbors of every cell of a nrows x ncols table.
+
+    The result is a tuple ( offsets, indices ) of two arrays: the flat indexes
+    of the neighbors of cell k are indices[ offsets[ k ] : offsets[ k + 1 ] ],
+    sorted by row and column. The tables are built once for every size and
+    shared by all the games: don't modify them.
+    
+    Only a row for every set of rows around (the first, an inner and the last
+    row) is computed cell by cell. The other rows are the same row shifted by
+    whole rows: the shift is added to all its items at once, reading them as
+    a big integer with a field for every item."""
+    offsets = array.array( 'I', [ 0 ] )
+    indices = array.array( 'I' )
+    rowsOf = {}
+    for i in range( nrows ):
+        # The rows around, relative to i
+        around = tuple( row - i for row in ( i - 1, i, i + 1 ) if 0 <= row < nrows )
+        rowTable = rowsOf.get( around )
+        if rowTable is None:
+            first = i * ncols
+            ends = array.array( 'I' )
+            cells = array.array( 'I' )
+            for j in range( ncols ):
+                k = first + j
+                jmin = j - 1 if j > 0 else j
+                jmax = j + 2 if j < ncols - 1 else j + 1
+                for row in around:
+                    start = first + row * ncols
+                    cells.extend( n for n in range( start + jmin, start + jmax ) if n != k )
+                ends.append( len( cells ) )
+            rowTable = rowsOf[ around ] = ( first, _Fields( ends ), _Fields( cells ) )
+        first, ( ends, endsOnes, endsSize ), ( cells, cellsOnes, cellsSize ) = rowTable
+        end = len( indices )
+        indices.frombytes( ( cells + ( i * ncols - first ) * cellsOnes ).to_bytes( cellsSize, sys.byteorder ) )
+        offsets.frombytes( ( ends + end * endsOnes ).to_bytes( endsSize, sys.byteorder ) )
+    return ( offsets, indices )
+
+
+def _Fields( values ):
+    """Return the items of the array values as ( a big integer with a field
+    for every item, the integer with 1 in every field, its size in bytes )."""
+    data = values.tobytes()
+    ones = array.array( values.typecode, [ 1 ] ).tobytes() * len( values )
+    return ( int.from_bytes( data, sys.byteorder ), int.from_bytes( ones, sys.byteorder ), len( data ) )
+
+
+@functools.lru_cache( maxsize = 8 )
+def _ColumnMasks( nrows, ncols ):
+    """Return the masks, as big integers with a byte for every cell, of all
+    the columns but the first and of all the columns but the last."""
+    row = b'\xff' * ( ncols - 1 )
+    return ( int.from_bytes( ( b'\x00' + row ) * nrows, 'little' ),
+             int.from_bytes( ( row + b'\x00' ) * nrows, 'little' ) )
+
+
+def CountNeighbors( mines, nrows, ncols ):
+    """Return the number of neighbor mines of every cell of a nrows x ncols
+    table, as a bytearray. mines has a byte for every cell, 1 where there is
+    a mine (as Game.mines).
+    
+    The mines are read as a big integer with a byte for every cell: the sum
+    of its copies shifted by a column and by a row (masking the columns which
+    wrap around) counts the mines around every cell. No byte exceeds 9, so
+    there is no carry between cells."""
+    ncells = nrows * ncols
+    mines = int.from_bytes( mines, 'little' )
+    notFirstColumn, notLastColumn = _ColumnMasks( nrows, ncols )
+    rows = mines + ( ( mines << 8 ) & notFirstColumn ) + ( ( mines >> 8 ) & notLastColumn )
+    shift = 8 * ncols
+    counts = rows + ( rows << shift ) + ( rows >> shift ) - mines
+    counts &= ( 1 << ( 8 * ncells ) ) - 1
+    return bytearray( counts.to_bytes( ncells, 'little' ) )
+
 
 class Cell:
     """This is a class for a single cell.
@@ -98,29 +204,128 @@ class Cell:
         
     def SetStatus( self, newstatus ):
         """Set current status of the cell. Return the old status."""
-        if newstatus == self.status:
-            raise MinesweeperStatusError( "Error: can't reassign the same status" )
-        if self.status == Cell.FLAG and newstatus == Cell.REVEALED:
-            raise MinesweeperStatusError( "Error: can't do the transition FLAG -> REVEALED" )
-        if self.status == Cell.REVEALED:
-            raise MinesweeperStatusError( "Error: can't come back from REVEALED status" )
+        _CheckTransition( self.status, newstatus )
         oldstatus = self.status
         self.status = newstatus
         return oldstatus
         
+
+class CellView( Cell ):
+    """A lightweight Cell-compatible view on a single cell of a Game.
+    
+    A CellView doesn't hold any data: x, y, status, neighborMines and mine
+    are read from (and written to) the flat arrays of the Game it belongs to,
+    so all the Cell methods work unchanged on it."""
+    
+    def __init__( self, game, index ):
+        """Link the view to the cell number index (i * ncols + j) of game."""
+        self.game = game
+        self.index = index
+        
+    @property
+    def x( self ):
+        return self.index // self.game.ncols
+        
+    @property
+    def y( self ):
+        return self.index % self.game.ncols
+        
+    @property
+    def status( self ):
+        return self.game.statuses[ self.index ]
+        
+    @status.setter
+    def status( self, newstatus ):
+        self.game.statuses[ self.index ] = newstatus
+        
+    @property
+    def neighborMines( self ):
+        return self.game.neighbors[ self.index ]
+        
+    @neighborMines.setter
+    def neighborMines( self, neighbors ):
+        self.game._Unshare()
+        self.game.neighbors[ self.index ] = neighbors
+        self.game._openings = None
+        
+    @property
+    def mine( self ):
+        return bool( self.game.mines[ self.index ] )
+        
+    @mine.setter
+    def mine( self, mine ):
+        self.game._Unshare()
+        self.game.mines[ self.index ] = 1 if mine else 0
+        self.game._openings = None
+        
+    def __eq__( self, other ):
+        """Two views are equal if they look at the same cell of the same game."""
+        if not isinstance( other, CellView ):
+            return NotImplemented
+        return self.game is other.game and self.index == other.index
+        
+    def __hash__( self ):
+        return hash( ( id( self.game ), self.index ) )
+        
+    def __repr__( self ):
+        return "<CellView (%d, %d)>" % self.GetCoordinates()
+        
+
+class GameRow:
+    """A lightweight view on a row of a Game: row[j] returns a CellView."""
+    
+    __slots__ = ( 'game', 'i' )
+    
+    def __init__( self, game, i ):
+        """Link the view to the row i of game."""
+        self.game = game
+        self.i = i
+        
+    def __getitem__( self, j ):
+        """Return a view on the cell (i, j), or a list of them for a slice
+        (as the list of Cells of older releases)."""
+        ncols = self.game.ncols
+        if isinstance( j, slice ):
+            first = self.i * ncols
+            return [ CellView( self.game, first + n ) for n in range( *j.indices( ncols ) ) ]
+        if j < 0:
+            j += ncols
+        if j < 0 or j >= ncols:
+            raise IndexError( "column index out of range" )
+        return CellView( self.game, self.i * ncols + j )
+        
+    def __len__( self ):
+        """Return the number of columns."""
+        return self.game.ncols
+        
+    def __iter__( self ):
+        """Iterate on the cells of the row."""
+        first = self.i * self.game.ncols
+        for k in range( first, first + self.game.ncols ):
+            yield CellView( self.game, k )
+        
+        
 class Game( list ):
-    """A class for a whole minesweeper game."""
+    """A class for a whole minesweeper game.
+    
+    The table is kept in three flat bytearrays indexed by i * ncols + j:
+    statuses (a Cell status for every cell), mines (1 where there is a mine)
+    and neighbors (the number of neighbor mines). game[i][j] returns a
+    CellView on these arrays, so the game can be used as a matrix of Cells.
+    neighborTable is the NeighborTable() of the game size, shared with the
+    other games of the same size."""
     
-    def __init__( self, nrows = 16, ncols = 30, nmines = 99 ):
-        """Initialize a game with nrows, ncols and nmines set randomnly on the table."""
+    def __init__( self, nrows = 16, ncols = 30, nmines = 99, seed = None ):
+        """Initialize a game with nrows, ncols and nmines set randomnly on the table.
+        
+        seed is the seed of the random generator which places the mines (an
+        integer or a random.Random instance): games built with the same seed
+        have the same mines. If None, every game is different."""
         
         # Check for the acceptable mines number
         if nmines > nrows * ncols:
             raise MinesweeperMinesCount( "Too much mines!" )
         
-        # I have to create nrows list ncols cells
-        self.cells = []
-        
         # Set the started flag (initially False)
         self._modified = False
         
@@ -134,136 +339,401 @@ class Game( list ):
         # The number of flags on the game (initially 0)
         self.nflags = 0
         
+        # The functions to call when some cell changes
+        self._listeners = []
+        
+        # The Journal which records the moves, if any
+        self._journal = None
+        
         # Create all the cells
         self.CreateCells( nrows, ncols )
         
-        # Now I have to put nmines randomly in the cells
-        mines = []
-        while len( mines ) < nmines:
-            # Computes a random position for the mine. If it already exists, compute a new one
-            i, j = self.GetRandomPos()
-            while ( i, j ) in mines:
-                i, j = self.GetRandomPos()
-            mines.append( (i, j) )
-            self[ i ][ j ].SetMine()
+        # Now I have to put nmines randomly in the cells: sample() picks
+        # distinct cells in linear time at any density
+        rng = seed if isinstance( seed, random.Random ) else random.Random( seed )
+        for k in rng.sample( range( nrows * ncols ), nmines ):
+            self.mines[ k ] = 1
             
+        # Count the neighbor mines of every cell
+        self._CountNeighbors()
         
-        # Now I have a list of mines. For every mine I need to
-        # increment the number of neighbors in the neighbors cells
-        for i, j in mines:
-            for cell in self.GetNeighborsList( i, j ):
-                cell.IncNeighbors()
-        
-
 
     def __getitem__( self, index ):
-        """Game is a subclass of list, so it returns the index-th rows when asked."""
-        return self.cells[ index ]
+        """Game is a subclass of list, so it returns the index-th rows when asked
+        (a list of rows for a slice)."""
+        if isinstance( index, slice ):
+            return [ GameRow( self, i ) for i in range( *index.indices( self.nrows ) ) ]
+        if index < 0:
+            index += self.nrows
+        if index < 0 or index >= self.nrows:
+            raise IndexError( "row index out of range" )
+        return GameRow( self, index )
         
     
     def __len__( self ):
         """Return the number of rows."""
-        return len( self.cells )
+        return self.nrows
         
     def __iter__( self ):
         """Return an iterator object specifically for 'for'."""
-        return self.cells.__iter__()
+        for i in range( self.nrows ):
+            yield GameRow( self, i )
+            
+    def __reduce__( self ):
+        """Pickle only the arrays and the counters, not the rows as list items."""
+        return ( copyreg.__newobj__, ( self.__class__, ), self.__getstate__() )
+        
+    def __getstate__( self ):
+        """Return the instance state to pickle, without neighbor table,
+        listeners, journal and undo history."""
+        state = self.__dict__.copy()
+        for name in ( 'neighborTable', '_listeners', '_journal', '_undo', '_redo', '_openings', '_shared' ):
+            del state[ name ]
+        return state
+        
+    def __setstate__( self, state ):
+        """Restore a pickled game, converting the ones saved by older releases."""
+        if 'cells' in state:
+            # Older releases pickled a matrix of Cell instances (also as list
+            # items of the game): move them in the flat arrays
+            cells = state.pop( 'cells' )
+            list.clear( self )
+            self.__dict__.update( state )
+            self.CreateCells( len( cells ), len( cells[ 0 ] ) )
+            k = 0
+            for row in cells:
+                for cell in row:
+                    self.statuses[ k ] = cell.status
+                    self.neighbors[ k ] = cell.neighborMines
+                    self.mines[ k ] = 1 if cell.mine else 0
+                    k += 1
+        else:
+            self.__dict__.update( state )
+            self.neighborTable = NeighborTable( self.nrows, self.ncols )
+            self._ClearHistory()
+            self._openings = None
+            self._shared = False
+        self._listeners = []
+        self._journal = None
+
+    def _Index( self, i, j ):
+        """Return the flat index of the cell (i, j), raising IndexError if out of range."""
+        if i < 0:
+            i += self.nrows
+        if j < 0:
+            j += self.ncols
+        if i < 0 or i >= self.nrows or j < 0 or j >= self.ncols:
+            raise IndexError( "cell index out of range" )
+        return i * self.ncols + j
+        
+    def _NeighborIndices( self, k ):
+        """Return the flat indexes of the neighbors of cell k (as an array)."""
+        offsets, indices = self.neighborTable
+        return indices[ offsets[ k ] : offsets[ k + 1 ] ]
+
+    def _CountNeighbors( self ):
+        """Recompute the number of neighbor mines of every cell (see
+        CountNeighbors())."""
+        self.neighbors = CountNeighbors( self.mines, self.nrows, self.ncols )
+        self._openings = None
+        
+    def _Openings( self ):
+        """Return the index of the openings of the table, built the first time
+        it's needed after the mines are set: ( openingOf, openings, isolated ).
+        
+        An opening is a connected region of empty cells (no neighbor mines)
+        with the numbers around it: the cells uncovered by a click on any of
+        its empty cells. openingOf[ k ] is the opening of the empty cell k (-1
+        for the other cells), openings[ n ] the flat indexes of the cells of
+        the opening n, isolated the number of the cells without mine out of
+        every opening. It's a single labeling pass: every empty cell is
+        queued once."""
+        if self._openings is None:
+            mines = self.mines
+            neighbors = self.neighbors
+            offsets, indices = self.neighborTable
+            ncells = len( neighbors )
+            openingOf = array.array( 'i', [ -1 ] ) * ncells
+            
+            # The last opening which took every cell
+            label = array.array( 'i', [ -1 ] ) * ncells
+            openings = []
+            for k in range( ncells ):
+                if neighbors[ k ] or mines[ k ] or openingOf[ k ] >= 0:
+                    continue
+                n = len( openings )
+                openingOf[ k ] = label[ k ] = n
+                cells = [ k ]
+                pos = 0
+                while pos < len( cells ):
+                    z = cells[ pos ]
+                    pos += 1
+                    if neighbors[ z ]:
+                        continue
+                    for x in indices[ offsets[ z ] : offsets[ z + 1 ] ]:
+                        if label[ x ] != n:
+                            label[ x ] = n
+                            cells.append( x )
+                            if not neighbors[ x ]:
+                                openingOf[ x ] = n
+                openings.append( array.array( 'i', cells ) )
+            isolated = sum( 1 for k in range( ncells ) if label[ k ] < 0 and not mines[ k ] )
+            self._openings = ( openingOf, openings, isolated )
+        return self._openings
+        
+    def _OpeningIndices( self, k ):
+        """Return the flat indexes of the cells to uncover with the revealed
+        empty cell k, from the index of the openings: all the other cells of
+        its opening. Return None if some of them is revealed or flagged: the
+        flood fill has to stop there."""
+        openingOf, openings, isolated = self._Openings()
+        opening = openings[ openingOf[ k ] ]
+        statuses = self.statuses
+        toUncover = [ n for n in opening if statuses[ n ] == Cell.COVERED or statuses[ n ] == Cell.Q_MARK ]
+        if len( toUncover ) != len( opening ) - 1:
+            return None
+        return toUncover
+        
+    def _SetStatus( self, k, newstatus, changes ):
+        """Set the status of the cell k, appending ( k, old status ) to changes. Return the old status."""
+        oldstatus = self.statuses[ k ]
+        _CheckTransition( oldstatus, newstatus )
+        self.statuses[ k ] = newstatus
+        changes.append( ( k, oldstatus ) )
+        return oldstatus
         
+    def _Counters( self ):
+        """Return the counters changed by the moves, as saved in the undo history."""
+        return ( self.toDiscover, self.nflags, self._modified )
+        
+    def _Notify( self, move, k, changes, counters ):
+        """Push a move (one of the Journal moves, done on the cell k) on the
+        undo history with its changes and the counters before it, record it in
+        the journal, if any, and send its changes to all the listeners."""
+        if changes:
+            self._undo.append( ( changes, counters ) )
+            self._redo = []
+            if self._journal is not None:
+                self._journal.Record( self, move, k )
+            for listener in self._listeners:
+                listener( self, changes )
+                
+    def _ClearHistory( self ):
+        """Forget the moves to undo and redo."""
+        self._undo = []
+        self._redo = []
+        
+    def _Rollback( self, entry ):
+        """Restore the cells and the counters saved in an entry of the undo
+        history, sending the changes to the listeners. Return the entry which
+        restores them back."""
+        changes, counters = entry
+        statuses = self.statuses
+        undone = []
+        for k, status in reversed( changes ):
+            undone.append( ( k, statuses[ k ] ) )
+            statuses[ k ] = status
+        back = self._Counters()
+        self.toDiscover, self.nflags, self._modified = counters
+        if self._journal is not None:
+            # A journal replays only moves: restart it from here
+            self._journal.Start( self )
+        for listener in self._listeners:
+            listener( self, undone )
+        return ( undone, back )
+        
+    def Undo( self ):
+        """Undo the last move. Return False if there is no move to undo.
+        
+        Only the cells changed by the move are restored, so undoing a move
+        costs as much as the move, whatever the size of the table."""
+        if not self._undo:
+            return False
+        self._redo.append( self._Rollback( self._undo.pop() ) )
+        return True
+        
+    def Redo( self ):
+        """Redo the last undone move. Return False if there is no move to redo."""
+        if not self._redo:
+            return False
+        self._undo.append( self._Rollback( self._redo.pop() ) )
+        return True
+        
+    def CanUndo( self ):
+        """Return True if there is a move to undo."""
+        return bool( self._undo )
+        
+    def CanRedo( self ):
+        """Return True if there is a move to redo."""
+        return bool( self._redo )
+                
+    def AddListener( self, listener ):
+        """Call listener( game, changes ) after every move which changes any cell.
+        
+        changes is the list of the ( k, old status ) of the changed cells, in
+        the order they changed, where k = i * ncols + j: the new statuses are
+        the ones in the game. Listeners aren't pickled with the game."""
+        self._listeners.append( listener )
+        
+    def RemoveListener( self, listener ):
+        """Stop calling a listener added by AddListener()."""
+        self._listeners.remove( listener )
+        
+    def SetJournal( self, journal ):
+        """Record the moves which change some cell in journal (a Journal),
+        starting it with a snapshot of the game. None stops the recording:
+        the previous journal is closed."""
+        if self._journal is not None:
+            self._journal.Close()
+        self._journal = journal
+        if journal is not None:
+            journal.Start( self )
+            
     def GetNeighborsList( self, i, j = -1 ):
         """Compute a list of neighbors."""
-        li = []
         if j == -1:
             # then, i is the cell object
             j = i.y
             i = i.x
                 
-        imin = max( i - 1, 0 )
-        imax = min( i + 1, len( self ) - 1 )
-        jmin = max( j - 1, 0 )
-        jmax = min( j + 1, len( self[ 0 ] ) - 1 )
-        for ii in range( imin, imax + 1 ):
-            for jj in range( jmin, jmax + 1 ):
-                if ( ii, jj ) != ( i, j ): li.append( self[ ii ][ jj ] ) 
-                
-        return li
+        return [ CellView( self, k ) for k in self._NeighborIndices( self._Index( i, j ) ) ]
         
     def Uncover( self, i, j ):
         """Uncover the cell (i, j). Return True if there is a mine, False otherwise."""
-        cell = self[ i ][ j ]
-        oldStatus = cell.SetStatus( Cell.REVEALED )
+        changes = []
+        counters = self._Counters()
+        k = self._Index( i, j )
+        try:
+            return self._Uncover( k, changes )
+        finally:
+            self._Notify( Journal.UNCOVER, k, changes, counters )
+            
+    def _Uncover( self, k, changes ):
+        """Uncover the cell k, appending the changed cells to changes."""
+        oldStatus = self._SetStatus( k, Cell.REVEALED, changes )
         if oldStatus == Cell.FLAG:
             self.nflags -= 1
         self.toDiscover -= 1
         self._modified = True
-        if cell.HasMine():
+        if self.mines[ k ]:
             return True
             
-        # Undiscover the neighbords also, but only if this cell have non close mines
-        if not cell.GetNeighborMinesNum():
-            self.AutomaticUncover( cell )
+        # Undiscover the neighbords also, but only if this cell have non close mines:
+        # the whole opening at once, if the flood fill wouldn't stop before
+        if not self.neighbors[ k ]:
+            toUncover = self._OpeningIndices( k )
+            if toUncover is None:
+                self._AutomaticUncover( CellView( self, k ), changes )
+            else:
+                statuses = self.statuses
+                changes.extend( ( n, statuses[ n ] ) for n in toUncover )
+                for n in toUncover:
+                    statuses[ n ] = Cell.REVEALED
+                self.toDiscover -= len( toUncover )
                 
         return False
         
     def Free( self, i, j ):
         """Free the cell (i, j) from covered, but not flagged, close cells."""
+        changes = []
+        counters = self._Counters()
+        k = self._Index( i, j )
+        try:
+            return self._Free( k, changes )
+        finally:
+            self._Notify( Journal.FREE, k, changes, counters )
+            
+    def _Free( self, k, changes ):
+        """Free the cell k, appending the changed cells to changes."""
         
         explode = False
-        cell = self[i][j]
-        neighbors = self.GetNeighborsList( cell )
-        flags = []
+        statuses = self.statuses
+        flags = 0
         coveredOrQMarks = []
-        for c in neighbors:
-            if c.GetStatus() == Cell.FLAG:
-                flags.append( c )
-            elif c.GetStatus() == Cell.COVERED or c.GetStatus() == Cell.Q_MARK:
-                coveredOrQMarks.append( c )
+        for n in self._NeighborIndices( k ):
+            if statuses[ n ] == Cell.FLAG:
+                flags += 1
+            elif statuses[ n ] == Cell.COVERED or statuses[ n ] == Cell.Q_MARK:
+                coveredOrQMarks.append( n )
         
         # If there are mines to find, check if they are equal - in number - to the covered cells.
         # If so, flag these cells
-        minesToFindNum = cell.GetNeighborMinesNum() - len(flags)
+        minesToFindNum = self.neighbors[ k ] - flags
         if minesToFindNum != 0:
             if len(coveredOrQMarks) == minesToFindNum:
-                for c in coveredOrQMarks:
-                    ii, jj = c.GetCoordinates()
-                    self.Flag( ii, jj )
+                for n in coveredOrQMarks:
+                    self._Flag( n, False, changes )
             return explode
             
         
-        for c in coveredOrQMarks:
-            if c.GetStatus() != Cell.REVEALED:
-                ii, jj = c.GetCoordinates()
-                explode = explode or self.Uncover( ii, jj )
+        for n in coveredOrQMarks:
+            if statuses[ n ] != Cell.REVEALED:
+                explode = explode or self._Uncover( n, changes )
             
         return explode
         
     def AutomaticUncover( self, cell ):
         """Uncover a chain of cells by neighboroad relation."""
-        for myCell in self.GetAutoUncoverList( cell ):
-            oldStatus = myCell.SetStatus( Cell.REVEALED )
+        changes = []
+        counters = self._Counters()
+        try:
+            self._AutomaticUncover( cell, changes )
+        finally:
+            self._Notify( Journal.AUTO_UNCOVER, self._Index( *cell.GetCoordinates() ), changes, counters )
+            
+    def _AutomaticUncover( self, cell, changes ):
+        """Uncover a chain of cells, appending them to changes."""
+        for k in self._AutoUncoverIndices( cell ):
+            oldStatus = self._SetStatus( k, Cell.REVEALED, changes )
             if oldStatus == Cell.FLAG:
                 self.nflags -= 1
             self.toDiscover -= 1
             
     def GetAutoUncoverList( self, cell ):
         """Return the list of cells to uncover automatically, starting from the supplied cell."""
+        return [ CellView( self, k ) for k in self._AutoUncoverIndices( cell ) ]
+        
+    def _AutoUncoverIndices( self, cell ):
+        """Return the flat indexes of the cells to uncover automatically from cell.
+        
+        It is a breadth first flood fill: a visited bitmap keeps every cell
+        from being queued more than once."""
         if cell.GetNeighborMinesNum():
             raise MinesweeperAutoUncoverError( "Error: can't automatic uncovers cells with some close mine!" )
         
-        myFiltFunction = lambda x: x.GetStatus() != Cell.REVEALED and x.GetStatus() != Cell.FLAG
-        toUncover = list( filter( myFiltFunction, self.GetNeighborsList( cell ) ) )
-        for nei in toUncover:
-            if not nei.GetNeighborMinesNum():
-                neiToUncover = list( filter( myFiltFunction, [ item for item in self.GetNeighborsList( nei ) if not item in toUncover ] ) )
-                toUncover.extend( neiToUncover )
+        statuses = self.statuses
+        neighbors = self.neighbors
+        offsets, indices = self.neighborTable
+        visited = bytearray( len( statuses ) )
+        toUncover = []
+        queue = [ self._Index( *cell.GetCoordinates() ) ]
+        pos = 0
+        while pos < len( queue ):
+            k = queue[ pos ]
+            for n in indices[ offsets[ k ] : offsets[ k + 1 ] ]:
+                if not visited[ n ] and statuses[ n ] != Cell.REVEALED and statuses[ n ] != Cell.FLAG:
+                    visited[ n ] = 1
+                    toUncover.append( n )
+                    if not neighbors[ n ]:
+                        queue.append( n )
+            pos += 1
                 
         return toUncover
         
-            
-        
     def Flag( self, i, j, reset = False ):
         """Set/Reset a flag."""
+        changes = []
+        counters = self._Counters()
+        k = self._Index( i, j )
+        try:
+            self._Flag( k, reset, changes )
+        finally:
+            self._Notify( Journal.UNFLAG if reset else Journal.FLAG, k, changes, counters )
+            
+    def _Flag( self, k, reset, changes ):
+        """Set/Reset a flag on the cell k, appending it to changes."""
         newStatus = Cell.COVERED if reset else Cell.FLAG
-        oldStatus = self[ i ][ j ].SetStatus( newStatus )
+        oldStatus = self._SetStatus( k, newStatus, changes )
         
         # Set the started flag
         self._modified = True
@@ -277,10 +747,14 @@ class Game( list ):
     def QMark( self, i, j, reset = False ):
         """Set/Reset a question mark."""
         newstatus = Cell.COVERED if reset else Cell.Q_MARK
-        oldstatus = self[ i ][ j ].SetStatus( newstatus )
+        changes = []
+        counters = self._Counters()
+        k = self._Index( i, j )
+        oldstatus = self._SetStatus( k, newstatus, changes )
         self._modified = True
         if oldstatus == Cell.FLAG:
             self.nflags -= 1
+        self._Notify( Journal.UNQMARK if reset else Journal.QMARK, k, changes, counters )
         
         
     def GetToDiscover( self ):
@@ -288,58 +762,115 @@ class Game( list ):
         return self.toDiscover
         
     def SetMines( self, minesList ):
-        """Set a known minelist. minesList is a list of coordinates."""
-        for row in self:
-            for cell in row:
-                cell.SetMine( not cell.GetCoordinates() in minesList )
-                # Reset the number of neighbors
-                cell.SetNeighbors( 0 )
-                
-        # I have a list of mines. For every mine I need to
-        # increment the number of neighbors in the neighbors cells
+        """Set a known minelist. minesList is an iterable of coordinates.
+        
+        It runs in linear time in the number of cells and of mines."""
+        self._Unshare()
+        self.mines[ : ] = bytes( self.nrows * self.ncols )
         for i, j in minesList:
-            for cell in self.GetNeighborsList( i, j ):
-                cell.IncNeighbors()
+            self.mines[ self._Index( i, j ) ] = 1
+        self._CountNeighbors()
+        
+        # The moves done so far don't apply to the new mines
+        self._ClearHistory()
+        if self._journal is not None:
+            self._journal.Start( self )
                 
+    def GetOpeningsNum( self ):
+        """Return the number of openings (regions of empty cells, with their
+        border of numbers) of the table."""
+        return len( self._Openings()[ 1 ] )
+        
+    def GetIsolatedNum( self ):
+        """Return the number of cells without mine which aren't part of an opening."""
+        return self._Openings()[ 2 ]
+        
+    def Get3BV( self ):
+        """Return the 3BV of the table: the least number of clicks which
+        uncover it, one for every opening and one for every isolated number."""
+        openingOf, openings, isolated = self._Openings()
+        return len( openings ) + isolated
+        
     def GetMines( self ):
         """Return a list of coordinates of current mines."""
-        mines = []
-        for row in self:
-            for cell in row:
-                if cell.HasMine():
-                    mines.append( cell.GetCoordinates() )            
-        return mines
+        ncols = self.ncols
+        return [ divmod( k, ncols ) for k, mine in enumerate( self.mines ) if mine ]
         
-    def Restart( self ):
-        """Reinit the game with the same mine list."""
-        mines = self.GetMines()
-        nrows = len( self )
-        ncols = len( self[ 0 ] )
+    def Snapshot( self ):
+        """Return a copy of the game, without listeners, journal and undo
+        history, which doesn't change when the game changes.
         
-        # Recreate the cells matrix
-        self.CreateCells( nrows, ncols )
+        Only the flat arrays are copied, so it's cheap enough to be called
+        while the game is played (e.g. to save the copy on another thread)."""
+        snapshot = Game.__new__( Game )
+        snapshot.__dict__.update( self.__dict__ )
+        snapshot.statuses = bytearray( self.statuses )
+        snapshot.mines = bytearray( self.mines )
+        snapshot.neighbors = bytearray( self.neighbors )
+        snapshot._shared = False
+        snapshot._listeners = []
+        snapshot._journal = None
+        snapshot._ClearHistory()
+        return snapshot
+        
+    def Fork( self ):
+        """Return a copy of the game to try moves on (e.g. in a look-ahead
+        search), without listeners, journal and undo history. The moves of
+        the fork don't change the game, and the other way round.
+        
+        Only the statuses are copied. The mines, the neighbor counts and the
+        index of the openings, which the moves don't change, are shared until
+        the mines of one of the games are set: then it copies them first. The
+        index is built here, once for all the forks of the game."""
+        self._Openings()
+        fork = Game.__new__( Game )
+        fork.__dict__.update( self.__dict__ )
+        fork.statuses = bytearray( self.statuses )
+        fork._listeners = []
+        fork._journal = None
+        fork._ClearHistory()
+        self._shared = fork._shared = True
+        return fork
         
-        # Reset mines, counters & flags
-        self.SetMines( mines )
-        self.toDiscover = nrows * ncols - len( mines )
+    def _Unshare( self ):
+        """Copy the mines and the neighbor counts shared with a fork, before
+        changing them."""
+        if self._shared:
+            self.mines = bytearray( self.mines )
+            self.neighbors = bytearray( self.neighbors )
+            self._shared = False
+        
+    def Restart( self ):
+        """Reinit the game with the same mine list.
+        
+        Only the statuses and the counters are reset, in place: the mines and
+        the neighbor counts are kept."""
+        self.statuses[ : ] = bytes( len( self.statuses ) )      # All Cell.COVERED
+        self.toDiscover = len( self.mines ) - self.mines.count( 1 )
         self.nflags = 0
         self._modified = False
         
+        # The moves done so far don't apply to the restarted game
+        self._ClearHistory()
+        if self._journal is not None:
+            self._journal.Start( self )
+        
         
     def CreateCells( self, nrows, ncols ):
-        """(Re)create the cells matrix, erasing the possible exiting one."""
+        """(Re)create the cells arrays, erasing the possible exiting ones."""
         
-        self.cells = []
-        for i in range( nrows ):
-            row = []
-            for j in range( ncols ):
-                row.append( Cell( i, j ) )
-                
-            self.cells.append( row )
+        self.nrows = nrows
+        self.ncols = ncols
+        self.statuses = bytearray( nrows * ncols )      # All Cell.COVERED
+        self.mines = bytearray( nrows * ncols )
+        self.neighbors = bytearray( nrows * ncols )
+        self.neighborTable = NeighborTable( nrows, ncols )
+        self._openings = None
+        self._shared = False
+        self._ClearHistory()
 
     def GetRandomPos( self ):
         """Static method to compute random pos between 0 - (nrows-1) and 0 - (ncols-1)."""
-        import random
         i = random.randint( 0, len( self ) - 1 )
         j = random.randint( 0, len( self[ 0 ] ) - 1 )
         return ( i, j )
@@ -360,7 +891,187 @@ class Game( list ):
         """Set the modified state."""
         self._modified = toSave
     
+    
+# The binary format of a saved game (see Dump()): a header with the format
+# version, the table size and the counters, then the mines (1 bit per cell)
+# and the statuses (2 bits per cell), packed from the cell 0
+FORMAT_MAGIC = b'MSWP'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct( '<4sBHHIiIB' )      # toDiscover is -1 after the last mine
+
+def _PackBits( values, bits ):
+    """Pack the bytes values (every one < 2 ** bits) in bits bits each."""
+    per = 8 // bits
+    padded = bytes( values ) + bytes( -len( values ) % per )
+    packed = 0
+    for j in range( per ):
+        packed |= int.from_bytes( padded[ j : : per ], 'little' ) << ( j * bits )
+    return packed.to_bytes( len( padded ) // per, 'little' )
+    
+def _UnpackBits( data, bits, count ):
+    """Return the first count values of bits bits each packed in data, as a bytearray."""
+    per = 8 // bits
+    packed = int.from_bytes( data, 'little' )
+    mask = int.from_bytes( bytes( [ ( 1 << bits ) - 1 ] ) * len( data ), 'little' )
+    values = bytearray( len( data ) * per )
+    for j in range( per ):
+        values[ j : : per ] = ( ( packed >> ( j * bits ) ) & mask ).to_bytes( len( data ), 'little' )
+    del values[ count : ]
+    return values
+    
+def Dumps( game ):
+    """Return game in the binary format read by Loads()."""
+    header = _HEADER.pack( FORMAT_MAGIC, FORMAT_VERSION, game.nrows, game.ncols, game.nmines,
+                           game.toDiscover, game.nflags, 1 if game.IsModified() else 0 )
+    return header + _PackBits( game.mines, 1 ) + _PackBits( game.statuses, 2 )
+    
+def Dump( game, f ):
+    """Write game on the binary file f."""
+    f.write( Dumps( game ) )
+    
+def LoadHeader( f ):
+    """Read only the header of a game written by Dump() from the binary file f.
+    
+    Return the tuple ( nrows, ncols, nmines, toDiscover, nflags, modified ).
+    Raise MinesweeperFormatError if f doesn't start with a valid header."""
+    header = f.read( _HEADER.size )
+    if len( header ) != _HEADER.size or header[ : 4 ] != FORMAT_MAGIC:
+        raise MinesweeperFormatError( "Error: not a saved game" )
+    magic, version, nrows, ncols, nmines, toDiscover, nflags, modified = _HEADER.unpack( header )
+    if version != FORMAT_VERSION:
+        raise MinesweeperFormatError( "Error: unknown saved game version %d" % version )
+    if not nrows or not ncols:
+        raise MinesweeperFormatError( "Error: empty saved game" )
+    return ( nrows, ncols, nmines, toDiscover, nflags, bool( modified ) )
+    
+def Load( f ):
+    """Read a game written by Dump() from the binary file f.
+    
+    Only the bytes of the game are read, so other data can follow it in the
+    file. Raise MinesweeperFormatError if f doesn't hold a valid game."""
+    nrows, ncols, nmines, toDiscover, nflags, modified = LoadHeader( f )
+    ncells = nrows * ncols
+    minesSize = ( ncells + 7 ) // 8
+    statusesSize = ( ncells + 3 ) // 4
+    data = f.read( minesSize + statusesSize )
+    if len( data ) != minesSize + statusesSize:
+        raise MinesweeperFormatError( "Error: truncated saved game" )
+        
+    game = Game.__new__( Game )
+    game._modified = modified
+    game.toDiscover = toDiscover
+    game.nmines = nmines
+    game.nflags = nflags
+    game._listeners = []
+    game._journal = None
+    game.CreateCells( nrows, ncols )
+    game.mines[ : ] = _UnpackBits( data[ : minesSize ], 1, ncells )
+    game.statuses[ : ] = _UnpackBits( data[ minesSize : ], 2, ncells )
+    game._CountNeighbors()
+    return game
+    
+def Loads( data ):
+    """Return the game saved in data by Dumps()."""
+    f = io.BytesIO( data )
+    game = Load( f )
+    if f.read( 1 ):
+        raise MinesweeperFormatError( "Error: extra data after the saved game" )
+    return game
+    
+    
+# A move in a journal: the move and the index of its cell
+_MOVE = struct.Struct( '<BI' )
+
+class Journal:
+    """An append-only file which records the moves of a game (see
+    Game.SetJournal()).
+    
+    The file starts with a snapshot of the game, in the format of Dump(),
+    followed by a fixed size record for every move which changed some cell:
+    so recording a move writes a few bytes, not the whole game. Every
+    interval moves the file is compacted, rewriting it with a new snapshot
+    only. Recover() reads the snapshot and replays the moves after it.
+    
+    Recording a move costs a write system call (the file is flushed, so the
+    move survives a crash of the program), and a compaction writes the whole
+    game: neither waits for the disk with fsync, which could take tens of
+    milliseconds on the thread making the move. So the last moves can be lost
+    by a crash of the system; only the first snapshot is synced."""
+    
+    # The moves
+    UNCOVER, FREE, AUTO_UNCOVER, FLAG, UNFLAG, QMARK, UNQMARK = list( range( 7 ) )
+    
+    def __init__( self, filename, interval = 1000 ):
+        """Initialize the instance with the file name and the number of
+        moves between two snapshots."""
+        self.filename = filename
+        self.interval = interval
+        self.file = None
+        self.moves = 0
+        
+    def Start( self, game, sync = True ):
+        """Replace the file with a snapshot of game, and record the next moves
+        after it. If sync is True, wait for the snapshot to be on disk.
+        
+        The snapshot is written in a temporary file and then renamed, so a
+        crash while writing it doesn't lose the previous one."""
+        self.Close()
+        tmpFilename = self.filename + ".tmp"
+        with open( tmpFilename, "wb" ) as f:
+            Dump( game, f )
+            if sync:
+                f.flush()
+                os.fsync( f.fileno() )
+        os.replace( tmpFilename, self.filename )
+        self.file = open( self.filename, "ab" )
+        self.moves = 0
+        
+    def Record( self, game, move, k ):
+        """Append a move of game on the cell k."""
+        self.file.write( _MOVE.pack( move, k ) )
+        self.file.flush()
+        self.moves += 1
+        if self.moves >= self.interval:
+            self.Start( game, sync = False )
+            
+    def Close( self ):
+        """Close the file."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
             
+            
+def Recover( filename ):
+    """Return the game recorded by a Journal in the file filename.
+    
+    An incomplete last move (if the program stopped while writing it) is
+    ignored. Raise MinesweeperFormatError if the file isn't a journal, or if
+    a move can't be replayed on the game (a damaged journal)."""
+    with open( filename, "rb" ) as f:
+        game = Load( f )
+        data = f.read()
+    data = data[ : len( data ) - len( data ) % _MOVE.size ]
+    for move, k in _MOVE.iter_unpack( data ):
+        if k >= game.nrows * game.ncols:
+            raise MinesweeperFormatError( "Error: invalid cell in the journal" )
+        i, j = divmod( k, game.ncols )
+        try:
+            if move == Journal.UNCOVER:
+                game.Uncover( i, j )
+            elif move == Journal.FREE:
+                game.Free( i, j )
+            elif move == Journal.AUTO_UNCOVER:
+                game.AutomaticUncover( game[ i ][ j ] )
+            elif move in ( Journal.FLAG, Journal.UNFLAG ):
+                game.Flag( i, j, move == Journal.UNFLAG )
+            elif move in ( Journal.QMARK, Journal.UNQMARK ):
+                game.QMark( i, j, move == Journal.UNQMARK )
+            else:
+                raise MinesweeperFormatError( "Error: invalid move in the journal" )
+        except ( MinesweeperStatusError, MinesweeperAutoUncoverError ):
+            raise MinesweeperFormatError( "Error: a move of the journal can't be replayed" )
+    return game
+    
     
 def PrintGame( game, unveil = False ):
     """Print the table of games, with currently covered, flagged, q_mark."""
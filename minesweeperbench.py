@@ -0,0 +1,690 @@
+"""Benchmarks for module minesweeper.py.
+
+Run as:
+
+    python minesweeperbench.py [benchmark ...]
+
+Without arguments it runs all the benchmarks. Every benchmark prints its
+timings (best of some repetitions) and, where it makes sense, its memory usage.
+"""
+
+__author__ = "Alessandro Morgantini <gpz500@technologist.com>"
+__version__ = "$Revision$"
+__date__ = "$Date$"
+__copyright__ = "Copyright © 2012-2023 Alessandro Morgantini"
+__license__ = "GPLv2"
+
+import array
+import contextlib
+import copyreg
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+import minesweeper
+
+# Table sizes used by the benchmarks: the three standard ones and two big
+# custom tables
+SIZES = ( ( 9, 9 ), ( 16, 16 ), ( 16, 30 ), ( 100, 100 ), ( 300, 300 ) )
+
+
+def BestTime( func, repeat = 5 ):
+    """Return the best time (in seconds) of repeat calls of func()."""
+    best = None
+    for n in range( repeat ):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+    
+    
+def AllocatedBytes( func ):
+    """Return the object built by func() and the memory it allocated in bytes."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[ 0 ]
+        obj = func()
+        after = tracemalloc.get_traced_memory()[ 0 ]
+    finally:
+        tracemalloc.stop()
+    return obj, after - before
+    
+    
+def ObjectGrid( nrows, ncols ):
+    """Build a matrix of Cell instances, as older releases of Game did."""
+    return [ [ minesweeper.Cell( i, j ) for j in range( ncols ) ] for i in range( nrows ) ]
+
+
+def BenchStorage():
+    """Memory and throughput of the flat arrays against a matrix of Cells."""
+    print( "%-10s %12s %12s %12s %12s %12s" %
+        ( "size", "grid bytes", "game bytes", "grid scan", "array scan", "view scan" ) )
+    for nrows, ncols in SIZES:
+        grid, gridBytes = AllocatedBytes( lambda: ObjectGrid( nrows, ncols ) )
+        game, gameBytes = AllocatedBytes( lambda: minesweeper.Game( nrows, ncols, 0 ) )
+        
+        # Scan the whole table summing the neighbor mines
+        gridScan = BestTime( lambda: sum( cell.GetNeighborMinesNum() for row in grid for cell in row ) )
+        arrayScan = BestTime( lambda: sum( game.neighbors ) )
+        viewScan = BestTime( lambda: sum( cell.GetNeighborMinesNum() for row in game for cell in row ) )
+        print( "%-10s %12d %12d %10.3fms %10.3fms %10.3fms" %
+            ( "%dx%d" % ( nrows, ncols ), gridBytes, gameBytes,
+              gridScan * 1000, arrayScan * 1000, viewScan * 1000 ) )
+
+
+def BenchPlacement():
+    """Time to build a new game (mines placement and neighbors count) at rising density."""
+    print( "%-10s %8s %12s" % ( "size", "density", "new game" ) )
+    for nrows, ncols in SIZES[ 2: ]:
+        for density in ( 0.05, 0.2, 0.5, 0.9, 1.0 ):
+            nmines = int( nrows * ncols * density )
+            elapsed = BestTime( lambda: minesweeper.Game( nrows, ncols, nmines, seed = 1 ) )
+            print( "%-10s %7d%% %10.3fms" % ( "%dx%d" % ( nrows, ncols ), density * 100, elapsed * 1000 ) )
+
+
+def LegacyNeighborIndices( game, k ):
+    """The neighbors lookup of older releases: bounds and a new list on every call."""
+    ncols = game.ncols
+    i, j = divmod( k, ncols )
+    li = []
+    for ii in range( max( i - 1, 0 ), min( i + 1, game.nrows - 1 ) + 1 ):
+        for jj in range( max( j - 1, 0 ), min( j + 1, ncols - 1 ) + 1 ):
+            if ii != i or jj != j: li.append( ii * ncols + jj )
+    return li
+
+
+def CellNeighborTable( nrows, ncols ):
+    """The neighbor table built cell by cell, as the first release of NeighborTable() did."""
+    offsets = array.array( 'I', [ 0 ] )
+    indices = array.array( 'I' )
+    for i in range( nrows ):
+        rows = [ row * ncols for row in ( i - 1, i, i + 1 ) if 0 <= row < nrows ]
+        for j in range( ncols ):
+            k = i * ncols + j
+            jmin = j - 1 if j > 0 else j
+            jmax = j + 2 if j < ncols - 1 else j + 1
+            for first in rows:
+                indices.extend( n for n in range( first + jmin, first + jmax ) if n != k )
+            offsets.append( len( indices ) )
+    return ( offsets, indices )
+
+
+def BenchNeighbors():
+    """Cost of the neighbor table (on a new size and cached) and of a neighbors lookup for every cell."""
+    print( "%-10s %12s %12s %12s %12s %12s" %
+        ( "size", "table build", "cell build", "cached", "table scan", "legacy scan" ) )
+    for nrows, ncols in SIZES:
+        minesweeper.NeighborTable.cache_clear()
+        build = BestTime( lambda: minesweeper.NeighborTable( nrows, ncols ), 1 )
+        assert CellNeighborTable( nrows, ncols ) == minesweeper.NeighborTable( nrows, ncols )
+        cellBuild = BestTime( lambda: CellNeighborTable( nrows, ncols ), 1 )
+        cached = BestTime( lambda: minesweeper.NeighborTable( nrows, ncols ) )
+        game = minesweeper.Game( nrows, ncols, 0 )
+        cells = range( nrows * ncols )
+        tableScan = BestTime( lambda: [ game._NeighborIndices( k ) for k in cells ] )
+        legacyScan = BestTime( lambda: [ LegacyNeighborIndices( game, k ) for k in cells ] )
+        print( "%-10s %10.3fms %10.3fms %10.6fms %10.3fms %10.3fms" % ( "%dx%d" % ( nrows, ncols ),
+            build * 1000, cellBuild * 1000, cached * 1000, tableScan * 1000, legacyScan * 1000 ) )
+
+
+def LegacyAutoUncoverList( game, cell ):
+    """The flood fill of older releases: a list scanned with 'in' for every neighbor."""
+    myFiltFunction = lambda x: x.GetStatus() != minesweeper.Cell.REVEALED and x.GetStatus() != minesweeper.Cell.FLAG
+    toUncover = list( filter( myFiltFunction, game.GetNeighborsList( cell ) ) )
+    for nei in toUncover:
+        if not nei.GetNeighborMinesNum():
+            neiToUncover = list( filter( myFiltFunction, [ item for item in game.GetNeighborsList( nei ) if not item in toUncover ] ) )
+            toUncover.extend( neiToUncover )
+    return toUncover
+    
+    
+def BenchFloodFill():
+    """Time to compute the opening of a click on a sparse table, by flood fill and by the index of the openings."""
+    print( "%-10s %8s %12s %12s %12s %12s" % ( "size", "opening", "flood fill", "legacy", "index", "indexed" ) )
+    for nrows, ncols in SIZES[ 1: ]:
+        game = minesweeper.Game( nrows, ncols, nrows * ncols // 100, seed = 1 )
+        # On a sparse table the first empty cell opens most of it
+        cell = next( cell for row in game for cell in row
+                     if not cell.HasMine() and not cell.GetNeighborMinesNum() )
+        opening = game.GetAutoUncoverList( cell )
+        elapsed = BestTime( lambda: game.GetAutoUncoverList( cell ) )
+        if len( opening ) <= 3000:
+            assert LegacyAutoUncoverList( game, cell ) == opening
+            legacy = "%10.3fms" % ( BestTime( lambda: LegacyAutoUncoverList( game, cell ), 1 ) * 1000 )
+        else:
+            legacy = "%12s" % "(too slow)"
+            
+        # The index is built once for the table, then every click only looks it up
+        def BuildIndex():
+            game._openings = None
+            game._Openings()
+        index = BestTime( BuildIndex )
+        k = game._Index( *cell.GetCoordinates() )
+        game.statuses[ k ] = minesweeper.Cell.REVEALED
+        indexed = BestTime( lambda: game._OpeningIndices( k ) )
+        game.statuses[ k ] = minesweeper.Cell.COVERED
+        print( "%-10s %8d %10.3fms %s %10.3fms %10.3fms" % ( "%dx%d" % ( nrows, ncols ), len( opening ),
+            elapsed * 1000, legacy, index * 1000, indexed * 1000 ) )
+
+
+def BenchUndo():
+    """Time to undo and redo a big opening and a flag against restarting the game."""
+    print( "%-10s %8s %12s %12s %12s" % ( "size", "opening", "undo+redo", "flag u+r", "restart" ) )
+    for nrows, ncols in SIZES[ 1: ]:
+        game = minesweeper.Game( nrows, ncols, nrows * ncols // 100, seed = 1 )
+        i, j = next( cell.GetCoordinates() for row in game for cell in row
+                     if not cell.HasMine() and not cell.GetNeighborMinesNum() )
+        game.Uncover( i, j )
+        opening = nrows * ncols - game.nmines - game.toDiscover
+        undoOpening = BestTime( lambda: ( game.Undo(), game.Redo() ) )
+        k = game.statuses.index( minesweeper.Cell.COVERED )
+        game.Flag( *divmod( k, ncols ) )
+        undoFlag = BestTime( lambda: ( game.Undo(), game.Redo() ) )
+        restart = BestTime( game.Restart )
+        print( "%-10s %8d %10.3fms %10.3fms %10.3fms" % ( "%dx%d" % ( nrows, ncols ), opening,
+            undoOpening * 1000, undoFlag * 1000, restart * 1000 ) )
+
+
+def BenchFork():
+    """Cost of a fork to try a move on, against a snapshot and a deepcopy of the game and of a matrix of Cells."""
+    import copy
+    print( "%-10s %12s %12s %12s %12s %12s %12s" %
+        ( "size", "fork", "fork bytes", "snapshot", "deepcopy", "grid copy", "fork+click" ) )
+    for nrows, ncols in SIZES:
+        game = minesweeper.Game( nrows, ncols, nrows * ncols // 5, seed = 1 )
+        grid = ObjectGrid( nrows, ncols )
+        
+        # The first fork builds the index of the openings, shared by all
+        game.Fork()
+        fork, forkBytes = AllocatedBytes( game.Fork )
+        forkTime = BestTime( game.Fork )
+        snapshot = BestTime( game.Snapshot )
+        deep = BestTime( lambda: copy.deepcopy( game ), 3 )
+        gridCopy = BestTime( lambda: copy.deepcopy( grid ), 1 )
+        
+        # Try a click on a cell without mine and throw the fork away
+        i, j = divmod( game.mines.index( 0 ), ncols )
+        click = BestTime( lambda: game.Fork().Uncover( i, j ) )
+        print( "%-10s %10.3fms %12d %10.3fms %10.3fms %10.3fms %10.3fms" %
+            ( "%dx%d" % ( nrows, ncols ), forkTime * 1000, forkBytes, snapshot * 1000,
+              deep * 1000, gridCopy * 1000, click * 1000 ) )
+
+
+def BenchSolver():
+    """Positions per second of the solver on the standard tables, from scratch and following a game."""
+    import minesweepersolver
+    print( "%-10s %10s %12s %12s %8s" % ( "size", "positions", "scratch/s", "incremental/s", "won" ) )
+    for nrows, ncols, nmines in ( ( 9, 9, 10 ), ( 16, 16, 40 ), ( 16, 30, 99 ) ):
+        # Play 100 games uncovering the safe cells found by the solver,
+        # one per move, keeping every position seen
+        positions = []
+        won = 0
+        start = time.perf_counter()
+        for seed in range( 100 ):
+            game = minesweeper.Game( nrows, ncols, nmines, seed = seed )
+            solver = minesweepersolver.GameSolver( game )
+            k = next( ( k for k in range( nrows * ncols ) if not game.mines[ k ] and not game.neighbors[ k ] ), 0 )
+            game.Uncover( *divmod( k, ncols ) )
+            while True:
+                positions.append( game.Snapshot() )
+                safe, mined = solver.Solve()
+                if not safe:
+                    break
+                game.Uncover( *safe[ 0 ] )
+            won += game.GetToDiscover() == 0
+            solver.Close()
+        incremental = ( time.perf_counter() - start ) / len( positions )
+        scratch = BestTime( lambda: [ minesweepersolver.GameSolver( position ).Solve() for position in positions ], 3 )
+        scratch /= len( positions )
+        print( "%-10s %10d %12.0f %12.0f %7d%%" % ( "%dx%d" % ( nrows, ncols ), len( positions ),
+            1 / scratch, 1 / incremental, won ) )
+
+
+def BenchProbabilities():
+    """Time of the mine probabilities where the solver gets stuck, playing the safest guess."""
+    import minesweepersolver
+    print( "%-10s %8s %10s %10s %10s %8s" % ( "size", "guesses", "median", "90%", "max", "won" ) )
+    for nrows, ncols, nmines in ( ( 9, 9, 10 ), ( 16, 16, 40 ), ( 16, 30, 99 ) ):
+        times = []
+        won = 0
+        for seed in range( 30 ):
+            game = minesweeper.Game( nrows, ncols, nmines, seed = seed )
+            solver = minesweepersolver.GameSolver( game )
+            k = next( ( k for k in range( nrows * ncols ) if not game.mines[ k ] and not game.neighbors[ k ] ), 0 )
+            bomb = game.Uncover( *divmod( k, ncols ) )
+            while not bomb and game.GetToDiscover():
+                safe, mined = solver.Solve()
+                if safe:
+                    bomb = game.Uncover( *safe[ 0 ] )
+                    continue
+                start = time.perf_counter()
+                probabilities = solver.Probabilities()
+                times.append( time.perf_counter() - start )
+                k = min( ( k for k in range( nrows * ncols ) if solver.states[ k ] == minesweepersolver.Solver.UNKNOWN ),
+                         key = lambda k: probabilities[ k // ncols ][ k % ncols ] )
+                bomb = game.Uncover( *divmod( k, ncols ) )
+            won += not bomb
+            solver.Close()
+        times.sort()
+        print( "%-10s %8d %8.3fms %8.3fms %8.3fms %7d%%" % ( "%dx%d" % ( nrows, ncols ), len( times ),
+            times[ len( times ) // 2 ] * 1000, times[ len( times ) * 9 // 10 ] * 1000, times[ -1 ] * 1000,
+            won * 100 // 30 ) )
+
+
+def BenchParallel():
+    """Time of the mine probabilities of big frontiers against the worker count of a process pool."""
+    import concurrent.futures
+    import minesweepersolver
+    print( "%d CPUs" % os.cpu_count() )
+    positions = []
+    for seed in range( 10 ):
+        game = minesweeper.Game( 24, 30, 180, seed = seed )
+        for k in range( 0, 24 * 30, 31 ):
+            if not game.mines[ k ] and game.statuses[ k ] != minesweeper.Cell.REVEALED:
+                game.Uncover( *divmod( k, 30 ) )
+        positions.append( minesweepersolver.GameSolver( game ) )
+    
+    def Run( executor ):
+        start = time.perf_counter()
+        for solver in positions:
+            solver.layouts.clear()
+            solver.Probabilities( executor = executor )
+        return time.perf_counter() - start
+        
+    serial = Run( None )
+    print( "%-10s %10s %8s" % ( "workers", "time", "speedup" ) )
+    print( "%-10s %8.1fms %7.2fx" % ( "serial", serial * 1000, 1.0 ) )
+    for workers in ( 1, 2, 4, 8 ):
+        with concurrent.futures.ProcessPoolExecutor( max_workers = workers ) as executor:
+            Run( executor )     # Start the workers
+            elapsed = Run( executor )
+        print( "%-10d %8.1fms %7.2fx" % ( workers, elapsed * 1000, serial / elapsed ) )
+    for solver in positions:
+        solver.Close()
+
+
+def BenchNoGuess():
+    """Time to make a board without guesses, against popping one from a filled pool."""
+    import concurrent.futures
+    import tempfile
+    import minesweeperpool
+    import minesweepersolver
+    print( "%-10s %10s %10s %10s" % ( "size", "median", "max", "pop" ) )
+    for nrows, ncols, nmines in ( ( 9, 9, 10 ), ( 16, 16, 40 ), ( 16, 30, 99 ) ):
+        times = []
+        for seed in range( 20 ):
+            start = time.perf_counter()
+            minesweepersolver.NoGuessGame( nrows, ncols, nmines, seed = seed )
+            times.append( time.perf_counter() - start )
+        times.sort()
+        with tempfile.TemporaryDirectory() as directory:
+            with concurrent.futures.ProcessPoolExecutor() as executor:
+                pool = minesweeperpool.BoardPool( minesweepersolver.NoGuessGame, executor, directory )
+                pool.Fill( nrows, ncols, nmines )
+                pool.Wait()
+            pool = minesweeperpool.BoardPool( minesweepersolver.NoGuessGame, None, directory, size = 0 )
+            pool.Wait()
+            pop = BestTime( lambda: pool.Pop( nrows, ncols, nmines ), 5 )
+        print( "%-10s %8.2fms %8.2fms %8.3fms" % ( "%dx%d" % ( nrows, ncols ),
+            times[ len( times ) // 2 ] * 1000, times[ -1 ] * 1000, pop * 1000 ) )
+
+
+def BenchMetrics():
+    """Boards rated per second by minesweepermetrics, against loading every board in a Game."""
+    import minesweepermetrics
+    print( "%-10s %14s %14s" % ( "size", "metrics", "game" ) )
+    for nrows, ncols, nmines in ( ( 9, 9, 10 ), ( 16, 16, 40 ), ( 16, 30, 99 ), ( 100, 100, 2000 ) ):
+        count = 2000 if nrows < 100 else 100
+        boards = [ minesweeper.Game( nrows, ncols, nmines, seed = seed ).mines for seed in range( count ) ]
+        
+        def RateGames():
+            for mines in boards:
+                game = minesweeper.Game( nrows, ncols, 0 )
+                game.mines[ : ] = mines
+                game._CountNeighbors()
+                game.Get3BV()
+                
+        metrics = BestTime( lambda: minesweepermetrics.BatchMetrics( boards, nrows, ncols ), 3 )
+        games = BestTime( RateGames, 3 )
+        print( "%-10s %12.0f/s %12.0f/s" % ( "%dx%d" % ( nrows, ncols ), count / metrics, count / games ) )
+
+
+def BenchBits():
+    """BitGame against Game: neighbor counts, a click on a sparse table, a copy and a scan of the revealed cells."""
+    import minesweeperbits
+    print( "%-10s %12s %12s %12s %12s %12s %12s %12s %12s" % ( "size", "counts", "bit counts", "click",
+        "bit click", "snapshot", "bit copy", "scan", "bit scan" ) )
+    for nrows, ncols in SIZES:
+        nmines = nrows * ncols // 20
+        game = minesweeper.Game( nrows, ncols, nmines, seed = 1 )
+        bits = minesweeperbits.BitGame( nrows, ncols, nmines, seed = 1 )
+        start = next( k for k in range( nrows * ncols ) if not game.mines[ k ] and not game.neighbors[ k ] )
+        i, j = divmod( start, ncols )
+        counts = BestTime( lambda: minesweeper.CountNeighbors( game.mines, nrows, ncols ) )
+        bitCounts = BestTime( bits.CountPlanes )
+        
+        # Every click on a fresh copy, the Game one sharing the index of the
+        # openings already built
+        openings = game._Openings()
+        def Click():
+            fresh = game.Snapshot()
+            fresh._openings = openings
+            fresh.Uncover( i, j )
+        click = BestTime( Click )
+        bitClick = BestTime( lambda: bits.Copy().Uncover( i, j ) )
+        snapshot = BestTime( game.Snapshot )
+        bitCopy = BestTime( bits.Copy )
+        
+        # Count the revealed cells, as a solved check does
+        game.Uncover( i, j )
+        bits.Uncover( i, j )
+        scan = BestTime( lambda: game.statuses.count( minesweeper.Cell.REVEALED ) )
+        bitScan = BestTime( lambda: bits.revealed.bit_count() )
+        print( "%-10s %10.3fms %10.3fms %10.3fms %10.3fms %10.3fms %10.3fms %10.3fms %10.3fms" %
+            ( "%dx%d" % ( nrows, ncols ), counts * 1000, bitCounts * 1000, click * 1000, bitClick * 1000,
+              snapshot * 1000, bitCopy * 1000, scan * 1000, bitScan * 1000 ) )
+
+
+@contextlib.contextmanager
+def PrivateFiles( folder ):
+    """Point the save, options, autosave and boards files of Minesweeptk to
+    folder while a benchmark runs, so the ones of the user are never read,
+    written or removed."""
+    import Minesweeptk
+    names = ( 'SAVE_FILE_NAME', 'OPTIONS_FILE_NAME', 'AUTOSAVE_FILE_NAME', 'BOARDS_DIR_NAME' )
+    savedNames = [ getattr( Minesweeptk, name ) for name in names ]
+    for name, filename in zip( names, ( "save", "options", "autosave", "boards" ) ):
+        setattr( Minesweeptk, name, os.path.join( folder, filename ) )
+    try:
+        yield
+    finally:
+        for name, filename in zip( names, savedNames ):
+            setattr( Minesweeptk, name, filename )
+
+
+class FakeEvent:
+    """A mouse event on a cell widget, as the table handlers receive it."""
+    def __init__( self, widget ):
+        self.widget = widget
+
+
+def Click( root, table, i, j ):
+    """Click the cell (i, j) of table and let Tk redraw the window."""
+    event = FakeEvent( table.cells[ i ][ j ] )
+    table.OnButton1( event )
+    table.OnButtonRelease1( event )
+    root.update_idletasks()
+
+
+def BenchGui():
+    """New game and click-to-paint latency of Minesweeptk on the biggest custom table (24x30)."""
+    import gettext
+    import tempfile
+    import tkinter
+    import Minesweeptk
+    gettext.install( Minesweeptk.APP_NAME, 'locale' )
+    with tempfile.TemporaryDirectory() as folder, PrivateFiles( folder ):
+        try:
+            root = Minesweeptk.RootWindow()
+        except tkinter.TclError as e:
+            print( "Skipped: %s" % e )
+            return
+        TimeTables( root )
+        
+        
+def TimeTables( root ):
+    """Print the latencies of the tables of root, a Minesweeptk.RootWindow,
+    for BenchGui()."""
+    import Minesweeptk
+    game = minesweeper.Game( 24, 30, 99, seed = 1 )
+    
+    # A click on an empty cell opens a region; a click on a number, when
+    # all its covered neighbors have a mine, flags them
+    opening = next( cell.GetCoordinates() for row in game for cell in row
+                    if not cell.HasMine() and not cell.GetNeighborMinesNum() )
+    def ChordCoordinates():
+        for row in game:
+            for cell in row:
+                if cell.GetStatus() == minesweeper.Cell.REVEALED and cell.GetNeighborMinesNum():
+                    covered = [ nei for nei in game.GetNeighborsList( cell )
+                                if nei.GetStatus() != minesweeper.Cell.REVEALED ]
+                    if covered and all( nei.HasMine() for nei in covered ):
+                        return cell.GetCoordinates()
+                        
+    def NewTable():
+        root.table.destroy()
+        root.table = Minesweeptk.MinesweeperTable( root, game )
+        root.table.grid()
+        root.update()
+        
+    def NewGame():
+        root.table.SetGame( minesweeper.Game( 24, 30, 99 ) )
+        root.update()
+        
+    try:
+        print( "%-10s %12s %12s %12s %12s %12s %8s" %
+            ( "renderer", "new table", "new game", "opening", "chord", "full redraw", "widgets" ) )
+        for renderer in ( Minesweeptk.RENDERER_LABELS, Minesweeptk.RENDERER_CANVAS ):
+            Minesweeptk.renderer = renderer
+            game.Restart()
+            newTable = BestTime( NewTable )
+            newGame = BestTime( NewGame )
+            root.table.SetGame( game )
+            openingTimes = []
+            chordTimes = []
+            for n in range( 5 ):
+                root.table.Restart()
+                root.update()
+                openingTimes.append( BestTime( lambda: Click( root, root.table, *opening ), 1 ) )
+                chord = ChordCoordinates()
+                if chord:
+                    chordTimes.append( BestTime( lambda: Click( root, root.table, *chord ), 1 ) )
+            fullRedraw = BestTime( root.table.UpdateAllCells )
+            chordTime = "%10.3fms" % ( min( chordTimes ) * 1000 ) if chordTimes else "%12s" % "n/a"
+            # The widgets of the table after some new games and replays
+            widgets = len( root.table.winfo_children() )
+            print( "%-10s %10.3fms %10.3fms %10.3fms %s %10.3fms %8d" %
+                ( renderer, newTable * 1000, newGame * 1000, min( openingTimes ) * 1000, chordTime,
+                  fullRedraw * 1000, widgets ) )
+    finally:
+        root.autoSaver.Stop()
+        if root.executor is not None:
+            root.executor.shutdown()
+        root.boardThread.shutdown()
+        root.destroy()
+
+
+def BenchSave():
+    """Size and save/load time of the binary format against a pickle."""
+    print( "%-10s %10s %10s %10s %10s %10s %10s" %
+        ( "size", "bin bytes", "bin dump", "bin load", "pck bytes", "pck dump", "pck load" ) )
+    for nrows, ncols in SIZES:
+        game = minesweeper.Game( nrows, ncols, nrows * ncols // 5, seed = 1 )
+        for k in range( 0, nrows * ncols, 7 ):
+            if not game.mines[ k ] and game.statuses[ k ] == minesweeper.Cell.COVERED:
+                game.Flag( *divmod( k, ncols ) )
+        data = minesweeper.Dumps( game )
+        binDump = BestTime( lambda: minesweeper.Dumps( game ) )
+        binLoad = BestTime( lambda: minesweeper.Loads( data ) )
+        pck = pickle.dumps( game )
+        pckDump = BestTime( lambda: pickle.dumps( game ) )
+        pckLoad = BestTime( lambda: pickle.loads( pck ) )
+        print( "%-10s %10d %8.3fms %8.3fms %10d %8.3fms %8.3fms" %
+            ( "%dx%d" % ( nrows, ncols ), len( data ), binDump * 1000, binLoad * 1000,
+              len( pck ), pckDump * 1000, pckLoad * 1000 ) )
+
+
+def BenchOptions():
+    """Time to save and load the options with a saved game of rising size."""
+    import gettext
+    import tempfile
+    import Minesweeptk
+    gettext.install( Minesweeptk.APP_NAME, 'locale' )
+    print( "%-10s %12s %12s %12s" % ( "saved game", "save game", "save options", "load options" ) )
+    with tempfile.TemporaryDirectory() as folder:
+        persData = Minesweeptk.PersistentData( os.path.join( folder, "save" ), os.path.join( folder, "options" ),
+                                                os.path.join( folder, "autosave" ) )
+        for nrows, ncols in SIZES:
+            game = minesweeper.Game( nrows, ncols, nrows * ncols // 5, seed = 1 )
+            saveGame = BestTime( lambda: persData.SaveGame( game ) )
+            saveOptions = BestTime( lambda: persData.SaveOptions( 3, Minesweeptk.options[ 3 ] ) )
+            loadOptions = BestTime( persData.LoadOptions )
+            print( "%-10s %10.3fms %10.3fms %10.3fms" %
+                ( "%dx%d" % ( nrows, ncols ), saveGame * 1000, saveOptions * 1000, loadOptions * 1000 ) )
+
+
+def BenchJournal():
+    """Bytes written per move and recovery time of a move journal against saving the whole game."""
+    import random
+    import tempfile
+    moves = 2000
+    print( "%-10s %10s %10s %10s %10s %10s %10s" %
+        ( "size", "jrn B/mv", "bin B/mv", "pck B/mv", "jrn move", "recover", "pck load" ) )
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join( folder, "journal" )
+        for nrows, ncols in SIZES:
+            game = minesweeper.Game( nrows, ncols, nrows * ncols // 5, seed = 1 )
+            journal = minesweeper.Journal( filename )
+            game.SetJournal( journal )
+            
+            # Flag and unflag random cells, counting the bytes written by
+            # the journal (its records and snapshots) and the ones written
+            # by saving the whole game at every move
+            rng = random.Random( 1 )
+            cells = [ divmod( rng.randrange( nrows * ncols ), ncols ) for n in range( moves // 2 ) ]
+            snapshotSize = len( minesweeper.Dumps( game ) )
+            journalBytes = snapshotSize
+            binBytes = pckBytes = 0
+            start = time.perf_counter()
+            for i, j in cells:
+                for reset in ( False, True ):
+                    game.Flag( i, j, reset )
+                    journalBytes += minesweeper._MOVE.size
+                    if journal.moves == 0:
+                        journalBytes += snapshotSize
+            journalMove = ( time.perf_counter() - start ) / moves
+            for i, j in cells[ : 50 ]:
+                game.Flag( i, j )
+                binBytes += len( minesweeper.Dumps( game ) )
+                pckBytes += len( pickle.dumps( game ) )
+                game.Flag( i, j, True )
+            
+            # The journal ends with 999 moves after its last snapshot
+            reset = False
+            while journal.moves < journal.interval - 1:
+                game.Flag( 0, 0, reset )
+                reset = not reset
+            recover = BestTime( lambda: minesweeper.Recover( filename ) )
+            pck = pickle.dumps( game )
+            pckLoad = BestTime( lambda: pickle.loads( pck ) )
+            game.SetJournal( None )
+            print( "%-10s %10.1f %10d %10d %8.3fms %8.3fms %8.3fms" %
+                ( "%dx%d" % ( nrows, ncols ), journalBytes / moves, binBytes // 50, pckBytes // 50,
+                  journalMove * 1000, recover * 1000, pckLoad * 1000 ) )
+
+
+class LegacyGame:
+    """A game which pickles as older releases did: a matrix of Cell instances."""
+    
+    def __init__( self, game ):
+        self.game = game
+        
+    def __reduce__( self ):
+        state = self.game.__getstate__()
+        for name in ( 'statuses', 'mines', 'neighbors' ):
+            del state[ name ]
+        state[ 'cells' ] = ObjectGrid( self.game.nrows, self.game.ncols )
+        return ( copyreg._reconstructor, ( minesweeper.Game, list, [] ), state )
+        
+        
+def BenchStartup():
+    """Time to first window of Minesweeptk without and with a big saved game (300x300)."""
+    import gettext
+    import tempfile
+    import tkinter
+    import Minesweeptk
+    gettext.install( Minesweeptk.APP_NAME, 'locale' )
+    game = minesweeper.Game( 300, 300, 18000, seed = 1 )
+    with tempfile.TemporaryDirectory() as folder:
+        saveFile = os.path.join( folder, "save" )
+        optionsFile = os.path.join( folder, "options" )
+        autosaveFile = os.path.join( folder, "autosave" )
+        persData = Minesweeptk.PersistentData( saveFile, optionsFile, autosaveFile )
+        
+        # What the startup reads to enable File->Load: the whole game or
+        # only its header. The options of a game file of older releases are
+        # read with the game by the first run only, which moves them
+        print( "%-10s %12s %12s %12s %12s" % ( "saved game", "load game", "has game", "options 1st", "options" ) )
+        for name, Write in ( ( "binary", lambda f: minesweeper.Dump( game, f ) ),
+                             ( "legacy", lambda f: pickle.dump( LegacyGame( game ), f ) ) ):
+            with open( saveFile, "wb" ) as f:
+                Write( f )
+            loadGame = BestTime( persData.LoadGame )
+            hasGame = BestTime( persData.HasGame )
+            firstOptions = BestTime( persData.LoadOptions, 1 )
+            nextOptions = BestTime( persData.LoadOptions )
+            os.remove( optionsFile )
+            print( "%-10s %10.3fms %10.3fms %10.3fms %10.3fms" % ( name, loadGame * 1000, hasGame * 1000,
+                firstOptions * 1000, nextOptions * 1000 ) )
+        print()
+        
+        def FirstWindow():
+            root = Minesweeptk.RootWindow()
+            try:
+                root.update()
+            finally:
+                root.autoSaver.Stop()
+                if root.executor is not None:
+                    root.executor.shutdown()
+                root.boardThread.shutdown()
+                root.destroy()
+                
+        with PrivateFiles( folder ):
+            print( "%-10s %12s" % ( "saved game", "first window" ) )
+            os.remove( saveFile )
+            for name in ( "none", "binary" ):
+                if name == "binary":
+                    persData.SaveGame( game )
+                try:
+                    firstWindow = BestTime( FirstWindow )
+                except tkinter.TclError as e:
+                    print( "Skipped: %s" % e )
+                    return
+                print( "%-10s %10.3fms" % ( name, firstWindow * 1000 ) )
+
+
+# All the benchmarks by name
+BENCHMARKS = {
+    'storage': BenchStorage,
+    'placement': BenchPlacement,
+    'neighbors': BenchNeighbors,
+    'floodfill': BenchFloodFill,
+    'undo': BenchUndo,
+    'fork': BenchFork,
+    'solver': BenchSolver,
+    'probabilities': BenchProbabilities,
+    'noguess': BenchNoGuess,
+    'metrics': BenchMetrics,
+    'bits': BenchBits,
+    'parallel': BenchParallel,
+    'save': BenchSave,
+    'options': BenchOptions,
+    'journal': BenchJournal,
+    'gui': BenchGui,
+    'startup': BenchStartup,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[ 1: ] or list( BENCHMARKS )
+    for name in names:
+        if name not in BENCHMARKS:
+            print( "Unknown benchmark %s (choose from %s)" % ( name, ", ".join( BENCHMARKS ) ) )
+            sys.exit( 1 )
+    for name in names:
+        print( "== %s: %s" % ( name, BENCHMARKS[ name ].__doc__ ) )
+        BENCHMARKS[ name ]()
+        print()
@@ -0,0 +1,318 @@
+"""Minesweeper game on bit planes.
+
+This module implements BitGame, a minesweeper game with the moves of
+minesweeper.Game (Uncover, Free, Flag and QMark) which keeps the table in
+four bit planes: big integers with a bit for every cell, for the mines and
+for the revealed, flagged and question marked cells. Every row has a padding
+column on its right, always 0, so a plane shifted by a column doesn't wrap a
+cell into the next row.
+
+The moves work on whole planes at once: the cells around a set of cells are
+its copies shifted by a column and by a row, the flood fill of a click grows
+the opening by these shifts, the count of neighbor mines of every cell is a
+bit-sliced sum of the eight shifted mine planes. A copy of a BitGame only
+copies four integers, and Key() gives a hashable state: it's meant for the
+solvers and the simulations which try many moves. BitGame has no listeners,
+journal or undo history: FromGame() and ToGame() convert from and to a Game.
+
+Example:
+
+    game = BitGame( 16, 30, 99, seed = 1 )
+    trial = game.Copy()
+    bomb = trial.Uncover( 8, 15 )
+"""
+
+
+__author__    = "Alessandro Morgantini <gpz500@technologist.com>"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright © 2012-2023 Alessandro Morgantini"
+__license__   = "GPLv2"
+
+import functools
+import random
+import minesweeper
+from minesweeper import Cell
+
+
+# Read and write a plane as the binary digits of an integer
+_DIGITS = bytes.maketrans( b'\x00\x01', b'01' )
+_BYTES = bytes.maketrans( b'01', b'\x00\x01' )
+
+# Translate the statuses of a Game to 1 where a cell has a status, 0 elsewhere
+_STATUS_PLANES = { status: bytes( 1 if n == status else 0 for n in range( 256 ) )
+                   for status in ( Cell.REVEALED, Cell.FLAG, Cell.Q_MARK ) }
+
+
+@functools.lru_cache( maxsize = 8 )
+def _ValidCells( nrows, ncols ):
+    """Return the plane of all the cells of a nrows x ncols table, without
+    the padding column."""
+    return int( ( '0' + '1' * ncols ) * nrows, 2 )
+
+
+def _PlaneToBytes( plane, nrows, ncols ):
+    """Return plane as bytes, 1 for every cell in it, indexed by i * ncols + j."""
+    width = ncols + 1
+    digits = format( plane, 'b' ).zfill( nrows * width )[ ::-1 ].encode()
+    return b''.join( digits[ n : n + ncols ] for n in range( 0, nrows * width, width ) ).translate( _BYTES )
+
+
+def _BytesToPlane( data, ncols ):
+    """Return the plane of the cells which are 1 in data, indexed by i * ncols + j."""
+    digits = bytes( data ).translate( _DIGITS )
+    return int( b'0'.join( digits[ n : n + ncols ] for n in range( 0, len( digits ), ncols ) )[ ::-1 ], 2 )
+
+
+class BitGame:
+    """A minesweeper game kept in bit planes.
+
+    The cell ( i, j ) is the bit i * width + j of every plane, where width is
+    ncols + 1 (the padding column). The moves raise the same errors of the
+    moves of minesweeper.Game and return the same results."""
+
+    def __init__( self, nrows = 16, ncols = 30, nmines = 99, seed = None ):
+        """Initialize a game with nmines mines set randomly on the table.
+
+        seed is the seed of the random generator (an integer or a
+        random.Random instance): the game has the same mines of a
+        minesweeper.Game built with the same seed."""
+        if nmines > nrows * ncols:
+            raise minesweeper.MinesweeperMinesCount( "Too much mines!" )
+        rng = seed if isinstance( seed, random.Random ) else random.Random( seed )
+        width = ncols + 1
+        mines = 0
+        for k in rng.sample( range( nrows * ncols ), nmines ):
+            i, j = divmod( k, ncols )
+            mines |= 1 << ( i * width + j )
+        self._SetUp( nrows, ncols, mines )
+
+    def _SetUp( self, nrows, ncols, mines ):
+        """Set the mines plane, and the planes computed from it, of a table
+        with nothing revealed."""
+        self.nrows = nrows
+        self.ncols = ncols
+        self.width = ncols + 1
+        self.valid = _ValidCells( nrows, ncols )
+        self.mines = mines
+        self.nmines = mines.bit_count()
+        self.revealed = 0
+        self.flags = 0
+        self.qmarks = 0
+
+        # The cells without mines around
+        self.empty = self.valid & ~self._Dilate( mines )
+
+    def _Dilate( self, plane ):
+        """Return the cells of plane and the cells around them."""
+        width = self.width
+        rows = plane | ( plane << 1 ) | ( plane >> 1 )
+        return ( rows | ( rows << width ) | ( rows >> width ) ) & self.valid
+
+    def _Bit( self, i, j ):
+        """Return the bit of the cell (i, j), raising IndexError if out of range."""
+        if i < 0:
+            i += self.nrows
+        if j < 0:
+            j += self.ncols
+        if i < 0 or i >= self.nrows or j < 0 or j >= self.ncols:
+            raise IndexError( "cell index out of range" )
+        return 1 << ( i * self.width + j )
+
+    def _Status( self, bit ):
+        """Return the Cell status of a cell."""
+        if self.revealed & bit:
+            return Cell.REVEALED
+        if self.flags & bit:
+            return Cell.FLAG
+        if self.qmarks & bit:
+            return Cell.Q_MARK
+        return Cell.COVERED
+
+    def _Cells( self, plane ):
+        """Return the coordinates of the cells of plane, by row and column."""
+        width = self.width
+        cells = []
+        while plane:
+            bit = plane & -plane
+            cells.append( divmod( bit.bit_length() - 1, width ) )
+            plane ^= bit
+        return cells
+
+    def CountPlanes( self ):
+        """Return the count of neighbor mines of every cell as four planes,
+        its binary digits from the lowest.
+
+        The eight shifted mine planes are summed by a bit-sliced adder: every
+        plane is added to all the cells at once, carrying from a digit plane
+        to the next one."""
+        width = self.width
+        mines = self.mines
+        valid = self.valid
+        digits = [ 0, 0, 0, 0 ]
+        for shift in ( 1, width - 1, width, width + 1 ):
+            for plane in ( ( mines << shift ) & valid, ( mines >> shift ) & valid ):
+                for n in range( 4 ):
+                    carry = digits[ n ] & plane
+                    digits[ n ] ^= plane
+                    plane = carry
+                    if not plane:
+                        break
+        return digits
+
+    def NeighborCounts( self ):
+        """Return the number of neighbor mines of every cell, as a bytearray
+        indexed by i * ncols + j (as Game.neighbors)."""
+        counts = 0
+        for n, plane in enumerate( self.CountPlanes() ):
+            counts += int.from_bytes( _PlaneToBytes( plane, self.nrows, self.ncols ), 'little' ) << n
+        return bytearray( counts.to_bytes( self.nrows * self.ncols, 'little' ) )
+
+    def GetStatus( self, i, j ):
+        """Return the Cell status of the cell (i, j)."""
+        return self._Status( self._Bit( i, j ) )
+
+    def HasMine( self, i, j ):
+        """Return True if there is a mine in the cell (i, j)."""
+        return bool( self.mines & self._Bit( i, j ) )
+
+    def GetNeighborMinesNum( self, i, j ):
+        """Return the number of mines around the cell (i, j)."""
+        bit = self._Bit( i, j )
+        return ( self.mines & self._Dilate( bit ) & ~bit ).bit_count()
+
+    def Uncover( self, i, j ):
+        """Uncover the cell (i, j). Return True if there is a mine, False otherwise."""
+        return self._Uncover( self._Bit( i, j ) )
+
+    def _Uncover( self, bit ):
+        """Uncover a cell and, if it's empty, its opening."""
+        status = self._Status( bit )
+        if status == Cell.REVEALED:
+            raise minesweeper.MinesweeperStatusError( "Error: can't come back from REVEALED status" )
+        if status == Cell.FLAG:
+            raise minesweeper.MinesweeperStatusError( "Error: can't do the transition FLAG -> REVEALED" )
+        if self.mines & bit:
+            self.revealed |= bit
+            self.qmarks &= ~bit
+            return True
+
+        # The flood fill goes on through the empty cells, and stops at the
+        # cells already revealed and at the flags
+        opening = bit
+        if self.empty & bit:
+            empty = self.empty
+            allowed = self.valid & ~self.revealed & ~self.flags
+            grown = bit
+            while grown & empty:
+                grown = self._Dilate( grown & empty ) & allowed & ~opening
+                opening |= grown
+        self.revealed |= opening
+        self.qmarks &= ~opening
+        return False
+
+    def Free( self, i, j ):
+        """Free the cell (i, j) from covered, but not flagged, close cells,
+        or flag them if they are as many as the mines left around."""
+        around = self._Dilate( self._Bit( i, j ) ) & ~self._Bit( i, j )
+        covered = around & ~self.revealed & ~self.flags
+        minesToFindNum = self.GetNeighborMinesNum( i, j ) - ( around & self.flags ).bit_count()
+        if minesToFindNum != 0:
+            if covered.bit_count() == minesToFindNum:
+                self.flags |= covered
+                self.qmarks &= ~covered
+            return False
+
+        # Stop at the first mine, as Game.Free() does
+        while covered:
+            bit = covered & -covered
+            covered ^= bit
+            if not self.revealed & bit and self._Uncover( bit ):
+                return True
+        return False
+
+    def Flag( self, i, j, reset = False ):
+        """Set/Reset a flag."""
+        bit = self._Bit( i, j )
+        self._SetMark( bit, Cell.COVERED if reset else Cell.FLAG )
+
+    def QMark( self, i, j, reset = False ):
+        """Set/Reset a question mark."""
+        bit = self._Bit( i, j )
+        self._SetMark( bit, Cell.COVERED if reset else Cell.Q_MARK )
+
+    def _SetMark( self, bit, newStatus ):
+        """Set the status of a covered cell to COVERED, FLAG or Q_MARK."""
+        status = self._Status( bit )
+        if status == newStatus:
+            raise minesweeper.MinesweeperStatusError( "Error: can't reassign the same status" )
+        if status == Cell.REVEALED:
+            raise minesweeper.MinesweeperStatusError( "Error: can't come back from REVEALED status" )
+        self.flags &= ~bit
+        self.qmarks &= ~bit
+        if newStatus == Cell.FLAG:
+            self.flags |= bit
+        elif newStatus == Cell.Q_MARK:
+            self.qmarks |= bit
+
+    def GetToDiscover( self ):
+        """Return the number of cells remaining to discover."""
+        return self.nrows * self.ncols - self.nmines - self.revealed.bit_count()
+
+    def IsSolved( self ):
+        """Return True if all the cells without mine are revealed."""
+        return not self.valid & ~self.mines & ~self.revealed
+
+    def GetFlagsNum( self ):
+        """Return the number of flags on the table."""
+        return self.flags.bit_count()
+
+    def GetMinesNum( self ):
+        """Return the number of mines in the game."""
+        return self.nmines
+
+    def GetMines( self ):
+        """Return a list of coordinates of current mines."""
+        return self._Cells( self.mines )
+
+    def Copy( self ):
+        """Return an independent copy of the game: only the references to the
+        planes, which are immutable integers, are copied."""
+        copy = BitGame.__new__( BitGame )
+        copy.__dict__.update( self.__dict__ )
+        return copy
+
+    def Key( self ):
+        """Return a hashable key of the state of the game."""
+        return ( self.nrows, self.ncols, self.mines, self.revealed, self.flags, self.qmarks )
+
+    def ToGame( self ):
+        """Return a minesweeper.Game with the same table."""
+        nrows = self.nrows
+        ncols = self.ncols
+        
+        # The planes are disjoint, so their statuses are summed byte by byte
+        statuses = 0
+        for plane, status in ( ( self.revealed, Cell.REVEALED ), ( self.flags, Cell.FLAG ), ( self.qmarks, Cell.Q_MARK ) ):
+            statuses += int.from_bytes( _PlaneToBytes( plane, nrows, ncols ), 'little' ) * status
+        game = minesweeper.Game( nrows, ncols, 0 )
+        game.mines[ : ] = _PlaneToBytes( self.mines, nrows, ncols )
+        game.statuses[ : ] = statuses.to_bytes( nrows * ncols, 'little' )
+        game.nmines = self.nmines
+        game.nflags = self.GetFlagsNum()
+        game.toDiscover = self.GetToDiscover()
+        game._CountNeighbors()
+        game.SetModified( bool( self.revealed or self.flags or self.qmarks ) )
+        return game
+
+
+def FromGame( game ):
+    """Return a BitGame with the same table of a minesweeper.Game."""
+    ncols = game.ncols
+    bits = BitGame.__new__( BitGame )
+    bits._SetUp( game.nrows, ncols, _BytesToPlane( game.mines, ncols ) )
+    statuses = game.statuses
+    bits.revealed = _BytesToPlane( statuses.translate( _STATUS_PLANES[ Cell.REVEALED ] ), ncols )
+    bits.flags = _BytesToPlane( statuses.translate( _STATUS_PLANES[ Cell.FLAG ] ), ncols )
+    bits.qmarks = _BytesToPlane( statuses.translate( _STATUS_PLANES[ Cell.Q_MARK ] ), ncols )
+    return bits
@@ -0,0 +1,138 @@
+"""Minesweeper board metrics.
+
+This module rates minesweeper boards, given only their mines: it doesn't
+build a Game, so it's fit to rate big corpora of boards. Metrics() rates a
+board, BatchMetrics() a batch of boards of the same size, optionally spread
+over an executor (e.g. a concurrent.futures.ProcessPoolExecutor).
+
+The metrics are:
+    - 3BV, the least number of clicks which uncover the board: one for every
+      opening and one for every isolated number
+    - openings, the connected regions of empty cells (no neighbor mines)
+    - isolated, the numbers which aren't on the border of an opening
+    - islands, the connected groups of isolated numbers
+    - histogram, how many cells without mine show every number from 0 to 8
+    - difficulty, the 3BV per cell without mine: how many of these cells
+      need a click of their own
+
+A board is a bytes-like object with a byte for every cell, 1 where there is a
+mine (as Game.mines). It's read as a big integer with a bit for every cell,
+so every step works on all the cells at once: the cells around a set of cells
+are found by shifting the set by a column and by a row, and a region is grown
+from one of its cells by repeating this until it stops changing.
+
+Example:
+
+    metrics = Metrics( game.mines, game.nrows, game.ncols )
+    print( metrics.bbbv, metrics.openings )
+"""
+
+
+__author__    = "Alessandro Morgantini <gpz500@technologist.com>"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright © 2012-2023 Alessandro Morgantini"
+__license__   = "GPLv2"
+
+import collections
+import functools
+import minesweeper
+
+
+# The boards sent to a worker at once by BatchMetrics()
+CHUNK_SIZE = 1000
+
+# The metrics of a board
+BoardMetrics = collections.namedtuple( 'BoardMetrics',
+    ( 'mines', 'bbbv', 'openings', 'isolated', 'islands', 'histogram', 'difficulty' ) )
+
+# Read a board as the binary digits of an integer
+_DIGITS = bytes.maketrans( b'\x00\x01', b'01' )
+
+
+@functools.lru_cache( maxsize = 8 )
+def _Masks( nrows, ncols ):
+    """Return the bit masks of all the cells, of all the columns but the first
+    and of all the columns but the last."""
+    row = '1' * ( ncols - 1 )
+    return ( ( 1 << ( nrows * ncols ) ) - 1,
+             int( ( ( '0' + row ) * nrows )[ ::-1 ], 2 ),
+             int( ( ( row + '0' ) * nrows )[ ::-1 ], 2 ) )
+
+
+def _Dilate( bits, ncols, masks ):
+    """Return the cells of bits and the cells around them."""
+    allCells, notFirstColumn, notLastColumn = masks
+    rows = bits | ( ( bits << 1 ) & notFirstColumn ) | ( ( bits >> 1 ) & notLastColumn )
+    return ( rows | ( rows << ncols ) | ( rows >> ncols ) ) & allCells
+
+
+def _CountRegions( bits, ncols, masks ):
+    """Return the number of connected regions of the cells of bits."""
+    allCells, notFirstColumn, notLastColumn = masks
+    count = 0
+    while bits:
+        # Grow a region from the first cell left, as _Dilate() does
+        region = bits & -bits
+        while True:
+            rows = region | ( ( region << 1 ) & notFirstColumn ) | ( ( region >> 1 ) & notLastColumn )
+            grown = ( rows | ( rows << ncols ) | ( rows >> ncols ) ) & bits
+            if grown == region:
+                break
+            region = grown
+        bits ^= region
+        count += 1
+    return count
+
+
+def Metrics( mines, nrows, ncols ):
+    """Return the BoardMetrics of the nrows x ncols board mines."""
+    if not nrows or not ncols:
+        # A board without cells has no digits to read
+        return BoardMetrics( 0, 0, 0, 0, 0, ( 0, ) * 9, 0.0 )
+    masks = _Masks( nrows, ncols )
+    allCells = masks[ 0 ]
+    bits = int( bytes( mines ).translate( _DIGITS )[ ::-1 ], 2 )
+
+    # The empty cells are the ones out of the mines and of the cells around
+    # them; the numbers around them are uncovered by the same click
+    empty = allCells & ~_Dilate( bits, ncols, masks )
+    isolated = allCells & ~bits & ~_Dilate( empty, ncols, masks )
+    openings = _CountRegions( empty, ncols, masks )
+    nisolated = isolated.bit_count()
+
+    # A mine gets 16 more than its count, so it's out of the histogram
+    ncells = nrows * ncols
+    counts = int.from_bytes( minesweeper.CountNeighbors( mines, nrows, ncols ), 'little' )
+    counts += int.from_bytes( mines, 'little' ) << 4
+    counts = counts.to_bytes( ncells, 'little' )
+    histogram = tuple( counts.count( n ) for n in range( 9 ) )
+
+    nmines = bits.bit_count()
+    bbbv = openings + nisolated
+    return BoardMetrics( nmines, bbbv, openings, nisolated, _CountRegions( isolated, ncols, masks ),
+                         histogram, bbbv / ( ncells - nmines ) if ncells > nmines else 0.0 )
+
+
+def GameMetrics( game ):
+    """Return the BoardMetrics of the board of a minesweeper.Game."""
+    return Metrics( game.mines, game.nrows, game.ncols )
+
+
+def _ChunkMetrics( boards, nrows, ncols ):
+    """Return the metrics of a chunk of boards, in a worker."""
+    return [ Metrics( mines, nrows, ncols ) for mines in boards ]
+
+
+def BatchMetrics( boards, nrows, ncols, executor = None ):
+    """Return the list of the BoardMetrics of boards, an iterable of nrows x
+    ncols boards. They are computed in chunks by executor, if supplied."""
+    if executor is None:
+        return [ Metrics( mines, nrows, ncols ) for mines in boards ]
+    boards = [ bytes( mines ) for mines in boards ]
+    futures = [ executor.submit( _ChunkMetrics, boards[ n : n + CHUNK_SIZE ], nrows, ncols )
+                for n in range( 0, len( boards ), CHUNK_SIZE ) ]
+    results = []
+    for future in futures:
+        results.extend( future.result() )
+    return results
@@ -0,0 +1,267 @@
+"""Pools of minesweeper boards ready to be played.
+
+Some boards take a while to be made (e.g. the ones of
+minesweepersolver.NoGuessGame(), drawn again and again until the solver can
+play them without guessing). A BoardPool makes them in advance on an executor
+(e.g. a concurrent.futures.ProcessPoolExecutor) and keeps a few of them for
+every size and number of mines, so a new game only pops one (or, if none is
+ready yet, starts a common game). A pool of one board made by a thread keeps
+the next common game ready in the same way.
+
+The boards are kept in memory and, if the pool has a directory, in files of
+the binary format of minesweeper.Dump(): the boards made before a run ends
+are played in the next runs.
+
+Example:
+
+    pool = BoardPool( minesweepersolver.NoGuessGame, executor, directory )
+    game = pool.Pop( 16, 30, 99 ) or minesweeper.Game( 16, 30, 99 )
+"""
+
+
+__author__    = "Alessandro Morgantini <gpz500@technologist.com>"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright © 2012-2023 Alessandro Morgantini"
+__license__   = "GPLv2"
+
+import functools
+import os
+import threading
+import uuid
+import minesweeper
+
+
+# The boards kept ready for every size and number of mines
+POOL_SIZE = 5
+
+
+class BoardPool:
+    """A pool of boards ready to be played, for every size and number of mines.
+
+    The boards are made by generate( nrows, ncols, nmines ), a function of a
+    module (so that it can run in another process) which returns a
+    minesweeper.Game, on executor. Pop() never waits for a board: if none is
+    ready the caller makes its own game. A size whose generate() fails isn't
+    made any more.
+
+    The boards of the directory are read by a thread, started by the
+    constructor: until they are read Pop() finds no board, and the boards
+    missing are made once they are read. The lock guards only the lists in
+    memory, never a file: the boards made by the executor are written from
+    its own thread."""
+
+    def __init__( self, generate, executor, directory = None, size = POOL_SIZE ):
+        """Initialize a pool, whose boards are kept in directory too, if not
+        None, and start reading the boards of the directory."""
+        self.generate = generate
+        self.executor = executor
+        self.directory = directory
+        self.size = size
+
+        # The ( filename, game ) boards ready and the count of the ones being
+        # made, by key, and the keys whose boards can't be made
+        self.boards = {}
+        self.pending = {}
+        self.failed = set()
+        
+        # The keys whose boards are being read from the directory (None for
+        # all of them), the threads reading them and the sizes to fill once
+        # they are read
+        self.reading = set()
+        self.readers = []
+        self.waiting = {}
+        self.lock = threading.Lock()
+        if directory is not None:
+            with self.lock:
+                self._StartReading( None )
+
+
+    def _Key( self, nrows, ncols, nmines ):
+        """Return the key of the boards of a size, also the name of their
+        directory."""
+        return "%dx%dx%d" % ( nrows, ncols, nmines )
+
+
+    def _Boards( self, key ):
+        """Return the boards ready for key, or None while they are read from
+        the directory: the reading starts if they aren't in memory (with the
+        lock held)."""
+        self.pending.setdefault( key, 0 )
+        if key in self.reading or None in self.reading:
+            return None
+        boards = self.boards.get( key )
+        if boards is None:
+            if self.directory is None:
+                boards = self.boards[ key ] = []
+            else:
+                self._StartReading( key )
+        return boards
+
+
+    def _StartReading( self, key ):
+        """Start a thread reading the boards of key (of every key if None)
+        from the directory (with the lock held)."""
+        self.reading.add( key )
+        reader = threading.Thread( target = self._Read, args = ( key, ), daemon = True )
+        self.readers.append( reader )
+        reader.start()
+
+
+    def _Read( self, key ):
+        """Read the boards of key (of every key if None) from the directory,
+        then make the boards missing from the sizes filled meanwhile (on a
+        thread of its own)."""
+        if key is None:
+            try:
+                keys = os.listdir( self.directory )
+            except OSError:
+                keys = []
+        else:
+            keys = [ key ]
+        read = {}
+        for k in keys:
+            boards = read[ k ] = []
+            dirname = os.path.join( self.directory, k )
+            try:
+                filenames = sorted( os.listdir( dirname ) )
+            except OSError:
+                filenames = []
+            for filename in filenames:
+                if not filename.endswith( ".mswp" ):
+                    continue
+                filename = os.path.join( dirname, filename )
+                try:
+                    with open( filename, "rb" ) as f:
+                        boards.append( ( filename, minesweeper.Load( f ) ) )
+                except ( IOError, minesweeper.MinesweeperError ):
+                    # A damaged board: drop it
+                    self._Remove( filename )
+
+        with self.lock:
+            self.reading.discard( key )
+            for k, boards in read.items():
+                # The boards made meanwhile may have been read from their file
+                filenames = set( filename for filename, game in boards )
+                boards.extend( board for board in self.boards.get( k, [] )
+                               if board[ 0 ] not in filenames )
+                self.boards[ k ] = boards
+            waiting = [ self.waiting.pop( k ) for k in list( self.waiting )
+                        if k not in self.reading and None not in self.reading ]
+        for size in waiting:
+            try:
+                self.Fill( *size )
+            except RuntimeError:
+                # The executor has been shut down
+                pass
+        with self.lock:
+            self.readers.remove( threading.current_thread() )
+
+
+    def Wait( self ):
+        """Wait until the boards of the directory have been read."""
+        while True:
+            with self.lock:
+                readers = list( self.readers )
+            if not readers:
+                return
+            for reader in readers:
+                reader.join()
+
+
+    def _Remove( self, filename ):
+        """Remove the file of a board, if any."""
+        if filename is not None:
+            try:
+                os.remove( filename )
+            except OSError:
+                pass
+
+
+    def _Store( self, key, game ):
+        """Write game in the directory and return its filename (None without
+        a directory)."""
+        if self.directory is None:
+            return None
+        dirname = os.path.join( self.directory, key )
+        os.makedirs( dirname, exist_ok = True )
+        filename = os.path.join( dirname, uuid.uuid4().hex + ".mswp" )
+        with open( filename + ".tmp", "wb" ) as f:
+            minesweeper.Dump( game, f )
+        os.replace( filename + ".tmp", filename )
+        return filename
+
+
+    def Count( self, nrows, ncols, nmines ):
+        """Return the number of boards ready for a size."""
+        with self.lock:
+            return len( self._Boards( self._Key( nrows, ncols, nmines ) ) or [] )
+
+
+    def Failed( self, nrows, ncols, nmines ):
+        """Return True if the boards of a size can't be made, i.e. if
+        generate() failed on them."""
+        with self.lock:
+            return self._Key( nrows, ncols, nmines ) in self.failed
+            
+            
+    def Pop( self, nrows, ncols, nmines ):
+        """Return a board of nrows x ncols with nmines mines, or None if none
+        is ready, and make new boards to fill the pool again."""
+        key = self._Key( nrows, ncols, nmines )
+        with self.lock:
+            boards = self._Boards( key )
+            filename, game = boards.pop( 0 ) if boards else ( None, None )
+        self._Remove( filename )
+        self.Fill( nrows, ncols, nmines )
+        return game
+
+
+    def Fill( self, nrows, ncols, nmines ):
+        """Start making the boards missing from the pool of a size (once
+        they have been read from the directory)."""
+        key = self._Key( nrows, ncols, nmines )
+        with self.lock:
+            if key in self.failed:
+                return
+            boards = self._Boards( key )
+            if boards is None:
+                self.waiting[ key ] = ( nrows, ncols, nmines )
+                return
+            missing = self.size - len( boards ) - self.pending[ key ]
+            self.pending[ key ] += max( missing, 0 )
+        for n in range( missing ):
+            future = self.executor.submit( self.generate, nrows, ncols, nmines )
+            future.add_done_callback( functools.partial( self._Done, key ) )
+
+
+    def _Done( self, key, future ):
+        """Add a board made by the executor to the pool (from the executor
+        thread)."""
+        if future.cancelled() or future.exception() is not None:
+            with self.lock:
+                self.pending[ key ] -= 1
+                if not future.cancelled():
+                    # The next boards of the size would fail in the same way
+                    self.failed.add( key )
+            return
+        game = future.result()
+        try:
+            filename = self._Store( key, game )
+        except OSError:
+            # The board is kept in memory only
+            filename = None
+            
+        # The boards of a forgotten size are read again from their files
+        with self.lock:
+            self.pending[ key ] -= 1
+            if key in self.boards or key in self.reading or None in self.reading:
+                self.boards.setdefault( key, [] ).append( ( filename, game ) )
+
+
+    def Forget( self, nrows, ncols, nmines ):
+        """Drop the boards of a size kept in memory, e.g. when another size
+        is chosen. Their files are kept, and read again by the next Pop()
+        of the size."""
+        with self.lock:
+            self.boards.pop( self._Key( nrows, ncols, nmines ), None )
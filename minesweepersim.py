@@ -0,0 +1,177 @@
+"""Minesweeper simulations.
+
+This module plays many minesweeper games without a user interface, to measure
+how well a strategy does. A strategy is a GameSolver, which uncovers the cells
+which are surely safe, and a guessing policy, which chooses the cell to
+uncover when no cell is sure:
+    - safest, the cell with the lowest probability of a mine (the ties are
+      broken at random)
+    - random, any unknown cell
+
+The games are spread over a process pool. Every game gets its own seed, drawn
+from the seed of the batch, so the results don't depend on the number of
+workers and a batch can be played again.
+
+Example:
+
+    results = Simulate( 16, 30, 99, games = 1000, policy = 'safest', seed = 1 )
+    print( Report( results ) )
+
+or, from the command line:
+
+    $ python minesweepersim.py --games 1000 --rows 16 --cols 30 --mines 99
+"""
+
+
+__author__    = "Alessandro Morgantini <gpz500@technologist.com>"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright © 2012-2023 Alessandro Morgantini"
+__license__   = "GPLv2"
+
+import concurrent.futures
+import math
+import os
+import random
+import time
+import minesweeper
+import minesweepersolver
+
+
+# The number of games sent to a worker at once
+CHUNK_SIZE = 50
+
+
+def GuessSafest( solver, unknown, rng ):
+    """Return the unknown cell with the lowest probability of a mine."""
+    ncols = solver.ncols
+    probabilities = solver.Probabilities()
+    best = min( probabilities[ k // ncols ][ k % ncols ] for k in unknown )
+    return rng.choice( [ k for k in unknown if probabilities[ k // ncols ][ k % ncols ] <= best + 1e-12 ] )
+
+
+def GuessRandom( solver, unknown, rng ):
+    """Return any unknown cell."""
+    return rng.choice( unknown )
+
+
+# The guessing policies, by name
+POLICIES = {
+    'safest': GuessSafest,
+    'random': GuessRandom,
+}
+
+
+def PlayGame( nrows, ncols, nmines, policy, seed ):
+    """Play a game to the end, uncovering the sure cells and guessing with
+    policy (a name of POLICIES) when none is sure.
+
+    seed is the seed of both the mines and the guesses. Return ( won, moves,
+    guesses ): the moves are all the uncovered cells, the guesses the ones
+    chosen by the policy."""
+    guess = POLICIES[ policy ]
+    rng = random.Random( seed )
+    game = minesweeper.Game( nrows, ncols, nmines, seed = rng )
+    solver = minesweepersolver.GameSolver( game )
+    statuses = game.statuses
+    moves = guesses = 0
+    bomb = False
+    while not bomb and game.GetToDiscover():
+        safe, mined = solver.Solve()
+        if safe:
+            for i, j in safe:
+                if statuses[ i * ncols + j ] != minesweeper.Cell.REVEALED:
+                    game.Uncover( i, j )
+                    moves += 1
+            continue
+        unknown = [ k for k, state in enumerate( solver.states ) if state == minesweepersolver.Solver.UNKNOWN ]
+        bomb = game.Uncover( *divmod( guess( solver, unknown, rng ), ncols ) )
+        moves += 1
+        guesses += 1
+    solver.Close()
+    return ( not bomb, moves, guesses )
+
+
+def _PlayGames( nrows, ncols, nmines, policy, seeds ):
+    """Play a game for every seed of seeds, in a worker."""
+    return [ PlayGame( nrows, ncols, nmines, policy, seed ) for seed in seeds ]
+
+
+def Simulate( nrows, ncols, nmines, games, policy = 'safest', seed = None, workers = None ):
+    """Play games games of nrows x ncols with nmines mines and return the list
+    of their ( won, moves, guesses ), in the order of their seeds.
+
+    The games are played by a ProcessPoolExecutor with workers processes (all
+    the CPUs if None), or in this process if workers is 1."""
+    if policy not in POLICIES:
+        raise ValueError( "Unknown policy %s" % policy )
+    if nmines > nrows * ncols:
+        raise minesweeper.MinesweeperMinesCount( "Too much mines!" )
+    rng = random.Random( seed )
+    seeds = [ rng.getrandbits( 64 ) for n in range( games ) ]
+    chunks = [ seeds[ n : n + CHUNK_SIZE ] for n in range( 0, games, CHUNK_SIZE ) ]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return _PlayGames( nrows, ncols, nmines, policy, seeds )
+    results = []
+    with concurrent.futures.ProcessPoolExecutor( max_workers = workers ) as executor:
+        futures = [ executor.submit( _PlayGames, nrows, ncols, nmines, policy, chunk ) for chunk in chunks ]
+        for future in futures:
+            results.extend( future.result() )
+    return results
+
+
+def WilsonInterval( wins, games, z = 1.96 ):
+    """Return the ( low, high ) Wilson score interval of the win rate, at
+    95% confidence with the default z."""
+    if not games:
+        return ( 0.0, 1.0 )
+    p = wins / games
+    center = ( p + z * z / ( 2 * games ) ) / ( 1 + z * z / games )
+    spread = z * math.sqrt( p * ( 1 - p ) / games + z * z / ( 4 * games * games ) ) / ( 1 + z * z / games )
+    return ( max( 0.0, center - spread ), min( 1.0, center + spread ) )
+
+
+def Report( results, elapsed = None ):
+    """Return a text report of the results of Simulate(): win rate with its
+    95% confidence interval, moves and guesses per game and, if elapsed
+    (the seconds taken) is given, the throughput."""
+    games = len( results )
+    wins = sum( won for won, moves, guesses in results )
+    low, high = WilsonInterval( wins, games )
+    lines = [
+        "games       %d" % games,
+        "won         %d (%.2f%%, 95%% CI %.2f%% - %.2f%%)" % ( wins, 100 * wins / max( games, 1 ), 100 * low, 100 * high ),
+        "moves       %.2f per game" % ( sum( moves for won, moves, guesses in results ) / max( games, 1 ) ),
+        "guesses     %.2f per game" % ( sum( guesses for won, moves, guesses in results ) / max( games, 1 ) ),
+    ]
+    if elapsed:
+        lines.append( "throughput  %.1f games/s in %.2fs" % ( games / elapsed, elapsed ) )
+    return "\n".join( lines )
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser( description = "Play minesweeper games without a user interface." )
+    parser.add_argument( '-n', '--games', type = int, default = 1000, help = "the number of games" )
+    parser.add_argument( '--rows', type = int, default = 16, help = "the rows of the table" )
+    parser.add_argument( '--cols', type = int, default = 30, help = "the columns of the table" )
+    mines = parser.add_mutually_exclusive_group()
+    mines.add_argument( '--mines', type = int, help = "the number of mines (default 99)" )
+    mines.add_argument( '--density', type = float, help = "the mines as a fraction of the cells" )
+    parser.add_argument( '--policy', choices = sorted( POLICIES ), default = 'safest',
+                         help = "how to guess when no cell is sure" )
+    parser.add_argument( '--seed', type = int, help = "the seed of the batch" )
+    parser.add_argument( '--workers', type = int, help = "the worker processes (default all the CPUs)" )
+    args = parser.parse_args()
+    if args.density is not None:
+        nmines = round( args.density * args.rows * args.cols )
+    else:
+        nmines = 99 if args.mines is None else args.mines
+    if nmines > args.rows * args.cols:
+        parser.error( "too many mines for a %dx%d table" % ( args.rows, args.cols ) )
+
+    start = time.perf_counter()
+    results = Simulate( args.rows, args.cols, nmines, args.games, args.policy, args.seed, args.workers )
+    print( "%dx%d, %d mines, policy %s" % ( args.rows, args.cols, nmines, args.policy ) )
+    print( Report( results, time.perf_counter() - start ) )
@@ -0,0 +1,572 @@
+"""Minesweeper solver.
+
+This module finds the cells of a minesweeper table which are surely safe and
+the ones which surely hide a mine, looking only at what the player sees: the
+numbers of the revealed cells. It gives two classes:
+    - Solver, which is told the revealed cells one by one (e.g. from an
+      observation of the visible table)
+    - GameSolver, a Solver which follows the moves of a minesweeper.Game
+
+Every revealed number is a constraint: the count of mines among its unknown
+neighbors. The constraints are reduced with the single cell rules (no mines
+left, or as many mines as cells) and with the subset and pairwise rules on
+two overlapping constraints. The work is incremental: a new revealed cell
+updates only the constraints it touches.
+
+When no cell is sure, Probabilities() gives the probability of a mine in
+every cell: the frontier (the unknown cells next to a number) is split in
+independent components, the mine layouts of every component are counted,
+and the components are weighted together with the unknown cells out of the
+frontier by the count of the remaining mines.
+
+Example:
+
+    solver = GameSolver( game )
+    safe, mined = solver.Solve()
+    probabilities = solver.Probabilities()
+"""
+
+
+__author__    = "Alessandro Morgantini <gpz500@technologist.com>"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright © 2012-2023 Alessandro Morgantini"
+__license__   = "GPLv2"
+
+import math
+import random
+import minesweeper
+
+
+# The default number of steps allowed to count the layouts of a component of
+# the frontier: a bigger component gets an estimate of its probabilities
+MAX_NODES = 100000
+
+# The number of components whose counts are kept between two calls of
+# Probabilities()
+CACHE_SIZE = 1000
+
+# The components with more cells than this are counted by the executor
+# passed to Probabilities(), if any: the smaller ones cost less than sending
+# them to another process
+PARALLEL_CELLS = 16
+
+# The boards drawn by NoGuessGame() before giving up
+MAX_TRIES = 1000
+
+# The highest fraction of mines of the boards made by NoGuessGame(): at 22%
+# a few boards in a hundred need no guesses, at 25% almost none
+MAX_NO_GUESS_DENSITY = 0.22
+
+
+class _OutOfNodes( Exception ):
+    pass
+    
+
+def _CountLayouts( component, maxNodes ):
+    """Count the mine layouts of a component of the frontier, a list of
+    ( cells, count ) constraints.
+    
+    Return ( cells, weights, hits ): weights[ m ] is the number of layouts
+    with m mines, hits[ m ][ n ] the number of them with a mine in
+    cells[ n ]. Return None if it takes more than maxNodes steps. It's a
+    function of the module, so that it can run in another process."""
+    
+    # The cells in the order of their constraints, so that every
+    # constraint is closed as soon as possible, and the constraints of
+    # every cell
+    cells = []
+    position = {}
+    for constraintCells, count in component:
+        for k in sorted( constraintCells ):
+            if k not in position:
+                position[ k ] = len( cells )
+                cells.append( k )
+    checks = [ [] for k in cells ]
+    need = []
+    free = []
+    for c, ( constraintCells, count ) in enumerate( component ):
+        for k in constraintCells:
+            checks[ position[ k ] ].append( c )
+        need.append( count )
+        free.append( len( constraintCells ) )
+        
+    ncells = len( cells )
+    weights = [ 0 ] * ( ncells + 1 )
+    hits = [ [ 0 ] * ncells for m in range( ncells + 1 ) ]
+    mines = []
+    nodes = [ maxNodes ]
+    
+    def Assign( n ):
+        nodes[ 0 ] -= 1
+        if nodes[ 0 ] < 0:
+            raise _OutOfNodes
+        if n == ncells:
+            m = len( mines )
+            weights[ m ] += 1
+            row = hits[ m ]
+            for x in mines:
+                row[ x ] += 1
+            return
+        cellChecks = checks[ n ]
+        for mine in ( 0, 1 ):
+            fits = True
+            for c in cellChecks:
+                free[ c ] -= 1
+                need[ c ] -= mine
+                if need[ c ] < 0 or need[ c ] > free[ c ]:
+                    fits = False
+            if fits:
+                if mine:
+                    mines.append( n )
+                Assign( n + 1 )
+                if mine:
+                    mines.pop()
+            for c in cellChecks:
+                free[ c ] += 1
+                need[ c ] += mine
+                
+    try:
+        Assign( 0 )
+    except ( _OutOfNodes, RecursionError ):
+        return None
+    return ( cells, weights, hits )
+    
+    
+class Solver:
+    """A solver of the visible table of a game.
+
+    The cells are addressed by their flat index k = i * ncols + j, as in the
+    arrays of minesweeper.Game, and the results are coordinates."""
+
+    # What the solver knows about a cell
+    UNKNOWN, SAFE, MINE, REVEALED = list( range( 4 ) )
+
+    def __init__( self, nrows, ncols ):
+        """Initialize a solver of a table with every cell covered."""
+        self.nrows = nrows
+        self.ncols = ncols
+        self.neighborTable = minesweeper.NeighborTable( nrows, ncols )
+        
+        # The layouts counted for the components of the frontier: they don't
+        # depend on the rest of the table, so they are kept by Clear()
+        self.layouts = {}
+        self.Clear()
+
+    def Clear( self ):
+        """Forget every revealed cell and deduction."""
+
+        # The knowledge of every cell, and the cells still covered which are
+        # surely safe or mined
+        self.states = bytearray( self.nrows * self.ncols )
+        self.safe = set()
+        self.mined = set()
+        self.exploded = set()
+        self.revealed = 0
+
+        # The constraints: the set of unknown cells -> the mines among them,
+        # the constraints of every unknown cell and the ones to reduce
+        self.constraints = {}
+        self.cellConstraints = {}
+        self.queue = []
+
+    def Reveal( self, i, j, number ):
+        """Tell that the cell (i, j) has been revealed and shows number (the
+        count of its neighbor mines)."""
+        self._Reveal( i * self.ncols + j, number )
+
+    def Explode( self, i, j ):
+        """Tell that the cell (i, j) has been revealed and it's a mine."""
+        k = i * self.ncols + j
+        if self.states[ k ] == Solver.REVEALED:
+            return
+        self._SetKnown( k, True )
+        self.states[ k ] = Solver.REVEALED
+        self.mined.discard( k )
+        self.exploded.add( k )
+        self.revealed += 1
+
+    def _Reveal( self, k, number ):
+        """Tell that the cell k has been revealed and shows number."""
+        states = self.states
+        if states[ k ] == Solver.REVEALED:
+            return
+        self._SetKnown( k, False )
+        states[ k ] = Solver.REVEALED
+        self.safe.discard( k )
+        self.revealed += 1
+
+        # The constraint of the new number on its unknown neighbors
+        offsets, indices = self.neighborTable
+        cells = []
+        for n in indices[ offsets[ k ] : offsets[ k + 1 ] ]:
+            if states[ n ] == Solver.UNKNOWN:
+                cells.append( n )
+            elif states[ n ] == Solver.MINE:
+                number -= 1
+        self._AddConstraint( frozenset( cells ), number )
+
+    def _SetKnown( self, k, mine ):
+        """Record that the unknown cell k is surely mined (or safe), removing it
+        from its constraints."""
+        if self.states[ k ] != Solver.UNKNOWN:
+            return
+        if mine:
+            self.states[ k ] = Solver.MINE
+            self.mined.add( k )
+        else:
+            self.states[ k ] = Solver.SAFE
+            self.safe.add( k )
+        for cells in self.cellConstraints.pop( k, () ):
+            count = self._RemoveConstraint( cells )
+            self._AddConstraint( cells - { k }, count - 1 if mine else count )
+
+    def _AddConstraint( self, cells, count ):
+        """Add the constraint: count mines among the unknown cells."""
+        if not cells or cells in self.constraints:
+            return
+        self.constraints[ cells ] = count
+        cellConstraints = self.cellConstraints
+        for k in cells:
+            if k in cellConstraints:
+                cellConstraints[ k ].add( cells )
+            else:
+                cellConstraints[ k ] = { cells }
+        self.queue.append( cells )
+
+    def _RemoveConstraint( self, cells ):
+        """Remove a constraint, returning its count of mines."""
+        count = self.constraints.pop( cells )
+        cellConstraints = self.cellConstraints
+        for k in cells:
+            if k in cellConstraints:
+                cellConstraints[ k ].discard( cells )
+        return count
+
+    def _Reduce( self, cells ):
+        """Apply the rules to a constraint and to the ones overlapping it."""
+        constraints = self.constraints
+        count = constraints[ cells ]
+
+        # Single cell rules
+        if count == 0 or count == len( cells ):
+            self._RemoveConstraint( cells )
+            for k in cells:
+                self._SetKnown( k, count != 0 )
+            return
+
+        # Subset and pairwise rules
+        others = set()
+        for k in cells:
+            others |= self.cellConstraints.get( k, () )
+        others.discard( cells )
+        for other in others:
+            if cells not in constraints:
+                return
+            if other not in constraints:
+                continue
+            otherCount = constraints[ other ]
+            if cells < other:
+                self._AddConstraint( other - cells, otherCount - count )
+            elif other < cells:
+                self._AddConstraint( cells - other, count - otherCount )
+            else:
+                # The cells out of the other constraint must hold at least
+                # count - otherCount mines: if that's all of them, they are
+                # mined and the other constraint's own cells are safe
+                onlyCells = cells - other
+                onlyOther = other - cells
+                if count - otherCount == len( onlyCells ):
+                    mined, safe = onlyCells, onlyOther
+                elif otherCount - count == len( onlyOther ):
+                    mined, safe = onlyOther, onlyCells
+                else:
+                    continue
+                for k in mined:
+                    self._SetKnown( k, True )
+                for k in safe:
+                    self._SetKnown( k, False )
+
+    def Solve( self ):
+        """Return ( safe, mined ): the lists of the coordinates of the covered
+        cells which are surely safe and of the ones which surely hide a mine."""
+        queue = self.queue
+        while queue:
+            cells = queue.pop()
+            if cells in self.constraints:
+                self._Reduce( cells )
+        ncols = self.ncols
+        return ( [ divmod( k, ncols ) for k in sorted( self.safe ) ],
+                 [ divmod( k, ncols ) for k in sorted( self.mined ) ] )
+                 
+    def _Components( self ):
+        """Split the constraints in independent components: return a list of
+        lists of ( cells, count ), one for every component."""
+        constraints = self.constraints
+        cellConstraints = self.cellConstraints
+        components = []
+        seen = set()
+        for first in constraints:
+            if first in seen:
+                continue
+            seen.add( first )
+            component = []
+            queue = [ first ]
+            while queue:
+                cells = queue.pop()
+                component.append( ( cells, constraints[ cells ] ) )
+                for k in cells:
+                    for other in cellConstraints[ k ]:
+                        if other not in seen:
+                            seen.add( other )
+                            queue.append( other )
+            components.append( component )
+        return components
+        
+    def _Layouts( self, components, maxNodes, executor ):
+        """Return the layouts of every component, as _CountLayouts() does.
+        
+        The results are kept, so an unchanged component isn't counted again.
+        The components with more than PARALLEL_CELLS cells are counted by
+        executor (e.g. a concurrent.futures.ProcessPoolExecutor), if any."""
+        layouts = self.layouts
+        keys = [ frozenset( component ) for component in components ]
+        missing = [ n for n, key in enumerate( keys ) if key not in layouts ]
+        if len( layouts ) + len( missing ) > CACHE_SIZE:
+            layouts.clear()
+            missing = list( range( len( components ) ) )
+        futures = {}
+        if executor is not None:
+            for n in missing:
+                if len( frozenset().union( *( cells for cells, count in components[ n ] ) ) ) > PARALLEL_CELLS:
+                    futures[ n ] = executor.submit( _CountLayouts, components[ n ], maxNodes )
+        for n in missing:
+            if n not in futures:
+                layouts[ keys[ n ] ] = _CountLayouts( components[ n ], maxNodes )
+        for n, future in futures.items():
+            layouts[ keys[ n ] ] = future.result()
+        return [ layouts[ key ] for key in keys ]
+        
+    def Probabilities( self, nmines, maxNodes = MAX_NODES, executor = None ):
+        """Return the probability of a mine in every cell, as a list of rows,
+        when the table has nmines mines.
+        
+        The revealed cells have probability 0 (1 if they are mines), the sure
+        cells found by Solve() 0 or 1. The layouts of a component of the
+        frontier are counted exactly, unless it takes more than maxNodes
+        steps: then its cells get the mean density of their constraints and
+        are weighted as the cells out of the frontier. The big components are
+        counted in parallel by executor, a concurrent.futures.Executor (e.g.
+        a ProcessPoolExecutor), if supplied."""
+        self.Solve()
+        states = self.states
+        probabilities = [ 0.0 ] * len( states )
+        for k in self.mined:
+            probabilities[ k ] = 1.0
+        for k in self.exploded:
+            probabilities[ k ] = 1.0
+            
+        # The components of the frontier with their layouts, and the other
+        # unknown cells
+        counted = []
+        estimated = []
+        components = self._Components()
+        for component, layouts in zip( components, self._Layouts( components, maxNodes, executor ) ):
+            if layouts is None:
+                estimated.append( component )
+            else:
+                counted.append( layouts )
+        frontier = set()
+        for cells, weights, hits in counted:
+            frontier.update( cells )
+        others = [ k for k in range( len( states ) )
+                   if states[ k ] == Solver.UNKNOWN and k not in frontier ]
+        nothers = len( others )
+        remaining = nmines - len( self.mined ) - len( self.exploded )
+        
+        # The weight of a number of mines in the frontier is the product of
+        # the layouts of the components, times the ways to put the rest
+        # among the other cells: convolve the components, leaving out one at
+        # a time for the probabilities of its cells
+        def Convolve( first, second ):
+            result = [ 0 ] * ( len( first ) + len( second ) - 1 )
+            for m, a in enumerate( first ):
+                if a:
+                    for n, b in enumerate( second ):
+                        result[ m + n ] += a * b
+            return result
+            
+        prefixes = [ [ 1 ] ]
+        for cells, weights, hits in counted:
+            prefixes.append( Convolve( prefixes[ -1 ], weights ) )
+        spreads = [ math.comb( nothers, remaining - m ) if 0 <= remaining - m <= nothers else 0
+                    for m in range( len( prefixes[ -1 ] ) ) ]
+        suffix = [ 1 ]
+        total = sum( w * spreads[ m ] for m, w in enumerate( prefixes[ -1 ] ) )
+        if not total:
+            raise minesweeper.MinesweeperError( "Error: no layout of the mines fits the table" )
+        for index in range( len( counted ) - 1, -1, -1 ):
+            cells, weights, hits = counted[ index ]
+            rest = Convolve( prefixes[ index ], suffix )
+            spread = [ 0 ] * len( weights )
+            for m in range( len( weights ) ):
+                if weights[ m ]:
+                    spread[ m ] = sum( w * spreads[ m + r ] for r, w in enumerate( rest ) )
+            for n, k in enumerate( cells ):
+                probabilities[ k ] = sum( hits[ m ][ n ] * spread[ m ] for m in range( len( weights ) ) ) / total
+            suffix = Convolve( suffix, weights )
+            
+        # The cells out of the frontier share the mines left by it
+        if nothers:
+            share = sum( w * spreads[ m ] * ( remaining - m ) for m, w in enumerate( prefixes[ -1 ] ) )
+            share /= total * nothers
+            for k in others:
+                probabilities[ k ] = share
+        for component in estimated:
+            densities = {}
+            for cells, count in component:
+                for k in cells:
+                    densities.setdefault( k, [] ).append( count / len( cells ) )
+            for k, values in densities.items():
+                probabilities[ k ] = sum( values ) / len( values )
+                
+        ncols = self.ncols
+        return [ probabilities[ i : i + ncols ] for i in range( 0, len( probabilities ), ncols ) ]
+
+
+class GameSolver( Solver ):
+    """A solver which follows the moves of a minesweeper.Game.
+
+    It's a listener of the game: the cells revealed by every move are added
+    to what it knows. If some cell is covered again (by Undo() or Restart())
+    the solver starts again from the revealed cells of the game."""
+
+    def __init__( self, game ):
+        """Initialize the solver with the revealed cells of game."""
+        Solver.__init__( self, game.nrows, game.ncols )
+        self.game = game
+        self.Reset()
+        game.AddListener( self.OnGameChanged )
+
+    def Reset( self ):
+        """Start again from the revealed cells of the game."""
+        self.Clear()
+        game = self.game
+        statuses = game.statuses
+        states = self.states
+        revealed = []
+        k = statuses.find( minesweeper.Cell.REVEALED )
+        while k >= 0:
+            revealed.append( k )
+            states[ k ] = Solver.REVEALED
+            k = statuses.find( minesweeper.Cell.REVEALED, k + 1 )
+        self.revealed = len( revealed )
+        self.stale = False
+        
+        # All the revealed cells are known first, so every number gets its
+        # constraint at once
+        offsets, indices = self.neighborTable
+        for k in revealed:
+            if game.mines[ k ]:
+                self.exploded.add( k )
+                continue
+            number = game.neighbors[ k ]
+            cells = []
+            for n in indices[ offsets[ k ] : offsets[ k + 1 ] ]:
+                if states[ n ] == Solver.UNKNOWN:
+                    cells.append( n )
+                elif game.mines[ n ]:
+                    # An exploded mine
+                    number -= 1
+            self._AddConstraint( frozenset( cells ), number )
+
+    def _RevealGameCell( self, k ):
+        """Add the revealed cell k of the game."""
+        if self.game.mines[ k ]:
+            self.Explode( *divmod( k, self.ncols ) )
+        else:
+            self._Reveal( k, self.game.neighbors[ k ] )
+
+    def OnGameChanged( self, game, changes ):
+        """Game listener: add the revealed cells."""
+        for k, oldStatus in changes:
+            if game.statuses[ k ] == minesweeper.Cell.REVEALED:
+                if self.states[ k ] != Solver.REVEALED:
+                    self._RevealGameCell( k )
+            elif oldStatus == minesweeper.Cell.REVEALED:
+                self.stale = True
+
+    def Solve( self ):
+        """Return ( safe, mined ) as Solver.Solve() does, for the current
+        state of the game."""
+        # Restart() doesn't notify the listeners: it's caught by the count of
+        # the revealed cells
+        if self.stale or self.game.statuses.count( minesweeper.Cell.REVEALED ) != self.revealed:
+            self.Reset()
+        return Solver.Solve( self )
+
+    def Probabilities( self, nmines = None, maxNodes = MAX_NODES, executor = None ):
+        """Return the probabilities of a mine as Solver.Probabilities() does,
+        for the current state of the game. nmines defaults to the mines of
+        the game."""
+        return Solver.Probabilities( self, self.game.nmines if nmines is None else nmines,
+                                     maxNodes, executor )
+        
+    def Close( self ):
+        """Stop following the game."""
+        self.game.RemoveListener( self.OnGameChanged )
+
+
+
+def IsNoGuess( game, start ):
+    """Return True if the solver plays game to the end, from the cell start
+    ( i, j ) (if not revealed yet), without guessing. game isn't changed."""
+    trial = game.Fork()
+    solver = GameSolver( trial )
+    statuses = trial.statuses
+    ncols = trial.ncols
+    i, j = start
+    bomb = statuses[ i * ncols + j ] != minesweeper.Cell.REVEALED and trial.Uncover( i, j )
+    while not bomb and trial.GetToDiscover():
+        safe, mined = solver.Solve()
+        if not safe:
+            break
+        for i, j in safe:
+            if statuses[ i * ncols + j ] != minesweeper.Cell.REVEALED:
+                trial.Uncover( i, j )
+    solver.Close()
+    return not bomb and not trial.GetToDiscover()
+
+
+def CanBeNoGuess( nrows, ncols, nmines ):
+    """Return True if NoGuessGame() makes boards of this size, i.e. if the
+    mines aren't too dense to avoid guessing."""
+    return nmines <= MAX_NO_GUESS_DENSITY * nrows * ncols
+
+
+def NoGuessGame( nrows, ncols, nmines, seed = None, maxTries = MAX_TRIES ):
+    """Return a game which can be played to the end without guessing, with
+    its first cell (an opening) already revealed.
+    
+    The boards are drawn at random until the solver plays one to the end
+    from one of its openings. seed is the seed of the random generator (an
+    integer or a random.Random instance). Raise minesweeper.MinesweeperError
+    if no board is found in maxTries tries, or at once if the mines are too
+    dense (see CanBeNoGuess())."""
+    if not CanBeNoGuess( nrows, ncols, nmines ):
+        raise minesweeper.MinesweeperError( "Too many mines for a board without guesses" )
+    rng = seed if isinstance( seed, random.Random ) else random.Random( seed )
+    for n in range( maxTries ):
+        game = minesweeper.Game( nrows, ncols, nmines, seed = rng )
+        openings = [ k for k in range( nrows * ncols ) if not game.mines[ k ] and not game.neighbors[ k ] ]
+        if not openings:
+            continue
+        start = divmod( rng.choice( openings ), ncols )
+        if IsNoGuess( game, start ):
+            game.Uncover( *start )
+            
+            # The first cell is part of the board, not a move of the player
+            game = game.Snapshot()
+            game.SetModified( False )
+            return game
+    raise minesweeper.MinesweeperError( "No board without guesses found in %d tries" % maxTries )
@@ -9,8 +9,23 @@ __date__ = "$Date$"
 __copyright__ = "Copyright © 2012-2023 Alessandro Morgantini"
 __license__ = "GPLv2"
 
+import base64
+import concurrent.futures
+import io
+import itertools
+import os
+import pickle
+import random
+import tempfile
+import types
 import unittest
+import Minesweeptk
 import minesweeper
+import minesweeperbits
+import minesweepermetrics
+import minesweeperpool
+import minesweepersim
+import minesweepersolver
 
 knownCoordinates = ( ( 0, 25 ),
                      ( 34, 5 ),
@@ -22,6 +37,36 @@ knownCoordinates = ( ( 0, 25 ),
                      ( 4, 4 ) )
 
 
+# A 2 x 3 game with a mine in (0, 0), pickled by release 0.12 (as a matrix of
+# Cells), followed by the saved options: the mine is flagged and (1, 2) has
+# been uncovered
+legacySave = base64.b64decode(
+    "gASVQQEAAAAAAACMC21pbmVzd2VlcGVylIwER2FtZZSTlCmBlChdlChoAIwEQ2VsbJSTlCmB"
+    "lH2UKIwBeJRLAIwBeZRLAIwGc3RhdHVzlEsCjA1uZWlnaGJvck1pbmVzlEsAjARtaW5llIh1"
+    "YmgGKYGUfZQoaAlLAGgKSwFoC0sBaAxLAWgNiXViaAYpgZR9lChoCUsAaApLAmgLSwFoDEsA"
+    "aA2JdWJlXZQoaAYpgZR9lChoCUsBaApLAGgLSwBoDEsBaA2JdWJoBimBlH2UKGgJSwFoCksB"
+    "aAtLAWgMSwFoDYl1YmgGKYGUfZQoaAlLAWgKSwJoC0sBaAxLAGgNiXViZWV9lCiMBWNlbGxz"
+    "lF2UKGgEaBJljAlfbW9kaWZpZWSUiIwKdG9EaXNjb3ZlcpRLAYwGbm1pbmVzlEsBjAZuZmxh"
+    "Z3OUSwF1Yi6ABEsCLoAElR0AAAAAAAAAfZQojAVucm93c5RLCYwFbmNvbHOUSwloHksKdS4=" )
+
+# The same save pickled with protocol 0, as the releases for Python 2 did
+legacySave0 = base64.b64decode(
+    "Y2NvcHlfcmVnCl9yZWNvbnN0cnVjdG9yCnAwCihjbWluZXN3ZWVwZXIKR2FtZQpwMQpjX19i"
+    "dWlsdGluX18KbGlzdApwMgoobHAzCihscDQKZzAKKGNtaW5lc3dlZXBlcgpDZWxsCnA1CmNf"
+    "X2J1aWx0aW5fXwpvYmplY3QKcDYKTnRwNwpScDgKKGRwOQpWeApwMTAKSTAKc1Z5CnAxMQpJ"
+    "MApzVnN0YXR1cwpwMTIKSTIKc1ZuZWlnaGJvck1pbmVzCnAxMwpJMApzVm1pbmUKcDE0Ckkw"
+    "MQpzYmFnMAooZzUKZzYKTnRwMTUKUnAxNgooZHAxNwpnMTAKSTAKc2cxMQpJMQpzZzEyCkkx"
+    "CnNnMTMKSTEKc2cxNApJMDAKc2JhZzAKKGc1Cmc2Ck50cDE4ClJwMTkKKGRwMjAKZzEwCkkw"
+    "CnNnMTEKSTIKc2cxMgpJMQpzZzEzCkkwCnNnMTQKSTAwCnNiYWEobHAyMQpnMAooZzUKZzYK"
+    "TnRwMjIKUnAyMwooZHAyNApnMTAKSTEKc2cxMQpJMApzZzEyCkkwCnNnMTMKSTEKc2cxNApJ"
+    "MDAKc2JhZzAKKGc1Cmc2Ck50cDI1ClJwMjYKKGRwMjcKZzEwCkkxCnNnMTEKSTEKc2cxMgpJ"
+    "MQpzZzEzCkkxCnNnMTQKSTAwCnNiYWcwCihnNQpnNgpOdHAyOApScDI5CihkcDMwCmcxMApJ"
+    "MQpzZzExCkkyCnNnMTIKSTEKc2cxMwpJMApzZzE0CkkwMApzYmFhdHAzMQpScDMyCihkcDMz"
+    "ClZjZWxscwpwMzQKKGxwMzUKZzQKYWcyMQphc1ZfbW9kaWZpZWQKcDM2CkkwMQpzVnRvRGlz"
+    "Y292ZXIKcDM3CkkxCnNWbm1pbmVzCnAzOApJMQpzVm5mbGFncwpwMzkKSTEKc2IuSTIKLihk"
+    "cDAKVm5yb3dzCnAxCkk5CnNWbmNvbHMKcDIKSTkKc1ZubWluZXMKcDMKSTEwCnMu" )
+
+
 class CellTest( unittest.TestCase ):
     
     statuses = ( minesweeper.Cell.COVERED,
@@ -171,6 +216,19 @@ class GameTest( unittest.TestCase ):
             computedList = [ cell.GetCoordinates() for cell in game.GetNeighborsList( i, j ) ]
             self.assertEqual( known,  tuple( computedList ) )
             
+    def testNeighborTable( self ):
+        """Games of the same size have to share the same neighbor table."""
+        game = minesweeper.Game()
+        self.assertIs( game.neighborTable, minesweeper.Game().neighborTable )
+        self.assertIs( game.neighborTable, minesweeper.NeighborTable( 16, 30 ) )
+        game.Restart()
+        self.assertIs( game.neighborTable, minesweeper.NeighborTable( 16, 30 ) )
+        self.assertIsNot( game.neighborTable, minesweeper.Game( 9, 9, 10 ).neighborTable )
+        offsets, indices = minesweeper.NeighborTable( 1, 3 )
+        self.assertEqual( [ 0, 1, 3, 4 ], list( offsets ) )
+        self.assertEqual( [ 1, 0, 2, 1 ], list( indices ) )
+        self.assertEqual( [ 0, 0 ], list( minesweeper.NeighborTable( 1, 1 )[ 0 ] ) )
+
     def testSetMines( self ):
         """Game must set correctly the mine from a known list."""
         if len( self.knownMines ) <= 25:
@@ -195,6 +253,13 @@ class GameTest( unittest.TestCase ):
                     self.assertEqual( False, cell.GetCoordinates() in self.knownMines )
                     
         self.assertEqual( minesCount, len( self.knownMines ) )
+        
+        # Any iterable of coordinates will do
+        mines = game.GetMines()
+        game.SetMines( set( mines ) )
+        self.assertEqual( game.GetMines(), mines )
+        game.SetMines( iter( mines ) )
+        self.assertEqual( game.GetMines(), mines )
                     
     def testNeighMines( self ):
         """Game must compute correctly the number of neighbors mines."""
@@ -239,6 +304,65 @@ class GameTest( unittest.TestCase ):
         coordList = [ cell.GetCoordinates() for cell in game.GetAutoUncoverList( startCell ) ]
         self.assertEqual( tuple( coordList ), self.knownAutouncover )
         
+    def testAutoUncoverRandom( self ):
+        """Flood fill has to give the same cells, in the same order, of a plain scan of the neighbors."""
+        for seed in range( 10 ):
+            game = minesweeper.Game( 20, 20, 30, seed = seed )
+            for cell in ( cell for row in game for cell in row ):
+                if not cell.HasMine() and not cell.GetNeighborMinesNum():
+                    break
+            notRevealedOrFlag = lambda x: x.GetStatus() not in ( minesweeper.Cell.REVEALED, minesweeper.Cell.FLAG )
+            known = list( filter( notRevealedOrFlag, game.GetNeighborsList( cell ) ) )
+            for nei in known:
+                if not nei.GetNeighborMinesNum():
+                    known.extend( item for item in game.GetNeighborsList( nei )
+                                  if notRevealedOrFlag( item ) and item not in known )
+            self.assertEqual( known, game.GetAutoUncoverList( cell ) )
+
+    def testUncoverLargeOpening( self ):
+        """Uncovering a cell of an empty big table has to uncover all of it."""
+        game = minesweeper.Game( 300, 300, 0 )
+        game.Flag( 299, 299 )
+        self.assertEqual( False, game.Uncover( 150, 150 ) )
+        self.assertEqual( 1, game.GetToDiscover() )
+        self.assertEqual( minesweeper.Cell.FLAG, game[ 299 ][ 299 ].GetStatus() )
+
+    def testOpenings( self ):
+        """A click on an empty cell has to uncover its opening as the flood fill does, and the openings give the 3BV."""
+        for seed in range( 10 ):
+            game = minesweeper.Game( 20, 20, 60, seed = seed )
+            flooded = minesweeper.Game( 20, 20, 60, seed = seed )
+            clicks = 0
+            for k in range( 400 ):
+                if not game.mines[ k ] and not game.neighbors[ k ] and game.statuses[ k ] != minesweeper.Cell.REVEALED:
+                    game.Uncover( *divmod( k, 20 ) )
+                    clicks += 1
+                    
+                    # The flood fill of a revealed cell, without the index
+                    cell = flooded[ k // 20 ][ k % 20 ]
+                    cell.SetStatus( minesweeper.Cell.REVEALED )
+                    for nei in flooded.GetAutoUncoverList( cell ):
+                        nei.SetStatus( minesweeper.Cell.REVEALED )
+                    self.assertEqual( flooded.statuses, game.statuses )
+            self.assertEqual( clicks, game.GetOpeningsNum() )
+            isolated = sum( 1 for k in range( 400 ) if not game.mines[ k ] and game.statuses[ k ] != minesweeper.Cell.REVEALED )
+            self.assertEqual( isolated, game.GetIsolatedNum() )
+            self.assertEqual( clicks + isolated, game.Get3BV() )
+            
+        # A flag in the opening stops the click there, as the flood fill does
+        game = minesweeper.Game( 9, 9, 1 )
+        game.SetMines( [ ( 0, 0 ) ] )
+        self.assertEqual( ( 1, 0, 1 ), ( game.GetOpeningsNum(), game.GetIsolatedNum(), game.Get3BV() ) )
+        for j in range( 9 ):
+            game.Flag( 4, j )
+        game.Uncover( 8, 8 )
+        self.assertEqual( 80 - 36, game.GetToDiscover() )
+        
+        # The index follows the mines
+        game.SetMines( [ ( 4, j ) for j in range( 9 ) ] )
+        self.assertEqual( 2, game.GetOpeningsNum() )
+        self.assertNotIn( '_openings', game.__getstate__() )
+        
     def testRestart( self ):
         """Game have to put all the cell statuses in COVERED and reset the count of uncovered cells."""
         game = minesweeper.Game()
@@ -248,7 +372,7 @@ class GameTest( unittest.TestCase ):
         game.Flag( 10, 22 )
         game.QMark( 10, 20 )
         game.Flag( 10, 23 )
-        
+        neighbors = bytes( game.neighbors )
         
         game.Restart()
         for row in game:
@@ -256,6 +380,8 @@ class GameTest( unittest.TestCase ):
                 self.assertEqual( minesweeper.Cell.COVERED, cell.GetStatus() )
                 
         self.assertEqual( game.GetMines(), minesList )
+        self.assertEqual( game.neighbors, neighbors )
+        self.assertEqual( 0, game.GetFlagsNum() )
         self.assertEqual( len( game ) * len( game[ 0 ] ) - len( minesList ), game.GetToDiscover() )
 
     def testUncoverMine( self ):
@@ -326,7 +452,772 @@ class GameTest( unittest.TestCase ):
         game.Restart()
         self.assertEqual( False, game.IsModified() )
 
+    def testSeed( self ):
+        """Games built with the same seed have to get the same mines."""
+        game = minesweeper.Game( seed = 1234 )
+        self.assertEqual( 99, len( game.GetMines() ) )
+        self.assertEqual( game.GetMines(), minesweeper.Game( seed = 1234 ).GetMines() )
+        self.assertNotEqual( game.GetMines(), minesweeper.Game( seed = 4321 ).GetMines() )
+        import random
+        game = minesweeper.Game( 9, 9, 10, random.Random( 5 ) )
+        self.assertEqual( game.GetMines(), minesweeper.Game( 9, 9, 10, random.Random( 5 ) ).GetMines() )
+
+    def testFullDensity( self ):
+        """Game must place every mine even when they fill the table."""
+        game = minesweeper.Game( 9, 9, 81 )
+        self.assertEqual( 81, len( game.GetMines() ) )
+        self.assertEqual( 0, game.GetToDiscover() )
+        self.assertEqual( 3, game[ 0 ][ 0 ].GetNeighborMinesNum() )
+        self.assertEqual( 5, game[ 0 ][ 4 ].GetNeighborMinesNum() )
+        self.assertEqual( 8, game[ 4 ][ 4 ].GetNeighborMinesNum() )
+
+    def testRandomNeighMines( self ):
+        """Neighbor mines of a random game have to match the mines around every cell."""
+        game = minesweeper.Game( 16, 30, 150, seed = 7 )
+        for row in game:
+            for cell in row:
+                count = sum( 1 for nei in game.GetNeighborsList( cell ) if nei.HasMine() )
+                self.assertEqual( count, cell.GetNeighborMinesNum() )
+
+    def testCellView( self ):
+        """Game cells have to read and write the game arrays."""
+        game = minesweeper.Game( 9, 9, 0 )
+        game.SetMines( self.knownMines )
+        cell = game[ 6 ][ 3 ]
+        self.assertEqual( ( 6, 3 ), cell.GetCoordinates() )
+        self.assertEqual( True, cell.HasMine() )
+        self.assertEqual( cell, game[ 6 ][ 3 ] )
+        cell.SetStatus( minesweeper.Cell.FLAG )
+        self.assertEqual( minesweeper.Cell.FLAG, game.statuses[ 6 * 9 + 3 ] )
+        self.assertEqual( minesweeper.Cell.FLAG, game[ 6 ][ 3 ].GetStatus() )
+        self.assertRaises( minesweeper.MinesweeperStatusError, cell.SetStatus, minesweeper.Cell.REVEALED )
+        
+        # Slices give lists of rows and of cells, as the lists of older releases
+        rows = game[ 5 : 8 ]
+        self.assertEqual( 3, len( rows ) )
+        self.assertEqual( cell, rows[ 1 ][ 3 ] )
+        self.assertEqual( [ ( 6, 1 ), ( 6, 3 ), ( 6, 5 ) ], [ c.GetCoordinates() for c in game[ 6 ][ 1 : 7 : 2 ] ] )
+        self.assertEqual( [ 8, 7 ], [ row[ 0 ].GetCoordinates()[ 0 ] for row in game[ : -3 : -1 ] ] )
+        self.assertEqual( [], game[ 9 : ] )
+        self.assertEqual( 9, len( game[ 0 ][ : ] ) )
+
+    def testPickle( self ):
+        """A pickled game has to be restored with the same cells and counters."""
+        game = minesweeper.Game()
+        game.Flag( 2, 3 )
+        game.Uncover( *game.GetMines()[ 0 ] )
+        copy = pickle.loads( pickle.dumps( game ) )
+        self.assertEqual( game.statuses, copy.statuses )
+        self.assertEqual( game.GetMines(), copy.GetMines() )
+        self.assertEqual( game.neighbors, copy.neighbors )
+        self.assertEqual( ( game.toDiscover, game.nflags, game.IsModified() ),
+                          ( copy.toDiscover, copy.nflags, copy.IsModified() ) )
+        self.assertIs( game.neighborTable, copy.neighborTable )
+        self.assertNotIn( b'neighborTable', pickle.dumps( game ) )
+
+    def testSnapshot( self ):
+        """A snapshot has to keep the game as it was when taken."""
+        game = minesweeper.Game( 9, 9, 10, seed = 1 )
+        game.AddListener( lambda game, changes: None )
+        game.Flag( 2, 3 )
+        snapshot = game.Snapshot()
+        data = minesweeper.Dumps( game )
+        game.Flag( 2, 3, reset = True )
+        game.Uncover( *game.GetMines()[ 0 ] )
+        self.assertEqual( minesweeper.Dumps( snapshot ), data )
+        self.assertEqual( snapshot._listeners, [] )
+        self.assertIs( game.neighborTable, snapshot.neighborTable )
+
+    def testFork( self ):
+        """A fork and its game have to be independent, sharing only the mines until they're set."""
+        game = minesweeper.Game( 16, 30, 99, seed = 1 )
+        changed = []
+        game.AddListener( lambda game, changes: changed.append( changes ) )
+        game.Flag( 0, 0 )
+        fork = game.Fork()
+        data = minesweeper.Dumps( game )
+        self.assertIs( fork.mines, game.mines )
+        self.assertEqual( minesweeper.Dumps( fork ), data )
+        
+        # The moves of the fork don't reach the game nor its listeners
+        k = next( k for k in range( 16 * 30 ) if not game.mines[ k ] and not game.neighbors[ k ] )
+        fork.Flag( 0, 0, reset = True )
+        fork.Uncover( *divmod( k, 30 ) )
+        fork.Free( *divmod( k, 30 ) )
+        self.assertTrue( fork.Uncover( *game.GetMines()[ 0 ] ) )
+        self.assertEqual( minesweeper.Dumps( game ), data )
+        self.assertEqual( len( changed ), 1 )
+        self.assertEqual( len( game._undo ), 1 )
+        
+        # ... and the moves of the game don't reach the fork
+        played = minesweeper.Dumps( fork )
+        game.Uncover( *divmod( k, 30 ) )
+        self.assertEqual( minesweeper.Dumps( fork ), played )
+        
+        # Setting the mines of either copies them first
+        fork.SetMines( [ ( 0, 1 ) ] )
+        self.assertEqual( game.GetMines(), minesweeper.Game( 16, 30, 99, seed = 1 ).GetMines() )
+        other = game.Fork()
+        hasMine = game[ 0 ][ 1 ].HasMine()
+        game[ 0 ][ 1 ].SetMine( reset = hasMine )
+        self.assertEqual( other[ 0 ][ 1 ].HasMine(), hasMine )
+
+    def testUndoRedo( self ):
+        """Undo and redo have to restore the cells and the counters of every move."""
+        game = minesweeper.Game( 16, 30, 99, seed = 1 )
+        changed = []
+        game.AddListener( lambda game, changes: changed.append( len( changes ) ) )
+        i, j = divmod( next( k for k in range( 16 * 30 ) if not game.mines[ k ] and not game.neighbors[ k ] ), 30 )
+        states = [ minesweeper.Dumps( game ) ]
+        for move in ( lambda: game.Flag( i, j ), lambda: game.QMark( i, j ), lambda: game.Uncover( i, j ) ):
+            move()
+            states.append( minesweeper.Dumps( game ) )
+        opened = changed[ -1 ]
+        self.assertGreater( opened, 1 )
+        
+        # Undoing the opening sends only its cells to the listeners
+        self.assertTrue( game.Undo() )
+        self.assertEqual( changed[ -1 ], opened )
+        self.assertEqual( minesweeper.Dumps( game ), states[ 2 ] )
+        game.Undo()
+        game.Undo()
+        self.assertEqual( minesweeper.Dumps( game ), states[ 0 ] )
+        self.assertFalse( game.Undo() )
+        for state in states[ 1 : ]:
+            self.assertTrue( game.Redo() )
+            self.assertEqual( minesweeper.Dumps( game ), state )
+        self.assertFalse( game.Redo() )
+        
+        # A new move forgets the moves to redo, a restart all the moves
+        game.Undo()
+        game.Flag( i, j )
+        self.assertFalse( game.CanRedo() )
+        self.assertTrue( game.CanUndo() )
+        game.Restart()
+        self.assertFalse( game.CanUndo() )
+
+    def testJournal( self ):
+        """The game recovered from a journal has to be the recorded one."""
+        rng = random.Random( 1 )
+        game = minesweeper.Game( 9, 9, 10, seed = 1 )
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join( folder, "journal" )
+            game.SetJournal( minesweeper.Journal( filename, interval = 7 ) )
+            snapshotSize = len( minesweeper.Dumps( game ) )
+            for n in range( 40 ):
+                i, j = rng.randrange( 9 ), rng.randrange( 9 )
+                try:
+                    if n % 3 or game.mines[ i * 9 + j ]:
+                        rng.choice( ( game.Flag, game.QMark ) )( i, j, rng.random() < 0.5 )
+                    else:
+                        game.Uncover( i, j )
+                except minesweeper.MinesweeperStatusError:
+                    pass
+                self.assertEqual( minesweeper.Dumps( minesweeper.Recover( filename ) ), minesweeper.Dumps( game ) )
+                self.assertLess( os.path.getsize( filename ), snapshotSize + 7 * 5 )
+                
+            # An incomplete move is ignored
+            data = minesweeper.Dumps( game )
+            game.SetJournal( None )
+            with open( filename, "ab" ) as f:
+                f.write( b'\x00\x01' )
+            self.assertEqual( minesweeper.Dumps( minesweeper.Recover( filename ) ), data )
+            
+            # A move which can't be replayed makes the journal damaged
+            with open( filename, "r+b" ) as f:
+                f.truncate( os.path.getsize( filename ) - 2 )
+                f.seek( 0, io.SEEK_END )
+                f.write( minesweeper._MOVE.pack( minesweeper.Journal.UNCOVER, game.statuses.index( minesweeper.Cell.REVEALED ) ) )
+            self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.Recover, filename )
+            
+            # Restart takes a new snapshot
+            game.Restart()
+            game.SetJournal( minesweeper.Journal( filename ) )
+            game.Flag( 0, 0 )
+            game.Restart()
+            self.assertEqual( os.path.getsize( filename ), snapshotSize )
+            game.SetJournal( None )
+
+    def testDumpLoad( self ):
+        """A game saved in the binary format has to be loaded with the same cells and counters."""
+        for nrows, ncols, nmines in ( ( 16, 30, 99 ), ( 3, 5, 4 ), ( 1, 2, 1 ), ( 9, 9, 0 ) ):
+            game = minesweeper.Game( nrows, ncols, nmines, seed = nrows )
+            game.Flag( 0, 0 )
+            if nrows > 1:
+                game.QMark( 1, 0 )
+            game.Uncover( nrows - 1, ncols - 1 )
+            data = minesweeper.Dumps( game )
+            self.assertEqual( 22 + ( nrows * ncols + 7 ) // 8 + ( nrows * ncols + 3 ) // 4, len( data ) )
+            copy = minesweeper.Loads( data )
+            self.assertEqual( game.statuses, copy.statuses )
+            self.assertEqual( game.mines, copy.mines )
+            self.assertEqual( game.neighbors, copy.neighbors )
+            self.assertEqual( ( game.toDiscover, game.nflags, game.nmines, game.IsModified() ),
+                              ( copy.toDiscover, copy.nflags, copy.nmines, copy.IsModified() ) )
+
+        # Dump() and Load() read and write only the game on a file
+        f = io.BytesIO()
+        minesweeper.Dump( game, f )
+        f.write( b'tail' )
+        f.seek( 0 )
+        self.assertEqual( game.statuses, minesweeper.Load( f ).statuses )
+        self.assertEqual( b'tail', f.read() )
+
+    def testLoadErrors( self ):
+        """Loading invalid data has to raise MinesweeperFormatError."""
+        data = minesweeper.Dumps( minesweeper.Game() )
+        self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.Loads, data[ : -1 ] )
+        self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.Loads, data + b'x' )
+        self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.Loads, b'XXXX' + data[ 4 : ] )
+        self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.Loads, data[ : 4 ] + b'\x63' + data[ 5 : ] )
+        self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.Loads, legacySave )
+
+    def testLoadTruncated( self ):
+        """Every truncated save has to raise MinesweeperFormatError, also from a file."""
+        data = minesweeper.Dumps( minesweeper.Game( 5, 7, 6, seed = 1 ) )
+        for size in range( len( data ) ):
+            self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.Loads, data[ : size ] )
+            self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.Load, io.BytesIO( data[ : size ] ) )
+            
+    def testLoadHeader( self ):
+        """LoadHeader() has to read only the header of a saved game."""
+        game = minesweeper.Game( 16, 30, 99, seed = 1 )
+        game.Flag( 0, 0 )
+        game.SetModified( True )
+        f = io.BytesIO( minesweeper.Dumps( game ) )
+        self.assertEqual( minesweeper.LoadHeader( f ), ( 16, 30, 99, game.toDiscover, 1, True ) )
+        self.assertEqual( f.tell(), minesweeper._HEADER.size )
+        self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.LoadHeader, io.BytesIO( b'MSWP' ) )
+        self.assertRaises( minesweeper.MinesweeperFormatError, minesweeper.LoadHeader, io.BytesIO( legacySave ) )
+
+    def testSaveLost( self ):
+        """A game lost on the last cell (so with -1 cells to discover) has to be saved and journaled."""
+        game = minesweeper.Game( 3, 3, 1, seed = 1 )
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join( folder, "journal" )
+            game.SetJournal( minesweeper.Journal( filename, interval = 2 ) )
+            for i, j in itertools.product( range( 3 ), range( 3 ) ):
+                if not game.mines[ i * 3 + j ] and game.statuses[ i * 3 + j ] != minesweeper.Cell.REVEALED:
+                    game.Uncover( i, j )
+            self.assertTrue( game.Uncover( *game.GetMines()[ 0 ] ) )
+            self.assertEqual( -1, game.GetToDiscover() )
+            game.Undo()
+            game.Redo()
+            self.assertEqual( minesweeper.Dumps( minesweeper.Recover( filename ) ), minesweeper.Dumps( game ) )
+            game.SetJournal( None )
+        copy = minesweeper.Loads( minesweeper.Dumps( game ) )
+        self.assertEqual( -1, copy.GetToDiscover() )
+        self.assertEqual( game.statuses, copy.statuses )
+
+    def testListener( self ):
+        """Listeners have to receive the cells changed by every move, with their old status."""
+        game = minesweeper.Game( 9, 9, 0 )
+        game.SetMines( self.knownMines )
+        received = []
+        listener = lambda game, changes: received.append( list( changes ) )
+        game.AddListener( listener )
+        game.Flag( 0, 1 )
+        game.QMark( 0, 1 )
+        game.QMark( 0, 1, True )
+        self.assertEqual( [ [ ( 1, minesweeper.Cell.COVERED ) ],
+                            [ ( 1, minesweeper.Cell.FLAG ) ],
+                            [ ( 1, minesweeper.Cell.Q_MARK ) ] ], received )
+
+        # An opening is a single change list: the cell, then the rest of the opening
+        del received[ : ]
+        game.Uncover( *self.autoUncoverStart )
+        self.assertEqual( 1, len( received ) )
+        coordList = [ divmod( k, 9 ) for k, old in received[ 0 ] ]
+        self.assertEqual( self.autoUncoverStart, coordList[ 0 ] )
+        self.assertEqual( sorted( self.knownAutouncover ), sorted( coordList[ 1 : ] ) )
+        self.assertEqual( 81 - game.GetToDiscover(), len( coordList ) )
+
+        # Free on (1, 0): 3 mines and 3 covered cells around, so they are flagged
+        game.Uncover( 0, 0 )
+        game.Uncover( 1, 0 )
+        game.Uncover( 2, 0 )
+        del received[ : ]
+        game.Free( 1, 0 )
+        self.assertEqual( [ [ ( 1, minesweeper.Cell.COVERED ), ( 10, minesweeper.Cell.COVERED ),
+                              ( 19, minesweeper.Cell.COVERED ) ] ], received )
+
+        # Nothing is sent for moves which change nothing or after the removal
+        del received[ : ]
+        game.Free( 1, 0 )
+        game.RemoveListener( listener )
+        game.Flag( 8, 8 )
+        self.assertEqual( [], received )
+        self.assertEqual( [], pickle.loads( pickle.dumps( game ) )._listeners )
+
+    def testLegacyPickle( self ):
+        """Games pickled by older releases have to be converted on loading."""
+        game = pickle.loads( legacySave )
+        self.assertEqual( ( 2, 3 ), ( len( game ), len( game[ 0 ] ) ) )
+        self.assertEqual( [ ( 0, 0 ) ], game.GetMines() )
+        self.assertEqual( minesweeper.Cell.FLAG, game[ 0 ][ 0 ].GetStatus() )
+        self.assertEqual( minesweeper.Cell.REVEALED, game[ 1 ][ 2 ].GetStatus() )
+        self.assertEqual( 1, game[ 1 ][ 1 ].GetNeighborMinesNum() )
+        self.assertEqual( ( 1, 1 ), ( game.GetToDiscover(), game.GetFlagsNum() ) )
+        game.Uncover( 1, 0 )
+        self.assertEqual( 0, game.GetToDiscover() )
+
+        
+class SolverTest( unittest.TestCase ):
+    """Test the solver of minesweepersolver.py."""
+    
+    def testOneTwoOne( self ):
+        """The pattern 1-2-1 has to give a mine, a safe cell and a mine."""
+        solver = minesweepersolver.Solver( 2, 3 )
+        for j, number in enumerate( ( 1, 2, 1 ) ):
+            solver.Reveal( 1, j, number )
+        self.assertEqual( solver.Solve(), ( [ ( 0, 1 ) ], [ ( 0, 0 ), ( 0, 2 ) ] ) )
+        
+    def testGameSolver( self ):
+        """The solver has to find only safe cells and mines, following the game."""
+        for seed in range( 20 ):
+            game = minesweeper.Game( 16, 16, 40, seed = seed )
+            solver = minesweepersolver.GameSolver( game )
+            self.assertEqual( solver.Solve(), ( [], [] ) )
+            k = next( k for k in range( 16 * 16 ) if not game.mines[ k ] and not game.neighbors[ k ] )
+            game.Uncover( *divmod( k, 16 ) )
+            safe, mined = solver.Solve()
+            while safe:
+                for i, j in mined:
+                    self.assertTrue( game.mines[ i * 16 + j ] )
+                for i, j in safe:
+                    self.assertFalse( game.mines[ i * 16 + j ] )
+                    if game.statuses[ i * 16 + j ] != minesweeper.Cell.REVEALED:
+                        game.Uncover( i, j )
+                safe, mined = solver.Solve()
+                
+            # Covering cells again starts the solver again
+            if game.CanUndo():
+                game.Undo()
+                self.assertEqual( solver.Solve(), minesweepersolver.GameSolver( game ).Solve() )
+            game.Restart()
+            self.assertEqual( solver.Solve(), ( [], [] ) )
+            solver.Close()
+            
+    def testProbabilities( self ):
+        """The probabilities have to be the ones of all the layouts which fit the table."""
+        game = minesweeper.Game( 4, 5, 6, seed = 3 )
+        for k in ( 0, 7, 19 ):
+            if not game.mines[ k ] and game.statuses[ k ] != minesweeper.Cell.REVEALED:
+                game.Uncover( *divmod( k, 5 ) )
+        solver = minesweepersolver.GameSolver( game )
+        probabilities = solver.Probabilities()
+        
+        # Count the layouts one by one
+        covered = [ k for k in range( 20 ) if game.statuses[ k ] != minesweeper.Cell.REVEALED ]
+        revealed = [ k for k in range( 20 ) if game.statuses[ k ] == minesweeper.Cell.REVEALED ]
+        offsets, indices = game.neighborTable
+        hits = [ 0 ] * 20
+        total = 0
+        for layout in itertools.combinations( covered, 6 ):
+            if all( len( set( layout ).intersection( indices[ offsets[ k ] : offsets[ k + 1 ] ] ) ) == game.neighbors[ k ]
+                    for k in revealed ):
+                total += 1
+                for k in layout:
+                    hits[ k ] += 1
+        for k in covered:
+            self.assertAlmostEqual( probabilities[ k // 5 ][ k % 5 ], hits[ k ] / total )
+        for k in revealed:
+            self.assertEqual( probabilities[ k // 5 ][ k % 5 ], 0.0 )
+            
+        # Without enough steps the frontier gets an estimate
+        probabilities = minesweepersolver.GameSolver( game ).Probabilities( maxNodes = 1 )
+        for k in covered:
+            self.assertTrue( 0.0 <= probabilities[ k // 5 ][ k % 5 ] <= 1.0 )
+    
+    def testParallelProbabilities( self ):
+        """The probabilities counted by a process pool have to be the same as the serial ones."""
+        game = minesweeper.Game( 16, 30, 99, seed = 1 )
+        for k in range( 0, 16 * 30, 31 ):
+            if not game.mines[ k ] and game.statuses[ k ] != minesweeper.Cell.REVEALED:
+                game.Uncover( *divmod( k, 30 ) )
+        expected = minesweepersolver.GameSolver( game ).Probabilities()
+        with concurrent.futures.ProcessPoolExecutor( max_workers = 2 ) as executor:
+            solver = minesweepersolver.GameSolver( game )
+            self.assertEqual( solver.Probabilities( executor = executor ), expected )
+            self.assertEqual( solver.Probabilities( executor = executor ), expected )
+            
+    def testNoGuessGame( self ):
+        """A board without guesses has to be played to the end by the solver from its opening."""
+        game = minesweepersolver.NoGuessGame( 16, 16, 40, seed = 2 )
+        self.assertEqual( game.GetMinesNum(), 40 )
+        self.assertFalse( game.IsModified() )
+        self.assertFalse( game.CanUndo() )
+        revealed = [ k for k in range( 16 * 16 ) if game.statuses[ k ] == minesweeper.Cell.REVEALED ]
+        self.assertTrue( revealed )
+        start = next( k for k in revealed if not game.neighbors[ k ] )
+        self.assertTrue( minesweepersolver.IsNoGuess( game, divmod( start, 16 ) ) )
+        self.assertEqual( game.statuses.count( minesweeper.Cell.REVEALED ), len( revealed ) )
+        self.assertEqual( minesweepersolver.NoGuessGame( 16, 16, 40, seed = 2 ).mines, game.mines )
+        
+        # A mine in a corner of a table two cells wide needs a guess
+        game = minesweeper.Game( 4, 2, 1 )
+        game.SetMines( [ ( 0, 0 ) ] )
+        self.assertFalse( minesweepersolver.IsNoGuess( game, ( 3, 0 ) ) )
+        game = minesweeper.Game( 3, 3, 2 )
+        game.SetMines( [ ( 0, 0 ), ( 0, 2 ) ] )
+        self.assertTrue( minesweepersolver.IsNoGuess( game, ( 2, 1 ) ) )
+        self.assertRaises( minesweeper.MinesweeperError, minesweepersolver.NoGuessGame, 3, 3, 8, maxTries = 5 )
+        
+        # Too dense boards are refused at once
+        self.assertTrue( minesweepersolver.CanBeNoGuess( 16, 30, 99 ) )
+        self.assertFalse( minesweepersolver.CanBeNoGuess( 24, 30, 200 ) )
+        self.assertRaises( minesweeper.MinesweeperError, minesweepersolver.NoGuessGame, 24, 30, 200, maxTries = 10 ** 9 )
+
+
+class BoardPoolTest( unittest.TestCase ):
+    def testPool( self ):
+        """The boards have to be made in advance and kept in the directory for the next pools."""
+        with tempfile.TemporaryDirectory() as directory:
+            with concurrent.futures.ThreadPoolExecutor( max_workers = 2 ) as executor:
+                pool = minesweeperpool.BoardPool( minesweeper.Game, executor, directory, size = 3 )
+                self.assertEqual( pool.Count( 9, 9, 10 ), 0 )
+                self.assertIsNone( pool.Pop( 9, 9, 10 ) )
+                pool.Wait()
+            self.assertEqual( pool.Count( 9, 9, 10 ), 3 )
+            self.assertEqual( len( os.listdir( os.path.join( directory, "9x9x10" ) ) ), 3 )
+            
+            # A new pool finds the boards on disk, and pops them without making new ones
+            with concurrent.futures.ThreadPoolExecutor( max_workers = 1 ) as executor:
+                pool = minesweeperpool.BoardPool( minesweeper.Game, executor, directory, size = 3 )
+                pool.Wait()
+                self.assertEqual( pool.Count( 9, 9, 10 ), 3 )
+                saved = [ game.mines for filename, game in pool.boards[ "9x9x10" ] ]
+                game = pool.Pop( 9, 9, 10 )
+                self.assertEqual( ( game.nrows, game.ncols, game.nmines ), ( 9, 9, 10 ) )
+                self.assertIn( game.mines, saved )
+            self.assertEqual( pool.Count( 9, 9, 10 ), 3 )
+            self.assertEqual( pool.Count( 16, 16, 40 ), 0 )
+            
+            # A forgotten size is read again from its files, in the background
+            pool.Forget( 9, 9, 10 )
+            self.assertNotIn( "9x9x10", pool.boards )
+            self.assertIsNone( pool.Pop( 9, 9, 10 ) )
+            pool.Wait()
+            self.assertEqual( pool.Count( 9, 9, 10 ), 3 )
+            
+        # Without a directory the boards are only in memory: the next one is
+        # made while the current one is played
+        with concurrent.futures.ThreadPoolExecutor( max_workers = 1 ) as executor:
+            pool = minesweeperpool.BoardPool( minesweeper.Game, executor, size = 1 )
+            pool.Pop( 16, 30, 99 )
+        self.assertEqual( pool.Count( 16, 30, 99 ), 1 )
+        pool.Forget( 16, 30, 99 )
+        self.assertEqual( pool.Count( 16, 30, 99 ), 0 )
+        
+        # A size which can't be made is given up after the first failure
+        with concurrent.futures.ThreadPoolExecutor( max_workers = 1 ) as executor:
+            pool = minesweeperpool.BoardPool( minesweepersolver.NoGuessGame, executor, size = 2 )
+            self.assertIsNone( pool.Pop( 24, 30, 200 ) )
+        self.assertTrue( pool.Failed( 24, 30, 200 ) )
+        self.assertFalse( pool.Failed( 9, 9, 10 ) )
+        pool.Fill( 24, 30, 200 )
+        self.assertEqual( pool.pending[ "24x30x200" ], 0 )
+
+
+class MetricsTest( unittest.TestCase ):
+    def testMetrics( self ):
+        """The metrics have to agree with the openings of a Game and with a plain count of the cells."""
+        for seed in range( 50 ):
+            rng = random.Random( seed )
+            nrows, ncols = rng.randint( 1, 16 ), rng.randint( 1, 30 )
+            game = minesweeper.Game( nrows, ncols, rng.randint( 0, nrows * ncols ), seed = rng )
+            metrics = minesweepermetrics.GameMetrics( game )
+            self.assertEqual( metrics.mines, game.GetMinesNum() )
+            self.assertEqual( metrics.openings, game.GetOpeningsNum() )
+            self.assertEqual( metrics.isolated, game.GetIsolatedNum() )
+            self.assertEqual( metrics.bbbv, game.Get3BV() )
+            self.assertEqual( metrics.histogram, tuple(
+                sum( 1 for k in range( nrows * ncols ) if not game.mines[ k ] and game.neighbors[ k ] == n )
+                for n in range( 9 ) ) )
+                
+        # The corner closed by three mines is an isolated number, the rest an opening
+        game = minesweeper.Game( 9, 9, 4 )
+        game.SetMines( [ ( 0, 1 ), ( 1, 0 ), ( 1, 1 ), ( 8, 8 ) ] )
+        metrics = minesweepermetrics.GameMetrics( game )
+        self.assertEqual( ( 1, 1, 1, 2 ), ( metrics.openings, metrics.isolated, metrics.islands, metrics.bbbv ) )
+        self.assertEqual( 2 / 77, metrics.difficulty )
+        
+        # A board without cells has no metrics
+        for nrows, ncols in ( ( 0, 0 ), ( 0, 5 ), ( 5, 0 ) ):
+            self.assertEqual( minesweepermetrics.Metrics( b'', nrows, ncols ),
+                              ( 0, 0, 0, 0, 0, ( 0, ) * 9, 0.0 ) )
+        
+        # A batch gives the same metrics with and without an executor
+        boards = [ minesweeper.Game( 16, 30, 99, seed = seed ).mines for seed in range( 20 ) ]
+        expected = [ minesweepermetrics.Metrics( mines, 16, 30 ) for mines in boards ]
+        self.assertEqual( minesweepermetrics.BatchMetrics( boards, 16, 30 ), expected )
+        with concurrent.futures.ThreadPoolExecutor( max_workers = 2 ) as executor:
+            self.assertEqual( minesweepermetrics.BatchMetrics( boards, 16, 30, executor ), expected )
+
+
+class BitGameTest( unittest.TestCase ):
+    def testMoves( self ):
+        """A BitGame has to play the moves of a Game with the same results."""
+        for seed in range( 40 ):
+            rng = random.Random( seed )
+            nrows, ncols = rng.randint( 1, 12 ), rng.randint( 1, 14 )
+            nmines = rng.randint( 0, nrows * ncols // 3 )
+            game = minesweeper.Game( nrows, ncols, nmines, seed = seed )
+            bits = minesweeperbits.BitGame( nrows, ncols, nmines, seed = seed )
+            self.assertEqual( bits.GetMines(), game.GetMines() )
+            self.assertEqual( bits.NeighborCounts(), game.neighbors )
+            for n in range( 40 ):
+                i, j = rng.randrange( nrows ), rng.randrange( ncols )
+                move = rng.choice( ( 'Uncover', 'Uncover', 'Free', 'Flag', 'QMark' ) )
+                results = []
+                for g in ( game, bits ):
+                    try:
+                        results.append( getattr( g, move )( i, j ) )
+                    except minesweeper.MinesweeperStatusError:
+                        results.append( None )
+                self.assertEqual( results[ 0 ], results[ 1 ] )
+                self.assertEqual( [ bits.GetStatus( *divmod( k, ncols ) ) for k in range( nrows * ncols ) ],
+                                  list( game.statuses ) )
+                self.assertEqual( bits.GetToDiscover(), game.GetToDiscover() )
+                self.assertEqual( bits.GetFlagsNum(), game.GetFlagsNum() )
+                
+            # The conversions keep the whole table
+            self.assertEqual( minesweeperbits.FromGame( game ).Key(), bits.Key() )
+            converted = bits.ToGame()
+            self.assertEqual( converted.statuses, game.statuses )
+            self.assertEqual( converted.neighbors, game.neighbors )
+            self.assertEqual( converted.GetToDiscover(), game.GetToDiscover() )
+            
+    def testCopy( self ):
+        """The moves on a copy don't have to change the original."""
+        bits = minesweeperbits.BitGame( 9, 9, 10, seed = 3 )
+        key = bits.Key()
+        copy = bits.Copy()
+        i, j = next( divmod( k, 9 ) for k in range( 81 ) if not bits.HasMine( *divmod( k, 9 ) ) )
+        copy.Uncover( i, j )
+        self.assertEqual( bits.Key(), key )
+        self.assertNotEqual( copy.Key(), key )
+        self.assertEqual( bits.GetToDiscover(), 71 )
+
+
+class SimulationTest( unittest.TestCase ):
+    def testSimulate( self ):
+        """A batch has to give the same games with any number of workers."""
+        results = minesweepersim.Simulate( 9, 9, 10, 60, seed = 7, workers = 1 )
+        self.assertEqual( len( results ), 60 )
+        self.assertEqual( minesweepersim.Simulate( 9, 9, 10, 60, seed = 7, workers = 2 ), results )
+        for won, moves, guesses in results:
+            self.assertTrue( 1 <= guesses <= moves <= 71 )
+            
+        # Every game is the one of its seed
+        seed = random.Random( 7 ).getrandbits( 64 )
+        self.assertEqual( minesweepersim.PlayGame( 9, 9, 10, 'safest', seed ), results[ 0 ] )
+        self.assertRaises( ValueError, minesweepersim.Simulate, 9, 9, 10, 1, 'nopolicy' )
+        
+    def testWilsonInterval( self ):
+        """The interval has to hold the win rate and shrink with the games."""
+        low, high = minesweepersim.WilsonInterval( 50, 100 )
+        self.assertAlmostEqual( low, 0.4038, places = 4 )
+        self.assertAlmostEqual( high, 0.5962, places = 4 )
+        self.assertEqual( minesweepersim.WilsonInterval( 0, 10 )[ 0 ], 0.0 )
+        self.assertLess( minesweepersim.WilsonInterval( 500, 1000 )[ 1 ], high )
+
+
+class StubRoot:
+    """The part of a Minesweeptk.RootWindow used by AutoSaver: the game of
+    its table, and a timer fired by hand."""
+    
+    def __init__( self, game ):
+        self.table = types.SimpleNamespace( game = game )
+        self.callback = None
+        
+    def after( self, interval, callback ):
+        self.callback = callback
+        return "after#1"
+        
+    def after_cancel( self, afterId ):
+        self.callback = None
+        
+    def Fire( self ):
+        """Run the timer callback, as the Tk mainloop would."""
+        callback, self.callback = self.callback, None
+        callback()
+
+
+class PersistentDataTest( unittest.TestCase ):
+    """Test the files of PersistentData in Minesweeptk.py."""
+    
+    def setUp( self ):
+        self.folder = tempfile.TemporaryDirectory()
+        self.persData = Minesweeptk.PersistentData( *( os.path.join( self.folder.name, name )
+                                                       for name in ( "save", "options", "autosave" ) ) )
+        
+    def tearDown( self ):
+        self.folder.cleanup()
+        
+    def testTruncatedSave( self ):
+        """A truncated save has a valid header, but loading it has to raise MinesweeperFormatError."""
+        game = minesweeper.Game( 16, 30, 99, seed = 1 )
+        data = minesweeper.Dumps( game )
+        for size in ( 0, 4, minesweeper._HEADER.size - 1, minesweeper._HEADER.size, len( data ) - 10, len( data ) - 1 ):
+            self.persData.SaveGame( game )
+            self.persData.AutoSaveGame( game )
+            for filename in ( self.persData.filename, self.persData.autosaveFilename ):
+                with open( filename, "r+b" ) as f:
+                    f.truncate( size )
+                    
+            # Only a whole header makes a saved game
+            hasGame = size >= minesweeper._HEADER.size
+            self.assertEqual( hasGame, self.persData.HasGame() )
+            self.assertEqual( hasGame, self.persData.HasAutoSavedGame() )
+            if size:
+                self.assertRaises( minesweeper.MinesweeperFormatError, self.persData.LoadGame )
+            else:
+                # An empty file is an empty legacy save
+                self.assertIsNone( self.persData.LoadGame() )
+            self.assertRaises( minesweeper.MinesweeperFormatError, self.persData.LoadAutoSavedGame )
+        
+    def testMaliciousPickle( self ):
+        """A legacy save referencing any other global than the game ones has to be rejected without running it."""
+        victim = os.path.join( self.folder.name, "victim" )
+        open( victim, "wb" ).close()
+        with open( self.persData.filename, "wb" ) as f:
+            f.write( b"cos\nremove\n(V" + victim.encode( "raw_unicode_escape" ) + b"\ntR." )
+        self.assertFalse( self.persData.HasGame() )
+        self.assertRaises( minesweeper.MinesweeperFormatError, self.persData.LoadGame )
+        self.assertTrue( os.path.exists( victim ) )
+        
+        # The games of older releases are still read
+        with open( self.persData.filename, "wb" ) as f:
+            f.write( legacySave )
+        self.assertEqual( [ ( 0, 0 ) ], self.persData.LoadGame().GetMines() )
+        
+    def testMigrateLegacy( self ):
+        """A save of older releases has to be read, and its options moved to the options file."""
+        for data in ( legacySave, legacySave0 ):
+            with open( self.persData.filename, "wb" ) as f:
+                f.write( data )
+            self.assertTrue( self.persData.HasGame() )
+            game = self.persData.LoadGame()
+            self.assertEqual( [ ( 0, 0 ) ], game.GetMines() )
+            self.assertEqual( minesweeper.Cell.FLAG, game[ 0 ][ 0 ].GetStatus() )
+            self.assertEqual( minesweeper.Cell.REVEALED, game[ 1 ][ 2 ].GetStatus() )
+            
+            # The first run moves the options, so the next ones don't read the game
+            savedOptions = ( 2, { "nrows": 9, "ncols": 9, "nmines": 10 }, False )
+            self.assertEqual( savedOptions, self.persData.LoadOptions() )
+            self.assertTrue( os.path.exists( self.persData.optionsFilename ) )
+            
+            # Saving the game replaces the legacy file, keeping the options
+            self.persData.SaveGame( game )
+            with open( self.persData.filename, "rb" ) as f:
+                self.assertEqual( minesweeper.FORMAT_MAGIC, f.read( len( minesweeper.FORMAT_MAGIC ) ) )
+            self.assertEqual( savedOptions, self.persData.LoadOptions() )
+            self.assertEqual( game.statuses, self.persData.LoadGame().statuses )
+            os.remove( self.persData.optionsFilename )
+            
+    def testHasLegacyGame( self ):
+        """Only a pickle starting with a game has to hold a game."""
+        for data, hasGame in ( ( legacySave, True ), ( legacySave0, True ),
+                               ( pickle.dumps( "No game", 0 ) + pickle.dumps( 2, 0 ), False ),
+                               ( pickle.dumps( "No game" ) + pickle.dumps( 2 ), False ),
+                               ( pickle.dumps( ( 1, 2 ) ), False ),
+                               ( b"garbage", False ) ):
+            self.assertEqual( hasGame, self.persData._HasLegacyGame( io.BytesIO( data ) ) )
+            with open( self.persData.filename, "wb" ) as f:
+                f.write( data )
+            self.assertEqual( hasGame, self.persData.HasGame() )
+        
+        # A legacy file without a game still keeps the options
+        with open( self.persData.filename, "wb" ) as f:
+            f.write( pickle.dumps( "No game" ) + pickle.dumps( 0 ) +
+                     pickle.dumps( { "nrows": 5, "ncols": 6, "nmines": 7 } ) )
+        self.assertIsNone( self.persData.LoadGame() )
+        self.assertEqual( ( 0, { "nrows": 5, "ncols": 6, "nmines": 7 }, False ), self.persData.LoadOptions() )
+        
+    def testDamagedOptions( self ):
+        """Damaged options have to give the default values."""
+        defaults = ( Minesweeptk.option, Minesweeptk.options[ 3 ], False )
+        self.assertEqual( defaults, self.persData.LoadOptions() )
+        for data in ( b"", b"[1, {", b"\xff\xfe", b"null", b"[]", b"[7, {}]",
+                      b'[3, {"nrows": -1, "ncols": 9, "nmines": 10}]',
+                      b'[3, {"nrows": "9", "ncols": 9, "nmines": 10}]' ):
+            with open( self.persData.optionsFilename, "wb" ) as f:
+                f.write( data )
+            self.assertEqual( defaults, self.persData.LoadOptions(), data )
+            
+        custom = { "nrows": 20, "ncols": 25, "nmines": 50 }
+        self.assertEqual( ( 3, custom, True ), self.persData._ParseOptions( [ 3, custom, 1 ] ) )
+        self.assertEqual( ( 0, custom, False ), self.persData._ParseOptions( [ 0, custom ] ) )
+        for data in ( None, 5, [ 3 ], [ 3, None ], [ 3, { "nrows": 20 } ], [ -1, custom ] ):
+            self.assertEqual( defaults, self.persData._ParseOptions( data ), data )
+            
+    def testSplitFiles( self ):
+        """The game, the options and the autosaved game have to be kept in their own files."""
+        game = minesweeper.Game( 9, 9, 10, seed = 1 )
+        game.Flag( 0, 0 )
+        self.persData.SaveOptions( 2, Minesweeptk.options[ 3 ], True )
+        self.persData.SaveGame( game )
+        with open( self.persData.optionsFilename, "rb" ) as f:
+            options = f.read()
+        self.assertFalse( self.persData.HasAutoSavedGame() )
         
+        game.Flag( 1, 1 )
+        self.persData.AutoSaveGame( game )
+        self.assertTrue( self.persData.HasAutoSavedGame() )
+        self.assertEqual( game.statuses, self.persData.LoadAutoSavedGame().statuses )
+        self.assertNotEqual( game.statuses, self.persData.LoadGame().statuses )
+        with open( self.persData.optionsFilename, "rb" ) as f:
+            self.assertEqual( options, f.read() )
+        self.assertEqual( ( 2, Minesweeptk.options[ 3 ], True ), self.persData.LoadOptions() )
+        
+        self.persData.RemoveAutoSavedGame()
+        self.persData.RemoveAutoSavedGame()
+        self.assertFalse( self.persData.HasAutoSavedGame() )
+        self.assertTrue( self.persData.HasGame() )
+        self.assertEqual( [], [ name for name in os.listdir( self.folder.name ) if name.endswith( ".tmp" ) ] )
+        
+    def testAutoSaver( self ):
+        """The autosave file has to be written while the game is modified, and removed otherwise."""
+        game = minesweeper.Game( 9, 9, 10, seed = 1 )
+        self.persData.AutoSaveGame( game )
+        root = StubRoot( game )
+        autoSaver = Minesweeptk.AutoSaver( root, self.persData )
+        try:
+            # The autosaved game of the previous run is left alone until Start()
+            self.assertIsNone( root.callback )
+            autoSaver.Start()
+            self.assertTrue( self.persData.HasAutoSavedGame() )
+            
+            # A game not modified yet has nothing to recover
+            root.Fire()
+            autoSaver.queue.join()
+            self.assertFalse( self.persData.HasAutoSavedGame() )
+            
+            # A move writes the game, once
+            game.Flag( 0, 0 )
+            root.Fire()
+            autoSaver.queue.join()
+            self.assertEqual( game.statuses, self.persData.LoadAutoSavedGame().statuses )
+            snapshot = autoSaver.snapshot
+            root.Fire()
+            self.assertIs( snapshot, autoSaver.snapshot )
+            self.assertTrue( autoSaver.queue.empty() )
+            
+            # A saved game removes the file
+            game.SetModified( False )
+            root.Fire()
+            autoSaver.queue.join()
+            self.assertFalse( self.persData.HasAutoSavedGame() )
+            game.Flag( 1, 1 )
+            root.Fire()
+        finally:
+            autoSaver.Stop()
+        self.assertIsNone( root.callback )
+        self.assertFalse( autoSaver.worker.is_alive() )
+        self.assertFalse( self.persData.HasAutoSavedGame() )
+
+
 if __name__ == '__main__':
     unittest.main()
     
@@ -7,7 +7,7 @@ AUTHOR_EMAIL = 'gpz500@technologist.com'
 URL = 'https://www.morgantini.org/'
 DOC_FILES = [ 'LICENSE', 'changeslog.txt', 'README.md' ]
 GIF_FILES = glob.glob( '*.gif' )
-PY_FILES = [ 'minesweepertest.py', 'Minesweeptk.py' ]
+PY_FILES = [ 'minesweepertest.py', 'minesweeperbench.py', 'Minesweeptk.py' ]
 ICO_FILES = [ 'bomb.ico', 'bomb.icns' ]
 I18N_FILES = [ 'Makefile', 'it.po', 'en.po', 'ja.po' ]
 
@@ -163,6 +163,6 @@ else:
         url = URL,
         author = AUTHOR,
         author_email = AUTHOR_EMAIL,
-        py_modules = [ 'minesweeper', 'ttk' ]
+        py_modules = [ 'minesweeper', 'minesweeperbits', 'minesweepermetrics', 'minesweeperpool', 'minesweepersim', 'minesweepersolver', 'ttk' ]
     )
 